@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+ADC Calibration - Profil de calibration des potentiomètres du panneau.
+
+Les pots n'atteignent ni 0 ni 4095 et ne sont pas linéaires : un profil
+par panneau (fichier JSON) décrit, par canal ADC, la course réelle
+(raw_min/raw_max), les deadzones aux extrémités, des points de courbe
+optionnels (course normalisée → sortie, interpolation linéaire) et une
+courbe expo. build_lut() en précalcule une table de 4096 entrées
+(valeur ADC → throttle 0..1) : dans la boucle GPIO, la conversion est une
+seule lecture indexée.
+
+Calibration d'un panneau (Pico requis) :
+    python3 adc_calibration.py calibration/throttle.json --points 0.25,0.5,0.75
+puis config.json → hardware.pico.calibration = "calibration/throttle.json"
+(sans profil : course 0-4095 linéaire).
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+ADC_MAX = 4095
+LUT_SIZE = ADC_MAX + 1
+
+# Échantillons écartés de chaque côté pour apprendre min/max (pics parasites).
+EXTREME_TRIM = 0.005
+
+
+class ChannelCalibration:
+    """Calibration d'un canal : course, deadzones, courbe, expo."""
+
+    def __init__(
+        self,
+        raw_min: int = 0,
+        raw_max: int = ADC_MAX,
+        deadzone_low: float = 0.03,
+        deadzone_high: float = 0.03,
+        expo: float = 0.0,
+        points: Optional[Iterable[Sequence[float]]] = None,
+    ):
+        if raw_max <= raw_min:
+            raise ValueError(f"raw_max ({raw_max}) doit dépasser raw_min ({raw_min})")
+        if deadzone_low + deadzone_high >= 1.0:
+            raise ValueError("deadzones trop larges")
+        self.raw_min = int(raw_min)
+        self.raw_max = int(raw_max)
+        self.deadzone_low = float(deadzone_low)
+        self.deadzone_high = float(deadzone_high)
+        self.expo = float(expo)
+        # (course normalisée, sortie), triés ; les extrémités (0,0) et (1,1)
+        # sont implicites.
+        self.points: List[Tuple[float, float]] = sorted(
+            (float(x), float(y)) for x, y in (points or ())
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "raw_min": self.raw_min,
+            "raw_max": self.raw_max,
+            "deadzone_low": self.deadzone_low,
+            "deadzone_high": self.deadzone_high,
+            "expo": self.expo,
+            "points": [list(p) for p in self.points],
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "ChannelCalibration":
+        return cls(**d)
+
+    def response(self, raw: float) -> float:
+        """Throttle 0..1 pour une valeur ADC (calcul complet, hors chemin chaud)."""
+        x = (raw - self.raw_min) / (self.raw_max - self.raw_min)
+        if x <= self.deadzone_low:
+            return 0.0
+        if x >= 1.0 - self.deadzone_high:
+            return 1.0
+        x = (x - self.deadzone_low) / (1.0 - self.deadzone_low - self.deadzone_high)
+        if self.points:
+            knots = [(0.0, 0.0), *self.points, (1.0, 1.0)]
+            for (x0, y0), (x1, y1) in zip(knots, knots[1:]):
+                if x <= x1:
+                    x = y0 + (y1 - y0) * (x - x0) / (x1 - x0) if x1 > x0 else y1
+                    break
+        x = (1.0 - self.expo) * x + self.expo * x ** 3
+        return max(0.0, min(1.0, x))
+
+
+def build_lut(cal: ChannelCalibration) -> Tuple[float, ...]:
+    """Table valeur ADC (0..4095) → throttle 0..1."""
+    return tuple(cal.response(raw) for raw in range(LUT_SIZE))
+
+
+class CalibrationProfile:
+    """Profil d'un panneau physique : une calibration par canal ADC."""
+
+    def __init__(self, panel: str = "default", channels: Optional[Dict[int, ChannelCalibration]] = None):
+        self.panel = panel
+        self.channels: Dict[int, ChannelCalibration] = dict(channels or {})
+
+    def channel(self, ch: int, default: Optional[ChannelCalibration] = None) -> ChannelCalibration:
+        cal = self.channels.get(ch)
+        if cal is None:
+            cal = default if default is not None else ChannelCalibration()
+        return cal
+
+    def save(self, path) -> None:
+        doc = {
+            "panel": self.panel,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "channels": {str(ch): cal.to_dict() for ch, cal in sorted(self.channels.items())},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+            f.write("\n")
+
+    @classmethod
+    def load(cls, path) -> "CalibrationProfile":
+        with open(path, "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        channels = {
+            int(ch): ChannelCalibration.from_dict(d) for ch, d in doc.get("channels", {}).items()
+        }
+        return cls(panel=doc.get("panel", "default"), channels=channels)
+
+
+class Calibrator:
+    """Apprend la course réelle d'un canal à partir d'échantillons bruts."""
+
+    def __init__(self):
+        self.samples: List[int] = []
+        self.points: List[Tuple[int, float]] = []
+
+    def feed(self, raw: int) -> None:
+        self.samples.append(raw)
+
+    def add_point(self, raw_samples: Sequence[int], output: float) -> None:
+        """Position physique connue : médiane des lectures → sortie voulue."""
+        self.points.append((statistics.median_low(raw_samples), output))
+
+    def range(self) -> Tuple[int, int]:
+        if len(self.samples) < 2:
+            raise ValueError("pas assez d'échantillons")
+        ordered = sorted(self.samples)
+        k = int(len(ordered) * EXTREME_TRIM)
+        return ordered[k], ordered[-1 - k]
+
+    def calibration(self, deadzone_low: float = 0.03, deadzone_high: float = 0.03,
+                    expo: float = 0.0) -> ChannelCalibration:
+        raw_min, raw_max = self.range()
+        usable = 1.0 - deadzone_low - deadzone_high
+        points = []
+        for raw, output in self.points:
+            x = (raw - raw_min) / (raw_max - raw_min)
+            points.append(((x - deadzone_low) / usable, output))
+        return ChannelCalibration(raw_min, raw_max, deadzone_low, deadzone_high, expo,
+                                  [p for p in points if 0.0 < p[0] < 1.0])
+
+
+# ---- Calibration interactive ------------------------------------------
+
+def _read_for(pico, channel: int, seconds: float) -> List[int]:
+    values: List[int] = []
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        raw = pico.read_raw(channel)
+        if raw is not None:
+            values.append(raw)
+        time.sleep(0.005)
+    return values
+
+
+def main() -> int:
+    from pico_handler import PicoHandler
+    from utils import get_config
+
+    parser = argparse.ArgumentParser(description="Calibration ADC d'un panneau")
+    parser.add_argument("profile", help="Fichier profil JSON (créé ou mis à jour)")
+    parser.add_argument("--channel", type=int, help="Canal ADC (défaut : throttle)")
+    parser.add_argument("--panel", help="Nom du panneau")
+    parser.add_argument("--sweep-s", type=float, default=8.0, help="Durée du balayage butée à butée")
+    parser.add_argument("--points", default="", help="Sorties des positions repères, ex. 0.25,0.5,0.75")
+    parser.add_argument("--deadzone", type=float, default=3.0, help="Deadzone aux butées (%%)")
+    parser.add_argument("--expo", type=float, default=0.0, help="Courbe expo 0..1")
+    args = parser.parse_args()
+
+    pcfg = get_config().get("hardware", {}).get("pico", {})
+    channel = args.channel if args.channel is not None else pcfg.get("adc_channel_throttle", 0)
+    pico = PicoHandler(port=pcfg.get("port", "/dev/ttyACM0"), adc_channel=channel)
+    if not pico.connect():
+        print(f"✗ Pico non connecté: {pico.last_error}")
+        return 1
+
+    try:
+        profile = CalibrationProfile.load(args.profile)
+    except FileNotFoundError:
+        profile = CalibrationProfile()
+    if args.panel:
+        profile.panel = args.panel
+
+    cal = Calibrator()
+    input(f"[CALIB] Canal {channel} : Entrée, puis balayez le levier de butée à butée "
+          f"pendant {args.sweep_s:g}s...")
+    for raw in _read_for(pico, channel, args.sweep_s):
+        cal.feed(raw)
+    raw_min, raw_max = cal.range()
+    print(f"[CALIB] Course : {raw_min} → {raw_max} ({len(cal.samples)} échantillons)")
+
+    for output in [float(v) for v in args.points.split(",") if v.strip()]:
+        input(f"[CALIB] Placez le levier sur le repère {output:.0%} puis Entrée...")
+        cal.add_point(_read_for(pico, channel, 0.5), output)
+    pico.disconnect()
+
+    dz = args.deadzone / 100.0
+    profile.channels[channel] = cal.calibration(dz, dz, args.expo)
+    profile.save(args.profile)
+    print(f"[CALIB] ✓ Profil '{profile.panel}' enregistré : {args.profile}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Async Runtime - Mode d'exécution à boucle asyncio unique.
+
+Alternative au découpage un-thread-par-sous-système de main.py : serveur
+WebSocket, cadencement de la télémétrie, rafraîchissement GPIO et
+dispatch des commandes kRPC sont des tâches d'une seule boucle asyncio.
+Les appels bloquants sont confinés à des exécuteurs bornés :
+
+- `workers` threads partagés (kRPC : télémétrie, commandes ; requêtes
+  d'historique du serveur WebSocket via l'exécuteur par défaut) ;
+- un thread dédié par tâche `dedicated` (picod garde sa connexion dans un
+  threading.local : connexion et adc_read doivent partager un thread).
+
+Restent hors de la boucle, car propres aux bibliothèques : le thread de
+streams du client kRPC, le thread de notification pigpio et celui de
+button_edges (qui ne font que déposer fronts et commandes), ainsi que les
+superviseurs de connexion kRPC (tentatives bornées par des timeouts TCP,
+qui ne doivent pas occuper un worker partagé).
+"""
+
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from command_worker import CommandWorker
+from loop_scheduler import DeadlineScheduler
+
+
+class AsyncRuntime:
+    """Boucle asyncio unique + exécuteurs bornés pour les appels bloquants."""
+
+    def __init__(self, workers: int = 2):
+        self.workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="capsule-io")
+        self._dedicated: List[ThreadPoolExecutor] = []
+        # (échéancier, fonction bloquante, exécuteur, préparation)
+        self._periodic: List[Tuple[DeadlineScheduler, Callable[[], None], Executor, Optional[Callable]]] = []
+        self._commands: Optional[CommandWorker] = None
+        self._services: List[Callable[[], Awaitable[None]]] = []
+
+    # ---- Déclaration des tâches ---------------------------------------
+
+    def add_periodic(
+        self,
+        scheduler: DeadlineScheduler,
+        fn: Callable[[], None],
+        dedicated: bool = False,
+        setup: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """`fn` (bloquante) à chaque échéance de `scheduler`.
+
+        `dedicated` : exécutée dans un thread qui lui est propre, où
+        `setup` est d'abord appelée une fois.
+        """
+        executor: Executor = self._pool
+        if dedicated:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"capsule-{scheduler.name}")
+            self._dedicated.append(executor)
+        self._periodic.append((scheduler, fn, executor, setup))
+
+    def add_commands(self, worker: CommandWorker) -> None:
+        """Consomme la file `worker` depuis la boucle (au lieu de son thread)."""
+        self._commands = worker
+
+    def add_service(self, factory: Callable[[], Awaitable[None]]) -> None:
+        """Coroutine longue durée (ex. WebSocketServer.serve)."""
+        self._services.append(factory)
+
+    # ---- Exécution -----------------------------------------------------
+
+    async def _periodic_task(self, scheduler, fn, executor, setup) -> None:
+        loop = asyncio.get_running_loop()
+        if setup is not None:
+            await loop.run_in_executor(executor, setup)
+        await scheduler.run_async(lambda: loop.run_in_executor(executor, fn))
+
+    async def _command_task(self, worker: CommandWorker) -> None:
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        worker.attach(lambda: loop.call_soon_threadsafe(ready.set))
+        ready.set()  # commandes déposées avant attach()
+        while True:
+            await ready.wait()
+            ready.clear()
+            while await loop.run_in_executor(self._pool, worker.run_next):
+                pass
+
+    async def main(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Requêtes d'historique du serveur WS : même exécuteur borné.
+        loop.set_default_executor(self._pool)
+        tasks = [asyncio.ensure_future(factory()) for factory in self._services]
+        tasks += [asyncio.ensure_future(self._periodic_task(*job)) for job in self._periodic]
+        if self._commands is not None:
+            tasks.append(asyncio.ensure_future(self._command_task(self._commands)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def run(self, duration: Optional[float] = None) -> None:
+        """Bloque jusqu'à Ctrl-C (ou pendant `duration` secondes)."""
+        try:
+            if duration is None:
+                asyncio.run(self.main())
+            else:
+                asyncio.run(asyncio.wait_for(self.main(), duration))
+        except asyncio.TimeoutError:
+            pass
+        except KeyboardInterrupt:
+            print("\n[MAIN] Ctrl-C")
+        finally:
+            if self._commands is not None:
+                self._commands.stop()
+            for executor in self._dedicated:
+                executor.shutdown(wait=True)
+            self._pool.shutdown(wait=True)
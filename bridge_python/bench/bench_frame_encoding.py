@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark encodage trames : JSON vs binaire (capsule.bin.v1).
+
+Mesure le coût encode + decode par trame et la taille en octets, sur un
+document de télémétrie représentatif (4 étages). Le décodage Python sert
+d'estimation relative du coût côté Godot (JSON.parse_string vs
+PackedByteArray.decode_*).
+
+Usage:
+    python bench/bench_frame_encoding.py            # 20000 trames
+    python bench/bench_frame_encoding.py -n 100000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import telemetry_binary
+
+
+SAMPLE = {
+    "connected": True,
+    "altitude": 12345.678,
+    "speed": 812.25,
+    "vertical_speed": 95.5,
+    "g_force": 1.85,
+    "temperature": 251.3,
+    "apoapsis": 684512.0,
+    "periapsis": 412890.0,
+    "apoapsis_time": 145.2,
+    "periapsis_time": 1873.9,
+    "current_stage": 3,
+    "engines_active": True,
+    "ascending": True,
+    "stages": [
+        {"stage": 3, "fuel_percent": 62.4, "attached": True,
+         "propellants": {"LiquidFuel": 62.1, "Oxidizer": 62.6}},
+        {"stage": 2, "fuel_percent": 100.0, "attached": True,
+         "propellants": {"LiquidFuel": 100.0, "Oxidizer": 100.0}},
+        {"stage": 1, "fuel_percent": 100.0, "attached": True,
+         "propellants": {"SolidFuel": 100.0}},
+        {"stage": 0, "fuel_percent": 0.0, "attached": True, "propellants": {}},
+    ],
+}
+
+
+def _time_per_frame(fn, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def run(n: int) -> dict:
+    def json_roundtrip():
+        json.loads(json.dumps(SAMPLE))
+
+    def bin_roundtrip():
+        telemetry_binary.decode(telemetry_binary.encode(SAMPLE, 1))
+
+    json_msg = json.dumps(SAMPLE)
+    bin_msg = telemetry_binary.encode(SAMPLE, 1)
+    return {
+        "frames": n,
+        "json": {
+            "encode_us": _time_per_frame(lambda: json.dumps(SAMPLE), n) * 1e6,
+            "roundtrip_us": _time_per_frame(json_roundtrip, n) * 1e6,
+            "bytes": len(json_msg.encode("utf-8")),
+        },
+        "binary": {
+            "encode_us": _time_per_frame(lambda: telemetry_binary.encode(SAMPLE, 1), n) * 1e6,
+            "roundtrip_us": _time_per_frame(bin_roundtrip, n) * 1e6,
+            "bytes": len(bin_msg),
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=20000, help="Nombre de trames")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args()
+
+    res = run(args.n)
+    if args.json:
+        print(json.dumps(res, indent=2))
+        return 0
+    print(f"{'format':8} {'encode µs':>10} {'enc+dec µs':>11} {'octets':>7}")
+    for name in ("json", "binary"):
+        r = res[name]
+        print(f"{name:8} {r['encode_us']:10.2f} {r['roundtrip_us']:11.2f} {r['bytes']:7d}")
+    ratio = res["json"]["bytes"] / res["binary"]["bytes"]
+    print(f"Binaire : {ratio:.1f}× plus compact")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""Suite de benchmarks bout-en-bout du bridge (sans KSP ni Raspberry).
+
+Tout tourne en local : kRPC est le serveur simulé (sim/), les GPIO la
+MockFactory de gpiozero. Scénarios :
+
+- telemetry : durée et gigue du tick de la boucle télémétrie, RPC/tick
+- commands  : latence callback GPIO → commande appliquée côté kRPC
+- rebind    : connexion, changement de vaisseau (rebind, interruption télémétrie)
+- channels  : latence des commandes sous charge télémétrie, connexion
+              partagée vs canal commandes dédié
+- broadcast : débit de diffusion WebSocket selon le nombre de clients
+- encoding  : coût d'encodage JSON / binaire par trame
+- memory    : croissance mémoire sur un vol simulé d'une heure
+- runtime   : gigue des ticks télémétrie/GPIO, runtime threads vs asyncio
+
+Sortie JSON (métriques à plat "scenario.metrique") ; --baseline compare à
+un résultat précédent et sort en erreur si une métrique régresse au-delà
+de sa tolérance (voir RULES).
+
+Usage:
+    python bench/run_suite.py --quick                       # ~30 s
+    python bench/run_suite.py --out bench/results.json      # suite complète
+    python bench/run_suite.py --baseline bench/results.json # contrôle de régression
+    python bench/run_suite.py -s telemetry -s commands
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory, MockPWMPin
+
+import bench_frame_encoding
+import ws_load_test
+from async_runtime import AsyncRuntime
+from gpio_handler import GPIOHandler
+from krpc_handler import KRPCHandler
+from loop_scheduler import DeadlineScheduler
+from main import gpio_loop, gpio_setup, gpio_tick, telemetry_loop, telemetry_tick
+from sim import KRPCStandIn, NetworkProfile
+from telemetry_delta import DeltaEncoder
+from telemetry_history import REQUIRED_FIELDS as HISTORY_REQUIRED_FIELDS
+from telemetry_history import TelemetryHistory
+from websocket_server import WebSocketServer
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / "config.json"
+
+# Métrique → (sens, tolérance relative, tolérance absolue). "lower" : plus
+# petit = mieux. Les tolérances absolues évitent les faux positifs sur des
+# valeurs proches de zéro (bruit de l'ordonnanceur).
+RULES: Dict[str, tuple] = {
+    "telemetry.tick_p50_ms": ("lower", 0.25, 0.2),
+    "telemetry.tick_p99_ms": ("lower", 0.50, 1.0),
+    "telemetry.jitter_p99_ms": ("lower", 0.50, 2.0),
+    "telemetry.rpc_per_tick": ("lower", 0.10, 0.05),
+    "telemetry.rate_hz": ("higher", 0.05, 0.5),
+    "commands.sas_p50_ms": ("lower", 0.30, 0.5),
+    "commands.sas_p99_ms": ("lower", 0.50, 2.0),
+    "commands.ag_p50_ms": ("lower", 0.30, 0.5),
+    "commands.ag_p99_ms": ("lower", 0.50, 2.0),
+    "commands.sas_edge_p99_ms": ("lower", 0.50, 2.0),
+    "commands.ag_edge_p99_ms": ("lower", 0.50, 2.0),
+    "rebind.connect_ms": ("lower", 0.50, 20.0),
+    "rebind.rebind_p50_ms": ("lower", 0.50, 10.0),
+    "rebind.blackout_max_ms": ("lower", 0.50, 50.0),
+    "channels.dedicated_p99_ms": ("lower", 0.50, 2.0),
+    "broadcast.rate_hz_min_max_clients": ("higher", 0.10, 1.0),
+    "broadcast.frames_per_s_max_clients": ("higher", 0.10, 20.0),
+    "encoding.json_encode_us": ("lower", 0.25, 1.0),
+    "encoding.binary_encode_us": ("lower", 0.25, 0.5),
+    "memory.growth_kb": ("lower", 0.50, 256.0),
+    "runtime.asyncio_telemetry_jitter_p99_ms": ("lower", 0.50, 2.0),
+    "runtime.asyncio_gpio_jitter_p99_ms": ("lower", 0.50, 2.0),
+}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _start_sim(latency_ms: float, **kwargs) -> KRPCStandIn:
+    return KRPCStandIn(
+        rpc_port=0, stream_port=0, network=NetworkProfile(latency_ms, latency_ms / 4, seed=1), **kwargs
+    ).start()
+
+
+def _launch(sim: KRPCStandIn) -> None:
+    with sim.vessel.lock:
+        sim.vessel.throttle = 1.0
+    sim.vessel.toggle_action_group(1)
+
+
+def _connect(sim: KRPCStandIn, **kwargs) -> KRPCHandler:
+    krpc = KRPCHandler(
+        host="127.0.0.1", rpc_port=sim.rpc_port, stream_port=sim.stream_port, **kwargs
+    )
+    if not krpc.connect():
+        raise RuntimeError("connexion au kRPC simulé impossible")
+    return krpc
+
+
+# ---- Scénarios --------------------------------------------------------
+
+
+def bench_telemetry(args) -> Dict[str, float]:
+    """Boucle télémétrie à 20 Hz (échéances absolues) contre le kRPC simulé."""
+    sim = _start_sim(args.latency_ms)
+    krpc = _connect(sim)
+    _launch(sim)
+    hz = 20
+    interval = 1.0 / hz
+    duration = 3.0 if args.quick else 10.0
+    # Préchauffe : ouverture des streams d'étages, premières valeurs.
+    for _ in range(5):
+        krpc.update_telemetry()
+        time.sleep(interval)
+
+    rpc_start = sim.rpc_count
+    durations, starts = [], []
+    next_tick = time.perf_counter()
+    end = next_tick + duration
+    while next_tick < end:
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        t0 = time.perf_counter()
+        starts.append(t0 - next_tick)
+        krpc.update_telemetry()
+        durations.append(time.perf_counter() - t0)
+        next_tick += interval
+    ticks = len(durations)
+    rpc = sim.rpc_count - rpc_start
+    krpc.disconnect()
+    sim.stop()
+    return {
+        "ticks": ticks,
+        "rate_hz": ticks / duration,
+        "tick_p50_ms": _percentile(durations, 0.50) * 1000.0,
+        "tick_p99_ms": _percentile(durations, 0.99) * 1000.0,
+        "tick_max_ms": max(durations) * 1000.0,
+        "jitter_p99_ms": _percentile(starts, 0.99) * 1000.0,
+        "rpc_per_tick": rpc / ticks,
+    }
+
+
+def bench_commands(args) -> Dict[str, float]:
+    """Latence front GPIO (MockFactory) → état appliqué dans le kRPC simulé."""
+    Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        gpio_cfg = dict(json.load(f)["hardware"]["gpio"], use_remote=False)
+    sim = _start_sim(args.latency_ms)
+    krpc = _connect(sim)
+    krpc.commands.start()
+    gpio = GPIOHandler(krpc=krpc, pico=None, config=gpio_cfg)
+
+    sas_pin = next(p for p, a in gpio.leviers_cfg.items() if a == "SAS")
+    ag_pin, ag_action = next(
+        (p, a) for p, a in gpio.boutons_cfg.items() if a.get("type") == "ag"
+    )
+    group = int(ag_action["value"]) % 10
+    n = 20 if args.quick else 100
+
+    def measure(press: Callable[[], None], applied: Callable[[], bool]) -> float:
+        t0 = time.perf_counter()
+        press()
+        while not applied():
+            if time.perf_counter() - t0 > 2.0:
+                raise RuntimeError("commande jamais appliquée")
+            time.sleep(0.0002)
+        return time.perf_counter() - t0
+
+    sas, ag = [], []
+    for i in range(n):
+        lever = gpio.leviers[sas_pin].pin
+        want = i % 2 == 0
+        # Levier pull-up : fermé (bas) = ON, sauf levier inversé.
+        on_low = not gpio._lever_inverted.get(sas_pin, False)
+        drive = lever.drive_low if want == on_low else lever.drive_high
+        sas.append(measure(drive, lambda: sim.vessel.sas == want))
+
+        before = sim.vessel.action_groups[group]
+        button = gpio.boutons[ag_pin].pin
+        ag.append(measure(button.drive_low, lambda: sim.vessel.action_groups[group] != before))
+        button.drive_high()
+        time.sleep(0.03)  # > debounce_ms
+
+    # Front matériel (horodaté par EdgeCapture) → ack kRPC, par entrée.
+    edge = krpc.commands.input_latency_summary()
+    gpio.cleanup()
+    krpc.disconnect()
+    sim.stop()
+    Device.pin_factory = None
+    return {
+        "samples": n,
+        "sas_p50_ms": _percentile(sas, 0.50) * 1000.0,
+        "sas_p99_ms": _percentile(sas, 0.99) * 1000.0,
+        "ag_p50_ms": _percentile(ag, 0.50) * 1000.0,
+        "ag_p99_ms": _percentile(ag, 0.99) * 1000.0,
+        "sas_edge_p99_ms": edge.get("SAS", {}).get("p99_ms", 0.0),
+        "ag_edge_p99_ms": edge.get(ag_action.get("name", ""), {}).get("p99_ms", 0.0),
+    }
+
+
+def bench_rebind(args) -> Dict[str, float]:
+    """Connexion puis retours au lancement successifs, boucle télémétrie à 20 Hz."""
+    sim = _start_sim(args.latency_ms)
+    t0 = time.perf_counter()
+    krpc = _connect(sim)
+    connect_s = time.perf_counter() - t0
+    interval = 0.05
+    rebinds, blackouts = [], []
+    for _ in range(3 if args.quick else 10):
+        _launch(sim)
+        for _ in range(5):
+            krpc.update_telemetry()
+            time.sleep(interval)
+        krpc.last_rebind = None
+        sim.vessel.reset()
+        end = time.monotonic() + 5.0
+        while krpc.last_rebind is None and time.monotonic() < end:
+            krpc.update_telemetry()
+            time.sleep(interval)
+        if krpc.last_rebind is None:
+            raise RuntimeError("changement de vaisseau non détecté")
+        rebinds.append(krpc.last_rebind["rebind_ms"])
+        blackouts.append(krpc.last_rebind["blackout_ms"])
+    reconnects = krpc.connect_count - 1
+    krpc.disconnect()
+    sim.stop()
+    return {
+        "connect_ms": connect_s * 1000.0,
+        "rebind_p50_ms": _percentile(rebinds, 0.50),
+        "rebind_max_ms": max(rebinds),
+        "blackout_p50_ms": _percentile(blackouts, 0.50),
+        "blackout_max_ms": max(blackouts),
+        "reconnects": reconnects,
+    }
+
+
+def _throttle_under_load(args, dedicated: bool) -> Dict[str, float]:
+    """Consignes throttle pendant qu'un thread enchaîne ticks télémétrie et
+    lectures RPC du carburant par étage ; latence dépôt → appliqué."""
+    # Sans latence réseau, pas de file d'attente observable sur la socket.
+    sim = _start_sim(max(args.latency_ms, 2.0))
+    krpc = _connect(sim, command_channel=dedicated)
+    krpc.commands.start()
+    _launch(sim)
+    stop = threading.Event()
+    load_ops = [0]
+
+    def load() -> None:
+        while not stop.is_set():
+            krpc.update_telemetry()
+            krpc.get_stages_fuel()
+            load_ops[0] += 1
+
+    loader = threading.Thread(target=load, daemon=True)
+    loader.start()
+    time.sleep(0.2)
+    samples = []
+    t_start = time.perf_counter()
+    for i in range(30 if args.quick else 200):
+        value = 0.25 if i % 2 else 0.75
+        t0 = time.perf_counter()
+        krpc.set_throttle(value)
+        while sim.vessel.throttle != value:
+            if time.perf_counter() - t0 > 2.0:
+                raise RuntimeError("consigne throttle jamais appliquée")
+            time.sleep(0.0002)
+        samples.append(time.perf_counter() - t0)
+        # Dépôts désynchronisés des cycles de charge.
+        time.sleep(0.005 + 0.003 * (i % 5))
+    elapsed = time.perf_counter() - t_start
+    stop.set()
+    loader.join()
+    krpc.disconnect()
+    sim.stop()
+    mode = "dedicated" if dedicated else "shared"
+    return {
+        f"{mode}_p50_ms": _percentile(samples, 0.50) * 1000.0,
+        f"{mode}_p99_ms": _percentile(samples, 0.99) * 1000.0,
+        f"{mode}_load_ops_per_s": load_ops[0] / elapsed,
+    }
+
+
+def bench_channels(args) -> Dict[str, float]:
+    """Tête de file : commandes sur la connexion télémétrie vs canal dédié."""
+    out: Dict[str, float] = {"samples": 30 if args.quick else 200}
+    out.update(_throttle_under_load(args, dedicated=False))
+    out.update(_throttle_under_load(args, dedicated=True))
+    out["p99_speedup"] = out["shared_p99_ms"] / max(out["dedicated_p99_ms"], 1e-6)
+    return out
+
+
+def bench_broadcast(args) -> Dict[str, float]:
+    """Diffusion WebSocket à 20 Hz pour un nombre croissant de clients."""
+    hz = 20
+    counts = (1, 20) if args.quick else (1, 10, 50, 200)
+    duration = 1.5 if args.quick else 3.0
+    out: Dict[str, float] = {}
+    for i, n in enumerate(counts):
+        port = args.port + i
+        server = WebSocketServer(
+            krpc=ws_load_test.SyntheticTelemetry(hz), host="127.0.0.1", port=port, update_hz=hz
+        )
+        threading.Thread(target=server.start, daemon=True).start()
+        time.sleep(0.3)
+        results = asyncio.run(
+            ws_load_test._run_clients(f"ws://127.0.0.1:{port}", n, 0, duration)
+        )
+        ok = [r for r in results if "error" not in r]
+        out[f"rate_hz_min_{n}"] = min((r["rate_hz"] for r in ok), default=0.0)
+        out[f"frames_per_s_{n}"] = sum(r["frames"] for r in ok) / duration
+        out[f"errors_{n}"] = len(results) - len(ok)
+    top = counts[-1]
+    out["rate_hz_min_max_clients"] = out[f"rate_hz_min_{top}"]
+    out["frames_per_s_max_clients"] = out[f"frames_per_s_{top}"]
+    return out
+
+
+def bench_encoding(args) -> Dict[str, float]:
+    res = bench_frame_encoding.run(5000 if args.quick else 20000)
+    return {
+        "json_encode_us": res["json"]["encode_us"],
+        "json_bytes": res["json"]["bytes"],
+        "binary_encode_us": res["binary"]["encode_us"],
+        "binary_bytes": res["binary"]["bytes"],
+    }
+
+
+def bench_memory(args) -> Dict[str, float]:
+    """Une heure de ticks à 20 Hz (72000) au pas de course, vol accéléré.
+
+    Chaîne complète côté bridge : update_telemetry → publication →
+    historique → delta + JSON comme la diffusion. Mesure tracemalloc hors
+    allocations du simulateur.
+    """
+    flight_s = 300.0 if args.quick else 3600.0
+    ticks = int(flight_s * 20)
+    sim = _start_sim(0.0, time_scale=50.0)
+    krpc = _connect(sim)
+    history = TelemetryHistory(window_s=3600.0, sample_hz=5.0)
+    krpc.require_fields("history", HISTORY_REQUIRED_FIELDS)
+    krpc.add_snapshot_listener(history.append)
+    delta = DeltaEncoder()
+    _launch(sim)
+
+    def tick():
+        krpc.update_telemetry()
+        snap = krpc.snapshot()
+        frame = delta.update(snap.data)
+        if frame is not None:
+            json.dumps(frame)
+
+    for _ in range(200):
+        tick()
+    tracemalloc.start()
+    sim_dir = Path(sys.modules[KRPCStandIn.__module__].__file__).parent
+    filters = [tracemalloc.Filter(False, str(sim_dir / "*"))]
+    base = tracemalloc.take_snapshot().filter_traces(filters)
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        tick()
+    elapsed = time.perf_counter() - t0
+    end = tracemalloc.take_snapshot().filter_traces(filters)
+    tracemalloc.stop()
+    growth = sum(stat.size_diff for stat in end.compare_to(base, "filename"))
+    krpc.disconnect()
+    sim.stop()
+    return {
+        "ticks": ticks,
+        "simulated_flight_s": flight_s,
+        "wall_s": elapsed,
+        "growth_kb": growth / 1024.0,
+        "history_kb": history.nbytes / 1024.0,
+    }
+
+
+def _runtime_mode(args, mode: str, port: int) -> Dict[str, float]:
+    """Bridge complet (kRPC simulé, GPIO mock, WS + clients, commandes) dans
+    le runtime `mode` ; gigue des boucles télémétrie et GPIO."""
+    hz = 20
+    duration = 3.0 if args.quick else 10.0
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        gpio_cfg = dict(json.load(f)["hardware"]["gpio"], use_remote=False)
+    Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+    sim = _start_sim(args.latency_ms)
+    krpc = _connect(sim)
+    _launch(sim)
+    gpio = GPIOHandler(krpc=krpc, pico=None, config=gpio_cfg)
+    ws = WebSocketServer(krpc=krpc, host="127.0.0.1", port=port, update_hz=hz)
+    telem = DeadlineScheduler(f"bench-{mode}-telemetry", hz)
+    gpio_sched = DeadlineScheduler(f"bench-{mode}-gpio", hz)
+
+    # Clients WebSocket dans un autre processus (pas de GIL partagé).
+    clients = subprocess.Popen(
+        [sys.executable, str(Path(__file__).parent / "ws_load_test.py"), "--url",
+         f"ws://127.0.0.1:{port}", "-c", "20", "-d", str(duration - 0.5), "--json"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # Commandes discrètes comme les callbacks gpiozero, depuis un autre thread.
+    stop = threading.Event()
+
+    def press() -> None:
+        on = False
+        while not stop.wait(0.05):
+            on = not on
+            krpc.set_sas(on)
+
+    presser = threading.Thread(target=press, daemon=True)
+
+    if mode == "asyncio":
+        runtime = AsyncRuntime(workers=2)
+        runtime.add_service(ws.serve)
+        runtime.add_periodic(telem, lambda: telemetry_tick(krpc))
+        runtime.add_periodic(
+            gpio_sched, lambda: gpio_tick(gpio), dedicated=True, setup=lambda: gpio_setup(gpio)
+        )
+        runtime.add_commands(krpc.commands)
+        presser.start()
+        runtime.run(duration)
+    else:
+        krpc.commands.start()
+        threads = [
+            threading.Thread(target=telemetry_loop, args=(krpc, telem, stop)),
+            threading.Thread(target=gpio_loop, args=(gpio, gpio_sched, stop)),
+            threading.Thread(
+                target=lambda: asyncio.run(asyncio.wait_for(ws.serve(), duration)), daemon=True
+            ),
+            presser,
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(duration)
+    stop.set()
+    presser.join()
+    clients.wait(timeout=10)
+
+    out = {}
+    for name, sched in (("telemetry", telem), ("gpio", gpio_sched)):
+        q = sched.start_delay.quantiles((0.5, 0.99))
+        out[f"{mode}_{name}_jitter_p50_ms"] = q[0.5] * 1000.0
+        out[f"{mode}_{name}_jitter_p99_ms"] = q[0.99] * 1000.0
+        out[f"{mode}_{name}_rate_hz"] = sched.ticks / duration
+    gpio.cleanup()
+    krpc.disconnect()
+    sim.stop()
+    Device.pin_factory = None
+    return out
+
+
+def bench_runtime(args) -> Dict[str, float]:
+    """Même charge dans les deux runtimes : threads (défaut) et asyncio."""
+    out: Dict[str, float] = {}
+    out.update(_runtime_mode(args, "threads", args.port + 50))
+    out.update(_runtime_mode(args, "asyncio", args.port + 51))
+    return out
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "telemetry": bench_telemetry,
+    "commands": bench_commands,
+    "rebind": bench_rebind,
+    "channels": bench_channels,
+    "broadcast": bench_broadcast,
+    "encoding": bench_encoding,
+    "memory": bench_memory,
+    "runtime": bench_runtime,
+}
+
+
+# ---- Régressions ------------------------------------------------------
+
+
+def check_regressions(current: Dict[str, float], baseline: Dict[str, float]) -> List[str]:
+    """Liste des métriques qui régressent au-delà de leur tolérance."""
+    failures = []
+    for key, (direction, rel, abs_tol) in RULES.items():
+        if key not in current or key not in baseline:
+            continue
+        cur, ref = current[key], baseline[key]
+        margin = max(abs(ref) * rel, abs_tol)
+        worse = cur > ref + margin if direction == "lower" else cur < ref - margin
+        if worse:
+            failures.append(f"{key}: {cur:.3f} (référence {ref:.3f}, marge {margin:.3f})")
+    return failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scénario à lancer (répétable ; défaut : tous)")
+    parser.add_argument("--quick", action="store_true", help="Durées réduites (CI)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latence kRPC simulée")
+    parser.add_argument("--port", type=int, default=18200, help="Premier port WebSocket")
+    parser.add_argument("--out", help="Écrit le résultat JSON dans ce fichier")
+    parser.add_argument("--baseline", help="Résultat de référence pour le contrôle de régression")
+    parser.add_argument("--json", action="store_true", help="Résultat JSON sur stdout")
+    args = parser.parse_args()
+
+    metrics: Dict[str, float] = {}
+    for name in args.scenario or list(SCENARIOS):
+        print(f"[BENCH] {name}...", file=sys.stderr, flush=True)
+        for key, value in SCENARIOS[name](args).items():
+            metrics[f"{name}.{key}"] = value
+
+    result = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "quick": args.quick,
+            "latency_ms": args.latency_ms,
+        },
+        "metrics": metrics,
+    }
+    failures: List[str] = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = check_regressions(metrics, json.load(f)["metrics"])
+        result["regressions"] = failures
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in metrics.items():
+            print(f"{key:40} {value:12.3f}")
+        for line in failures:
+            print(f"RÉGRESSION {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
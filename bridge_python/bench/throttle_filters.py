@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Banc hors ligne des filtres throttle sur des traces ADC.
+
+Rejoue une trace brute (CSV `t,raw` : secondes, 0-4095) comme le fait le
+bridge : blocs réduits par médiane à la cadence de gpio_loop (`--hz`),
+normalisation 0..1, puis chaque filtre. Pour chaque filtre :
+
+- lag_ms     : retard à mi-course (médiane et max) sur chaque mouvement
+               du levier d'au moins 10 % ;
+- suivi      : erreur absolue moyenne pendant les mouvements ;
+- jitter     : écart-type sortie − référence au repos (unités 0..1) ;
+- emits_per_s: changements qui franchiraient le deadband de sortie au
+               repos (commandes kRPC inutiles).
+
+La référence est la trace lissée sans déphasage (médiane centrée puis
+EMA aller-retour) ; sans trace, une trace synthétique (coups de levier,
+bruit, pics parasites) est générée et sa consigne exacte sert de
+référence.
+
+Usage:
+    python bench/throttle_filters.py                              # synthétique
+    python bench/throttle_filters.py traces/landing.csv -f one_euro:min_cutoff=0.5,beta=20
+    python bench/throttle_filters.py --record traces/landing.csv -d 60   # Pico requis
+"""
+
+import argparse
+import csv
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from throttle_filter import build_filter, parse_spec
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent.parent / "config.json"
+
+DEFAULT_SPECS = [
+    "ema:alpha=0.25",
+    "ema:alpha=0.5",
+    "one_euro:min_cutoff=1,beta=5,d_cutoff=1",
+    "one_euro:min_cutoff=1,beta=20,d_cutoff=5",
+    "one_euro:min_cutoff=0.5,beta=40,d_cutoff=10",
+]
+
+# Mouvement = pente de la référence au-delà de ce seuil (unités/s).
+MOVING_SLOPE = 0.5
+# Recherche du franchissement de mi-course en sortie jusqu'à ce retard.
+MAX_LAG_S = 0.5
+
+Trace = List[Tuple[float, int]]
+
+
+# ---- Traces -----------------------------------------------------------
+
+def load_trace(path: str) -> Trace:
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(float(row["t"]), int(float(row["raw"]))) for row in csv.DictReader(f)]
+
+
+def synthetic_trace(seed: int = 1, rate_hz: float = 250.0) -> Tuple[Trace, List[float]]:
+    """Approche et atterrissage : paliers, coups de levier plein gaz/ralenti,
+    bruit ADC (σ ≈ 6 LSB) et un pic parasite de temps en temps."""
+    rng = random.Random(seed)
+    # (durée s, consigne de fin, durée de la rampe s)
+    script = [(2.0, 0.0, 0.0), (1.5, 1.0, 0.08), (2.0, 0.35, 0.15), (1.5, 0.35, 0.0),
+              (1.0, 0.0, 0.06), (1.5, 0.8, 0.1), (2.0, 0.5, 0.4), (2.0, 0.0, 0.05)]
+    trace: Trace = []
+    clean: List[float] = []
+    t, level = 0.0, 0.0
+    dt = 1.0 / rate_hz
+    for duration, target, ramp in script:
+        start, t_start = level, t
+        while t < t_start + duration:
+            k = 1.0 if ramp == 0 else min(1.0, (t - t_start) / ramp)
+            level = start + (target - start) * k
+            raw = level * 4095 + rng.gauss(0, 6)
+            if rng.random() < 0.004:
+                raw += rng.choice((-1, 1)) * 400
+            trace.append((t, max(0, min(4095, int(raw)))))
+            clean.append(level)
+            t += dt
+    return trace, clean
+
+
+def record_trace(path: str, duration: float, hz: float) -> None:
+    """Enregistre la trace brute du Pico (config.json → hardware.pico)."""
+    from pico_handler import PicoHandler
+
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        pcfg = json.load(f).get("hardware", {}).get("pico", {})
+    pico = PicoHandler(port=pcfg.get("port", "/dev/ttyACM0"),
+                       adc_channel=pcfg.get("adc_channel_throttle", 0))
+    if not pico.connect():
+        raise SystemExit(f"Pico non connecté: {pico.last_error}")
+    interval = 1.0 / hz
+    t0 = time.monotonic()
+    deadline = t0
+    n = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["t", "raw"])
+        while deadline - t0 < duration:
+            raw = pico.read_raw()
+            if raw is not None:
+                writer.writerow([f"{time.monotonic() - t0:.5f}", raw])
+                n += 1
+            deadline += interval
+            time.sleep(max(0.0, deadline - time.monotonic()))
+    pico.disconnect()
+    print(f"{n} échantillons → {path}")
+
+
+# ---- Simulation du bridge --------------------------------------------
+
+def to_ticks(trace: Trace, hz: float, clean: Optional[List[float]] = None):
+    """Blocs médians à `hz` : (t, valeur 0..1, consigne exacte ou None)."""
+    interval = 1.0 / hz
+    ticks = []
+    block: List[int] = []
+    block_clean: List[float] = []
+    end = trace[0][0] + interval
+    for i, (t, raw) in enumerate(trace):
+        if t >= end and block:
+            ticks.append((end, statistics.median_low(block) / 4095.0,
+                          block_clean[-1] if clean is not None else None))
+            block, block_clean = [], []
+            while end <= t:
+                end += interval
+        block.append(raw)
+        if clean is not None:
+            block_clean.append(clean[i])
+    return ticks
+
+
+def zero_phase_reference(values: List[float], alpha: float = 0.3) -> List[float]:
+    """Médiane centrée sur 5 points puis EMA aller-retour : sans retard."""
+    n = len(values)
+    med = [statistics.median(values[max(0, i - 2):i + 3]) for i in range(n)]
+    fwd = med[:]
+    for i in range(1, n):
+        fwd[i] = alpha * med[i] + (1 - alpha) * fwd[i - 1]
+    out = fwd[:]
+    for i in range(n - 2, -1, -1):
+        out[i] = alpha * fwd[i] + (1 - alpha) * out[i + 1]
+    return out
+
+
+def _crossing(times: List[float], values: List[float], lo: int, hi: int, level: float,
+              rising: bool) -> Optional[float]:
+    """Premier franchissement de `level` dans [lo, hi], interpolé."""
+    for i in range(max(1, lo), min(len(values), hi + 1)):
+        a, b = values[i - 1], values[i]
+        if (rising and a < level <= b) or (not rising and a > level >= b):
+            k = (level - a) / (b - a)
+            return times[i - 1] + k * (times[i] - times[i - 1])
+    return None
+
+
+def evaluate(filt, ticks, reference: List[float], hz: float, deadband: float) -> Dict[str, float]:
+    filt.reset()
+    times = [t for t, _, _ in ticks]
+    out = [filt.update(v, t) for t, v, _ in ticks]
+    n = len(out)
+    dt = 1.0 / hz
+    moving = [False] + [abs(reference[i] - reference[i - 1]) / dt > MOVING_SLOPE for i in range(1, n)]
+
+    # Mouvements du levier : suites d'indices en mouvement.
+    runs: List[Tuple[int, int]] = []
+    i = 0
+    while i < n:
+        if moving[i]:
+            j = i
+            while j + 1 < n and moving[j + 1]:
+                j += 1
+            runs.append((i, j))
+            i = j + 1
+        else:
+            i += 1
+
+    # Retard à mi-course de chaque mouvement d'au moins 10 %.
+    lags = []
+    max_lag_ticks = int(MAX_LAG_S * hz)
+    for s, e in runs:
+        a, b = reference[max(0, s - 1)], reference[min(n - 1, e + 1)]
+        if abs(b - a) < 0.1:
+            continue
+        mid = (a + b) / 2.0
+        t_ref = _crossing(times, reference, s - 1, e + 1, mid, b > a)
+        t_out = _crossing(times, out, s - 1, e + 1 + max_lag_ticks, mid, b > a)
+        if t_ref is not None and t_out is not None:
+            lags.append(max(0.0, t_out - t_ref))
+
+    # Repos : ni mouvement dans le quart de seconde avant, ni dans la demi-seconde après.
+    margin = int(0.25 * hz)
+    near_move = set()
+    for k in range(n):
+        if moving[k]:
+            near_move.update(range(max(0, k - margin), min(n, k + 2 * margin)))
+    steady = [k for k in range(n) if k not in near_move]
+    moving_idx = [k for k in range(n) if moving[k]]
+
+    residual = [out[k] - reference[k] for k in steady]
+    steady_set = set(steady)
+    emits = 0
+    last = out[0]
+    for k in range(1, n):
+        if abs(out[k] - last) >= deadband:
+            if k in steady_set:
+                emits += 1
+            last = out[k]
+    steady_s = len(steady) * dt
+    return {
+        "lag_ms": statistics.median(lags) * 1000.0 if lags else 0.0,
+        "lag_max_ms": max(lags) * 1000.0 if lags else 0.0,
+        "tracking_error": (sum(abs(out[k] - reference[k]) for k in moving_idx) / len(moving_idx)
+                           if moving_idx else 0.0),
+        "jitter": statistics.pstdev(residual) if len(residual) > 1 else 0.0,
+        "emits_per_s": emits / steady_s if steady_s else 0.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("traces", nargs="*", help="Traces CSV t,raw (défaut : synthétique)")
+    parser.add_argument("-f", "--filter", action="append", dest="filters",
+                        help="Filtre à comparer, ex. one_euro:min_cutoff=1,beta=5 (répétable)")
+    parser.add_argument("--hz", type=float, default=20.0, help="Cadence gpio_loop simulée")
+    parser.add_argument("--deadband", type=float, help="Deadband de sortie (défaut : config)")
+    parser.add_argument("--record", metavar="CSV", help="Enregistre une trace brute du Pico")
+    parser.add_argument("-d", "--duration", type=float, default=30.0)
+    parser.add_argument("--record-hz", type=float, default=250.0)
+    parser.add_argument("--json", action="store_true", help="Résultat JSON sur stdout")
+    args = parser.parse_args()
+
+    if args.record:
+        record_trace(args.record, args.duration, args.record_hz)
+        return 0
+
+    with open(CONFIG_PATH, encoding="utf-8") as f:
+        tcfg = json.load(f).get("throttle", {})
+    deadband = args.deadband
+    if deadband is None:
+        deadband = float(tcfg.get("output_deadband_percent", 1.0)) / 100.0
+    filters = [build_filter(tcfg)] + [parse_spec(s) for s in (args.filters or DEFAULT_SPECS)]
+
+    if args.traces:
+        sources = []
+        for path in args.traces:
+            ticks = to_ticks(load_trace(path), args.hz)
+            sources.append((path, ticks, zero_phase_reference([v for _, v, _ in ticks])))
+    else:
+        trace, clean = synthetic_trace()
+        ticks = to_ticks(trace, args.hz, clean)
+        sources = [("synthétique", ticks, [c for _, _, c in ticks])]
+
+    results = []
+    for name, ticks, reference in sources:
+        for i, filt in enumerate(filters):
+            row = {"trace": name, "filter": repr(filt) + (" [config]" if i == 0 else "")}
+            row.update(evaluate(filt, ticks, reference, args.hz, deadband))
+            results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'trace':14} {'filtre':52} {'lag ms':>7} {'max ms':>7} {'suivi':>7} "
+          f"{'gigue':>8} {'émis/s':>7}")
+    for r in results:
+        print(f"{r['trace'][:14]:14} {r['filter'][:52]:52} {r['lag_ms']:7.0f} {r['lag_max_ms']:7.0f} "
+              f"{r['tracking_error']:7.4f} {r['jitter']:8.5f} {r['emits_per_s']:7.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Test de charge du broadcaster WebSocket.
+
+Lance un WebSocketServer local alimenté par une télémétrie synthétique
+(ou vise un bridge existant avec --url), ouvre N clients et mesure la
+cadence reçue par client. Option --slow : une partie des clients ne lit
+plus ses messages, pour vérifier qu'ils ne ralentissent pas les autres.
+
+Usage:
+    python bench/ws_load_test.py                       # 200 clients, 10 s, 20 Hz
+    python bench/ws_load_test.py -c 50 -d 5 --slow 5
+    python bench/ws_load_test.py --url ws://127.0.0.1:8080 -c 20
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import websockets
+
+from telemetry_snapshot import TelemetrySnapshot
+from websocket_server import WebSocketServer
+
+
+class SyntheticTelemetry:
+    """Source d'instantanés qui imite KRPCHandler.snapshot() en vol."""
+
+    def __init__(self, hz: float):
+        self.hz = hz
+        self._start = time.monotonic()
+        self._snapshot = TelemetrySnapshot.disconnected(0)
+
+    def snapshot(self) -> TelemetrySnapshot:
+        t = time.monotonic() - self._start
+        seq = int(t * self.hz) + 1
+        if seq != self._snapshot.seq:
+            self._snapshot = TelemetrySnapshot(seq, {
+                "connected": True,
+                "altitude": 100.0 * t,
+                "speed": 50.0 + t,
+                "vertical_speed": 40.0 * math.cos(t / 10.0),
+                "g_force": 1.2,
+                "temperature": 280.0,
+                "apoapsis": 600000.0 + 500.0 * t,
+                "periapsis": 100.0,
+                "apoapsis_time": 60.0,
+                "periapsis_time": 0.0,
+                "current_stage": 3,
+                "engines_active": True,
+                "ascending": True,
+                "stages": [
+                    {"stage": 3 - i, "fuel_percent": max(0.0, 100.0 - t), "attached": True}
+                    for i in range(4)
+                ],
+            })
+        return self._snapshot
+
+
+async def _client(url: str, duration: float, slow: bool, out: list) -> None:
+    arrivals = []
+    try:
+        async with websockets.connect(url, max_queue=4) as ws:
+            end = time.monotonic() + duration
+            while time.monotonic() < end:
+                if slow:
+                    # Ne lit plus : le serveur doit le laisser tomber sans
+                    # pénaliser les autres.
+                    await asyncio.sleep(0.5)
+                    continue
+                try:
+                    await asyncio.wait_for(ws.recv(), timeout=max(0.01, end - time.monotonic()))
+                except asyncio.TimeoutError:
+                    break
+                arrivals.append(time.monotonic())
+    except Exception as e:
+        out.append({"slow": slow, "error": str(e), "frames": len(arrivals)})
+        return
+    gaps = [b - a for a, b in zip(arrivals, arrivals[1:])]
+    out.append({
+        "slow": slow,
+        "frames": len(arrivals),
+        "rate_hz": len(arrivals) / duration,
+        "max_gap_ms": max(gaps) * 1000.0 if gaps else None,
+    })
+
+
+async def _run_clients(url: str, n: int, n_slow: int, duration: float) -> list:
+    results: list = []
+    await asyncio.gather(*(
+        _client(url, duration, i < n_slow, results) for i in range(n)
+    ))
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--clients", type=int, default=200)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    parser.add_argument("--hz", type=int, default=20, help="Cadence du serveur local")
+    parser.add_argument("--slow", type=int, default=0, help="Nombre de clients qui ne lisent pas")
+    parser.add_argument("--url", help="Bridge existant (sinon serveur local)")
+    parser.add_argument("--port", type=int, default=18090)
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args()
+
+    url = args.url
+    server = None
+    if url is None:
+        server = WebSocketServer(
+            krpc=SyntheticTelemetry(args.hz), host="127.0.0.1", port=args.port, update_hz=args.hz
+        )
+        threading.Thread(target=server.start, daemon=True).start()
+        time.sleep(0.5)
+        url = f"ws://127.0.0.1:{args.port}"
+
+    results = asyncio.run(_run_clients(url, args.clients, args.slow, args.duration))
+    normal = [r for r in results if not r["slow"] and "error" not in r]
+    errors = [r for r in results if "error" in r]
+    rates = [r["rate_hz"] for r in normal]
+    gaps = [r["max_gap_ms"] for r in normal if r["max_gap_ms"] is not None]
+    summary = {
+        "clients": args.clients,
+        "slow_clients": args.slow,
+        "duration_s": args.duration,
+        "target_hz": args.hz,
+        "errors": len(errors),
+        "rate_hz_min": min(rates) if rates else 0.0,
+        "rate_hz_mean": statistics.mean(rates) if rates else 0.0,
+        "max_gap_ms_p99": sorted(gaps)[int(len(gaps) * 0.99) - 1] if gaps else None,
+    }
+    if server is not None:
+        stats = server.client_stats()
+        summary["server_dropped_total"] = sum(s["dropped"] for s in stats)
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for key, value in summary.items():
+            print(f"{key:22} {value}")
+    ok = summary["rate_hz_min"] >= 0.9 * args.hz if args.url is None else True
+    return 0 if ok and not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Button Edges - Capture horodatée et sans perte des fronts GPIO.
+
+Les callbacks `when_pressed` de gpiozero (avec `bounce_time`) perdent des
+fronts : deux appuis rapprochés sur un bouton de staging peuvent n'en
+faire qu'un, et l'instant réel de l'appui est inconnu. Ici :
+
+- chaque front est capté au plus bas niveau (`pin.when_changed`) avec les
+  ticks de la factory (pigpio : µs de la Raspi, horodatés par pigpiod) et
+  déposé tel quel dans une deque (append/popleft atomiques : ni verrou ni
+  travail dans le thread de notification pigpio) ;
+- un thread unique les traite dans l'ordre d'arrivée : anti-rebond
+  logiciel par broche, convertit les ticks en horodatage perf_counter
+  local (TickClock) et appelle `on_edge(Edge)` ;
+- un front qui tombe dans la fenêtre d'anti-rebond n'est pas jeté : si la
+  broche est restée dans ce nouvel état à la fin de la fenêtre, il est
+  accepté avec son horodatage d'origine.
+
+L'horodatage `Edge.t` accompagne la commande kRPC déclenchée (origin de
+CommandWorker) : latence front matériel → ack kRPC par bouton.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, NamedTuple, Optional, Tuple
+
+from metrics import REGISTRY
+
+_EDGES = REGISTRY.counter("capsule_gpio_edges_total", "Fronts GPIO acceptés après anti-rebond")
+_FILTERED = REGISTRY.counter("capsule_gpio_edges_filtered_total", "Fronts GPIO écartés (rebonds)")
+_DISPATCH_DELAY = REGISTRY.histogram(
+    "capsule_gpio_edge_dispatch_seconds", "Délai front matériel → traitement par le bridge"
+)
+
+
+class Edge(NamedTuple):
+    pin: int
+    pressed: bool
+    ticks: float  # ticks de la factory (µs pigpio, secondes sinon)
+    t: float      # horodatage perf_counter local estimé du front
+
+
+class TickClock:
+    """Conversion ticks de la factory gpiozero → horloge perf_counter locale.
+
+    Référence (ticks, perf_counter) prise au milieu d'un aller-retour
+    factory.ticks(), rafraîchie toutes les `resync_s` secondes (dérive
+    entre l'horloge de la Raspi et celle du bridge).
+    """
+
+    def __init__(self, factory, resync_s: float = 10.0):
+        self.factory = factory
+        self.resync_s = resync_s
+        self._ref: Tuple[float, float] = (0.0, 0.0)
+        self._synced = float("-inf")
+
+    def sync(self) -> None:
+        t0 = time.perf_counter()
+        ticks = self.factory.ticks()
+        t1 = time.perf_counter()
+        self._ref = (ticks, (t0 + t1) / 2.0)
+        self._synced = t1
+
+    def to_local(self, ticks: float) -> float:
+        if time.perf_counter() - self._synced > self.resync_s:
+            self.sync()
+        ref_ticks, ref_t = self._ref
+        # Les ticks pigpio bouclent sur 32 bits : ticks_diff est modulo, on
+        # retient le plus court des deux sens (front avant ou après la référence).
+        ahead = self.factory.ticks_diff(ticks, ref_ticks)
+        behind = self.factory.ticks_diff(ref_ticks, ticks)
+        return ref_t + (ahead if abs(ahead) <= abs(behind) else -behind)
+
+
+class _PinState:
+    """Anti-rebond d'une broche : état stable accepté + dernier état brut."""
+
+    __slots__ = ("active_low", "debounce", "stable", "accepted_t", "raw", "raw_ticks", "raw_t")
+
+    def __init__(self, active_low: bool, debounce: float, pressed: bool):
+        self.active_low = active_low
+        self.debounce = debounce
+        self.stable = pressed
+        self.accepted_t = float("-inf")
+        self.raw = pressed
+        self.raw_ticks = 0.0
+        self.raw_t = 0.0
+
+
+class _PinTap:
+    """Callback when_changed d'une broche (gpiozero n'en garde qu'une
+    référence faible : EdgeCapture conserve l'objet)."""
+
+    def __init__(self, queue: Deque, wake: threading.Event, number: int):
+        self._queue = queue
+        self._wake = wake
+        self._number = number
+
+    def changed(self, ticks, state) -> None:
+        self._queue.append((self._number, state, ticks))
+        self._wake.set()
+
+
+class EdgeCapture:
+    """Fronts horodatés de boutons gpiozero, traités dans l'ordre par un thread."""
+
+    def __init__(
+        self,
+        on_edge: Callable[[Edge], None],
+        debounce_s: float = 0.02,
+        name: str = "gpio-edges",
+    ):
+        self.on_edge = on_edge
+        self.debounce_s = debounce_s
+        self.name = name
+        self.clock: Optional[TickClock] = None
+
+        self._queue: Deque[Tuple[int, int, float]] = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pins: Dict[int, _PinState] = {}
+        self._taps: Dict[int, _PinTap] = {}
+
+        self.accepted = 0
+        self.filtered = 0
+
+    # ---- Broches -----------------------------------------------------
+
+    def watch(self, number: int, device, debounce_s: Optional[float] = None) -> None:
+        """Capte les fronts du bouton gpiozero `device` (créé avec
+        bounce_time=None) sur la broche `number`.
+
+        Remplace le `when_changed` de sa broche : les événements gpiozero
+        (when_pressed…) de ce bouton ne sont plus appelés, `is_pressed`
+        reste valable.
+        """
+        if self.clock is None:
+            self.clock = TickClock(device.pin_factory)
+        self._pins[number] = _PinState(
+            active_low=bool(device.pull_up),
+            debounce=self.debounce_s if debounce_s is None else debounce_s,
+            pressed=bool(device.is_pressed),
+        )
+        tap = self._taps[number] = _PinTap(self._queue, self._wake, number)
+        device.pin.when_changed = tap.changed
+
+    # ---- Cycle de vie ------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None or self.clock is None:
+            return
+        self.clock.sync()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        timeout: Optional[float] = None
+        while not self._stop.is_set():
+            self._wake.wait(timeout)
+            # clear() avant de vider : un front déposé pendant process()
+            # laisse l'événement levé pour le tour suivant.
+            self._wake.clear()
+            timeout = self.process()
+
+    # ---- Traitement --------------------------------------------------
+
+    def process(self) -> Optional[float]:
+        """Traite les fronts en file, dans l'ordre.
+
+        Retourne le délai (s) avant la fin de la prochaine fenêtre
+        d'anti-rebond à régler, ou None.
+        """
+        queue = self._queue
+        while queue:
+            number, state, ticks = queue.popleft()
+            self._on_raw(number, state, ticks)
+        return self._settle(time.perf_counter())
+
+    def _on_raw(self, number: int, state, ticks: float) -> None:
+        ps = self._pins.get(number)
+        if ps is None:
+            return
+        pressed = not state if ps.active_low else bool(state)
+        t = self.clock.to_local(ticks)
+        ps.raw, ps.raw_ticks, ps.raw_t = pressed, ticks, t
+        if pressed == ps.stable:
+            return
+        if t - ps.accepted_t >= ps.debounce:
+            self._accept(number, ps, pressed, ticks, t)
+        else:
+            self.filtered += 1
+            _FILTERED.inc()
+
+    def _settle(self, now: float) -> Optional[float]:
+        """Fronts retenus par la fenêtre d'anti-rebond : acceptés si la
+        broche est restée dans le nouvel état jusqu'à la fin de la fenêtre."""
+        wait: Optional[float] = None
+        for number, ps in self._pins.items():
+            if ps.raw == ps.stable:
+                continue
+            due = ps.accepted_t + ps.debounce
+            if now >= due:
+                self._accept(number, ps, ps.raw, ps.raw_ticks, ps.raw_t)
+            elif wait is None or due - now < wait:
+                wait = due - now
+        return wait
+
+    def _accept(self, number: int, ps: _PinState, pressed: bool, ticks: float, t: float) -> None:
+        ps.stable = pressed
+        ps.accepted_t = t
+        self.accepted += 1
+        _EDGES.inc()
+        _DISPATCH_DELAY.observe(max(0.0, time.perf_counter() - t))
+        try:
+            self.on_edge(Edge(number, pressed, ticks, t))
+        except Exception as e:
+            print(f"[GPIO] Erreur front pin {number}: {e}")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Command Worker - File de commandes kRPC asynchrone.
+
+Les callbacks gpiozero (thread pigpio) et la boucle GPIO ne parlent plus
+directement à kRPC : ils déposent une commande dans une file à priorité
+consommée par un thread dédié, et reviennent immédiatement.
+
+- Commandes discrètes (AG, staging, train/freins, caméra, SAS/RCS) :
+  prioritaires, exécutées dans l'ordre d'arrivée, jamais fusionnées.
+- Consignes continues (throttle, futurs axes) : fusionnées par clé, seule
+  la dernière valeur est envoyée.
+
+Par défaut la file est consommée par un thread dédié (start()) ; le
+runtime asyncio la pilote lui-même (attach() + run_next()).
+
+La latence dépôt → acquittement kRPC est mesurée pour chaque commande,
+ainsi que la durée de l'appel kRPC lui-même (histogramme metrics.py).
+Une commande déclenchée par une entrée pilote porte son `origin`
+(nom, horodatage du front matériel) : la latence front → ack est alors
+mesurée par entrée. Une commande dont la fonction retourne False n'a pas
+atteint KSP (déconnecté, appel en erreur) : elle est comptée dans
+`failed` et n'entre dans aucune latence.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+PRIORITY_DISCRETE = 0
+PRIORITY_CONTINUOUS = 1
+
+_CALL_HELP = "Durée de l'appel kRPC par commande"
+_LATENCY_HELP = "Latence dépôt → ack kRPC par commande"
+_INPUT_LATENCY_HELP = "Latence front matériel → ack kRPC par entrée pilote"
+
+# (nom de l'entrée, horodatage perf_counter du front)
+Origin = Tuple[str, float]
+
+
+class CommandWorker:
+    """Thread unique qui exécute les commandes kRPC par priorité."""
+
+    def __init__(self, name: str = "krpc-commands", history: int = 256):
+        self.name = name
+        self.history = history
+
+        self._cond = threading.Condition()
+        # Tas de (priorité, ordre, clé) ; la charge utile est dans _pending.
+        self._heap: List[Tuple[int, int, object]] = []
+        # clé → (label, fn, args, t_dépôt, origine)
+        self._pending: Dict[object, Tuple[str, Callable, tuple, float, Optional[Origin]]] = {}
+        self._order = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        # Mode piloté : appelé à chaque dépôt à la place du réveil du thread.
+        self._notify: Optional[Callable[[], None]] = None
+
+        self.latencies: Dict[str, Deque[float]] = {}
+        # label → (durée d'appel, latence dépôt → ack) exportés par metrics.
+        self._histograms: Dict[str, Tuple[object, object]] = {}
+        # entrée pilote → latences front → ack.
+        self.input_latencies: Dict[str, Deque[float]] = {}
+        self._input_histograms: Dict[str, object] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.errors = 0
+        # Commandes qui n'ont pas atteint KSP (fonction retournant False).
+        self.failed = 0
+
+    # ---- Cycle de vie ------------------------------------------------
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def attach(self, notify: Callable[[], None]) -> None:
+        """Mode piloté, sans thread : `notify` est appelé dans le thread qui
+        dépose, le pilote vide ensuite la file par run_next()."""
+        if self._running:
+            return
+        self._notify = notify
+        self._running = True
+
+    def stop(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._running = False
+            self._notify = None
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    # ---- Dépôt -------------------------------------------------------
+
+    def submit(
+        self,
+        label: str,
+        fn: Callable,
+        *args,
+        continuous: bool = False,
+        origin: Optional[Origin] = None,
+    ) -> None:
+        """Dépose une commande. Ne bloque jamais sur kRPC.
+
+        Si le worker n'est pas démarré (scripts de test, outils), la
+        commande est exécutée immédiatement dans le thread appelant.
+        """
+        now = time.perf_counter()
+        if not self._running:
+            self._execute(label, fn, args, now, origin)
+            return
+        with self._cond:
+            if continuous:
+                key: object = label
+                if key in self._pending:
+                    # Déjà en file : on remplace la valeur, la place est conservée.
+                    self._pending[key] = (label, fn, args, now, origin)
+                    self.coalesced += 1
+                    return
+                priority = PRIORITY_CONTINUOUS
+            else:
+                key = next(self._order)
+                priority = PRIORITY_DISCRETE
+            self._pending[key] = (label, fn, args, now, origin)
+            heapq.heappush(self._heap, (priority, next(self._order), key))
+            self._cond.notify()
+            notify = self._notify
+        if notify is not None:
+            notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    # ---- Exécution ---------------------------------------------------
+
+    def run_next(self) -> bool:
+        """Exécute la commande la plus prioritaire (mode piloté).
+
+        Retourne False si la file était vide.
+        """
+        with self._cond:
+            if not self._heap:
+                return False
+            _prio, _order, key = heapq.heappop(self._heap)
+            label, fn, args, enqueued, origin = self._pending.pop(key)
+        self._execute(label, fn, args, enqueued, origin)
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and not self._heap:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                _prio, _order, key = heapq.heappop(self._heap)
+                label, fn, args, enqueued, origin = self._pending.pop(key)
+            self._execute(label, fn, args, enqueued, origin)
+
+    def _execute(
+        self, label: str, fn: Callable, args: tuple, enqueued: float, origin: Optional[Origin]
+    ) -> None:
+        t0 = time.perf_counter()
+        try:
+            acked = fn(*args)
+        except Exception as e:
+            self.errors += 1
+            print(f"[CMD] Erreur {label}: {e}")
+            return
+        if acked is False:
+            self.failed += 1
+            return
+        done = time.perf_counter()
+        self.executed += 1
+        lat = self.latencies.get(label)
+        if lat is None:
+            lat = self.latencies[label] = deque(maxlen=self.history)
+            labels = {"command": label}
+            self._histograms[label] = (
+                REGISTRY.histogram("capsule_command_call_seconds", _CALL_HELP, labels),
+                REGISTRY.histogram("capsule_command_latency_seconds", _LATENCY_HELP, labels),
+            )
+        lat.append(done - enqueued)
+        call_hist, latency_hist = self._histograms[label]
+        call_hist.observe(done - t0)
+        latency_hist.observe(done - enqueued)
+        if origin is not None:
+            self._record_input(origin, done)
+
+    def _record_input(self, origin: Origin, done: float) -> None:
+        name, captured = origin
+        lat = self.input_latencies.get(name)
+        if lat is None:
+            lat = self.input_latencies[name] = deque(maxlen=self.history)
+            self._input_histograms[name] = REGISTRY.histogram(
+                "capsule_input_latency_seconds", _INPUT_LATENCY_HELP, {"input": name}
+            )
+        lat.append(done - captured)
+        self._input_histograms[name].observe(done - captured)
+
+    # ---- Statistiques ------------------------------------------------
+
+    def latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """Latence dépôt → ack par commande (ms) sur les `history` derniers envois."""
+        return self._summarize(self.latencies)
+
+    def input_latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """Latence front matériel → ack par entrée pilote (ms)."""
+        return self._summarize(self.input_latencies)
+
+    @staticmethod
+    def _summarize(latencies: Dict[str, Deque[float]]) -> Dict[str, Dict[str, float]]:
+        summary: Dict[str, Dict[str, float]] = {}
+        for label, values in list(latencies.items()):
+            ordered = sorted(values)
+            if not ordered:
+                continue
+            n = len(ordered)
+            summary[label] = {
+                "count": n,
+                "p50_ms": ordered[n // 2] * 1000.0,
+                "p99_ms": ordered[min(n - 1, int(n * 0.99))] * 1000.0,
+                "max_ms": ordered[-1] * 1000.0,
+            }
+        return summary
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Flight Recorder - Enregistreur de vol et rejeu.
+
+Enregistrement : chaque instantané publié par KRPCHandler et chaque
+entrée pilote (bouton, levier, throttle) est ajouté à un journal binaire
+append-only par un thread dédié. Les producteurs (thread télémétrie,
+callbacks gpiozero) ne font qu'un put_nowait dans une file bornée.
+
+Format du journal :
+
+    en-tête fichier : b"CAPLOG1\\n"
+    enregistrement  : u8 type, pad, u16 longueur, f64 t (time.time()),
+                      puis `longueur` octets de charge utile
+    type 1 (instantané) : trame telemetry_binary v1 (seq inclus), suivie
+                          si l'instantané les contient des commandes de bord :
+                          u8 drapeaux (bit0 sas, bit1 rcs, bit2 gear,
+                          bit3 brakes, bit4 lights, bit5 abort), u8 nombre
+                          d'action groups G, u16 masque des action groups
+    type 2 (entrée)     : u8 source, pad, i16 pin, f32 valeur, nom UTF-8
+
+Rejeu : FlightLog lit le journal via mmap (pas de chargement complet),
+ReplaySource imite KRPCHandler pour le WebSocketServer et la logique LED,
+et replay() réinjecte les enregistrements à 1×, N× ou vitesse max.
+"""
+
+import mmap
+import queue
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple, Optional, Tuple, Union
+
+import telemetry_binary
+from telemetry_snapshot import TelemetrySnapshot
+
+MAGIC = b"CAPLOG1\n"
+
+KIND_SNAPSHOT = 1
+KIND_INPUT = 2
+
+SOURCE_BUTTON = 1
+SOURCE_LEVER = 2
+SOURCE_THROTTLE = 3
+SOURCES = {"button": SOURCE_BUTTON, "lever": SOURCE_LEVER, "throttle": SOURCE_THROTTLE}
+SOURCE_NAMES = {v: k for k, v in SOURCES.items()}
+
+_RECORD = struct.Struct("<BxHd")
+_INPUT = struct.Struct("<Bxhf")
+_CONTROLS = struct.Struct("<BBH")
+
+# Commandes de bord absentes de la trame WS v1 : ordre des bits de drapeaux.
+CONTROL_FLAGS = ("sas", "rcs", "gear", "brakes", "lights", "abort")
+
+
+class InputEvent(NamedTuple):
+    source: str  # "button" | "lever" | "throttle"
+    pin: int
+    value: float
+    name: str
+
+
+class Record(NamedTuple):
+    kind: int
+    t: float
+    item: Union[TelemetrySnapshot, InputEvent]
+
+
+# ---- Enregistrement ---------------------------------------------------
+
+
+class FlightRecorder:
+    """Journal append-only écrit par un thread de fond."""
+
+    def __init__(self, path: Union[str, Path], max_queue: int = 10000, flush_s: float = 1.0):
+        self.path = Path(path)
+        self.flush_s = flush_s
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        # Source attachée (KRPCHandler) : champs réservés jusqu'à stop().
+        self._source = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="flight-recorder", daemon=True)
+        self._thread.start()
+        print(f"[REC] Enregistrement → {self.path}")
+
+    def attach(self, source) -> None:
+        """S'abonne aux instantanés de `source` et réserve tous les champs.
+
+        Sans cette réservation, l'élagage des streams ne garderait que les
+        champs des autres consommateurs et le journal enregistrerait des
+        zéros indiscernables de vraies valeurs.
+        """
+        source.require_fields("recorder", None)
+        source.add_snapshot_listener(self.record_snapshot)
+        self._source = source
+
+    def stop(self, timeout: float = 2.0) -> None:
+        if self._source is not None:
+            self._source.release_fields("recorder")
+            self._source = None
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        print(f"[REC] Arrêt ({self.written} enregistrements, {self.dropped} perdus)")
+
+    # Producteurs : ne bloquent jamais, l'encodage se fait dans le thread.
+
+    def _put(self, item: Tuple) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def record_snapshot(self, snapshot: TelemetrySnapshot) -> None:
+        """Listener KRPCHandler.add_snapshot_listener."""
+        self._put((KIND_SNAPSHOT, snapshot.timestamp, snapshot))
+
+    def record_input(self, source: str, pin: int, name: str, value: float) -> None:
+        """Hook GPIOHandler.on_input."""
+        self._put((KIND_INPUT, time.time(), (source, pin, name, value)))
+
+    # Thread d'écriture.
+
+    @staticmethod
+    def _encode(kind: int, t: float, item) -> bytes:
+        if kind == KIND_SNAPSHOT:
+            payload = telemetry_binary.encode(item.data, item.seq) + _encode_controls(item.data)
+        else:
+            source, pin, name, value = item
+            payload = _INPUT.pack(SOURCES[source], pin, float(value)) + name.encode("utf-8")
+        return _RECORD.pack(kind, len(payload), t) + payload
+
+    def _run(self) -> None:
+        new = not self.path.exists() or self.path.stat().st_size == 0
+        with open(self.path, "ab") as f:
+            if new:
+                f.write(MAGIC)
+            last_flush = time.monotonic()
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_s)
+                except queue.Empty:
+                    item = ()
+                if item is None:
+                    break
+                if item:
+                    try:
+                        f.write(self._encode(*item))
+                        self.written += 1
+                    except Exception as e:
+                        print(f"[REC] Erreur encodage: {e}")
+                if time.monotonic() - last_flush >= self.flush_s:
+                    f.flush()
+                    last_flush = time.monotonic()
+
+
+def _encode_controls(data) -> bytes:
+    """Suffixe commandes de bord ; vide si l'instantané n'en a pas."""
+    if not any(k in data for k in CONTROL_FLAGS + ("action_groups",)):
+        return b""
+    flags = 0
+    for bit, key in enumerate(CONTROL_FLAGS):
+        if data.get(key):
+            flags |= 1 << bit
+    groups = list(data.get("action_groups") or [])[:16]
+    mask = 0
+    for bit, on in enumerate(groups):
+        if on:
+            mask |= 1 << bit
+    return _CONTROLS.pack(flags, len(groups), mask)
+
+
+# ---- Lecture ----------------------------------------------------------
+
+
+def _decode_snapshot(payload: bytes, t: float) -> TelemetrySnapshot:
+    # Longueur de la trame v1 : en-tête fixe + N étages (octet 2).
+    size = telemetry_binary.HEADER_SIZE + payload[2] * telemetry_binary.STAGE_SIZE
+    data = telemetry_binary.decode(payload[:size])
+    seq = data.pop("seq")
+    if len(payload) >= size + _CONTROLS.size:
+        flags, n_groups, mask = _CONTROLS.unpack_from(payload, size)
+        for bit, key in enumerate(CONTROL_FLAGS):
+            data[key] = bool(flags & (1 << bit))
+        data["action_groups"] = [bool(mask & (1 << bit)) for bit in range(n_groups)]
+    return TelemetrySnapshot(seq, data, timestamp=t)
+
+
+class FlightLog:
+    """Lecture d'un journal via mmap ; itère des Record dans l'ordre."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[: len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Journal invalide: {self.path}")
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> "FlightLog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[Record]:
+        buf = self._map
+        off = len(MAGIC)
+        end = len(buf)
+        while off + _RECORD.size <= end:
+            kind, length, t = _RECORD.unpack_from(buf, off)
+            off += _RECORD.size
+            if off + length > end:
+                break  # dernier enregistrement tronqué (arrêt brutal)
+            payload = buf[off : off + length]
+            off += length
+            if kind == KIND_SNAPSHOT:
+                yield Record(kind, t, _decode_snapshot(payload, t))
+            elif kind == KIND_INPUT:
+                source, pin, value = _INPUT.unpack_from(payload, 0)
+                name = payload[_INPUT.size :].decode("utf-8", "replace")
+                yield Record(kind, t, InputEvent(SOURCE_NAMES.get(source, "?"), pin, value, name))
+
+
+# ---- Rejeu ------------------------------------------------------------
+
+
+class ReplaySource:
+    """Remplace KRPCHandler pendant un rejeu : publie les instantanés du
+    journal et absorbe les commandes (aucun KSP derrière).
+    """
+
+    def __init__(self):
+        self.connected = True
+        self.sas_state = False
+        self.rcs_state = False
+        self.throttle_state = 0.0
+        self._snapshot = TelemetrySnapshot.disconnected(0)
+        self._snapshot_listeners: Tuple[Callable[[TelemetrySnapshot], None], ...] = ()
+        self.on_vessel_changed: Optional[Callable[[], None]] = None
+
+    # API lecture de KRPCHandler.
+
+    def snapshot(self) -> TelemetrySnapshot:
+        return self._snapshot
+
+    def changed_since(self, seq: int) -> bool:
+        return self._snapshot.seq != seq
+
+    def get_telemetry(self):
+        return dict(self._snapshot.data)
+
+    def require_fields(self, owner, fields) -> None:
+        pass  # le journal contient déjà tout
+
+    def release_fields(self, owner) -> None:
+        pass
+
+    def add_snapshot_listener(self, listener: Callable[[TelemetrySnapshot], None]) -> None:
+        self._snapshot_listeners = self._snapshot_listeners + (listener,)
+
+    def publish(self, snapshot: TelemetrySnapshot) -> None:
+        self._snapshot = snapshot
+        for listener in self._snapshot_listeners:
+            listener(snapshot)
+
+    # Commandes : état local seulement.
+
+    def set_throttle(self, value: float) -> None:
+        self.throttle_state = value
+
+    def set_sas(self, enabled: bool, origin=None) -> None:
+        self.sas_state = enabled
+
+    def set_rcs(self, enabled: bool, origin=None) -> None:
+        self.rcs_state = enabled
+
+    def trigger_action_group(self, group: int, origin=None) -> None:
+        pass
+
+    def toggle_gear_and_brakes(self, origin=None) -> None:
+        pass
+
+    def toggle_map_camera(self, origin=None) -> None:
+        pass
+
+
+def replay(
+    log: FlightLog,
+    source: ReplaySource,
+    on_input: Optional[Callable[[InputEvent], None]] = None,
+    speed: float = 1.0,
+    stop_event: Optional[threading.Event] = None,
+) -> int:
+    """Rejoue le journal. speed=1 temps réel, N = N× plus vite, 0 = max.
+
+    Les instantanés sont publiés sur `source` ; les entrées pilote passent
+    par `on_input` (ex. GPIOHandler.replay_input). Retourne le nombre
+    d'enregistrements rejoués.
+    """
+    start_wall = time.monotonic()
+    start_log: Optional[float] = None
+    count = 0
+    for record in log:
+        if stop_event is not None and stop_event.is_set():
+            break
+        if start_log is None:
+            start_log = record.t
+        if speed > 0:
+            # Échéance absolue : pas de dérive sur un long rejeu.
+            delay = start_wall + (record.t - start_log) / speed - time.monotonic()
+            if delay > 0:
+                if stop_event is not None:
+                    if stop_event.wait(delay):
+                        break
+                else:
+                    time.sleep(delay)
+        if record.kind == KIND_SNAPSHOT:
+            source.publish(record.item)
+        elif on_input is not None:
+            on_input(record.item)
+        count += 1
+    return count
@@ -2,13 +2,25 @@
 """
 GPIO Handler - Entrées/sorties Raspberry Pi.
 
-Lit boutons et leviers (event-driven via gpiozero callbacks), pilote les
-LEDs (PWM pour la luminosité), déclenche les actions kRPC.
+Lit boutons et leviers (fronts horodatés, voir button_edges), pilote les
+LEDs (PWM pour la luminosité, envoi groupé par différence une fois par
+tick, voir led_framebuffer), déclenche les actions kRPC. Les LEDs
+couvertes par `led_rules` suivent des règles sur la télémétrie (voir
+led_rules) ; les autres gardent la logique historique ci-dessous.
 Toute la config vient de config.json (section hardware.gpio).
+
+Chaque commande déclenchée par un bouton ou un levier porte l'horodatage
+de son front matériel : latence front → ack kRPC par entrée
+(capsule_input_latency_seconds).
+
+Chaque entrée pilote (bouton, levier, consigne throttle) est signalée au
+hook optionnel `on_input(source, pin, name, value)` (enregistreur de vol) ;
+replay_input() réinjecte une entrée enregistrée.
 """
 
 import sys
-from typing import Dict, Optional
+import time
+from typing import Callable, Dict, Optional
 
 try:
     from gpiozero import PWMLED, Button
@@ -17,6 +29,14 @@ except ImportError:
     print("✗ Module 'gpiozero' requis: pip install gpiozero pigpio")
     sys.exit(1)
 
+from button_edges import Edge, EdgeCapture
+from command_worker import Origin
+from led_framebuffer import LedFramebuffer, PigpioBatchWriter
+from led_rules import DERIVED_FIELDS, LedRuleEngine
+from metrics import REGISTRY
+
+_UPDATE_TIME = REGISTRY.histogram("capsule_gpio_update_seconds", "Durée de GPIOHandler.update")
+
 
 def _coerce_int_keys(d: Dict) -> Dict:
     """Les clés JSON sont des strings, on les convertit en int."""
@@ -43,6 +63,16 @@ def _parse_leviers(raw: Dict) -> (Dict[int, str], Dict[int, bool]):
     return names, inverted
 
 
+def _debounce_overrides(*sections: Dict) -> Dict[int, float]:
+    """`debounce_ms` propre à une entrée (forme objet) → secondes par pin."""
+    out: Dict[int, float] = {}
+    for raw in sections:
+        for pin_str, value in raw.items():
+            if isinstance(value, dict) and "debounce_ms" in value:
+                out[int(pin_str)] = float(value["debounce_ms"]) / 1000.0
+    return out
+
+
 class GPIOHandler:
     """Gère les GPIO de la Raspberry Pi et les actions associées."""
 
@@ -72,6 +102,16 @@ class GPIOHandler:
 
         self.leviers_cfg, self._lever_inverted = _parse_leviers(config.get("leviers", {}))
         self.boutons_cfg = _coerce_int_keys(config.get("boutons", {}))
+        brightness = {
+            **{pin: self.red_brightness for pin in self.leds_rouges_cfg},
+            **{pin: self.green_brightness for pin in self.leds_vertes_cfg},
+        }
+        self.led_rules = LedRuleEngine.from_config(config.get("led_rules", []), brightness)
+        if self.led_rules.rules and krpc is not None and hasattr(krpc, "require_fields"):
+            krpc.require_fields("led_rules", self.led_rules.payload_fields())
+        # Anti-rebond logiciel : global + surcharges par entrée.
+        self.debounce_s = float(config.get("debounce_ms", 20)) / 1000.0
+        self._debounce_by_pin = _debounce_overrides(config.get("leviers", {}), config.get("boutons", {}))
 
         self.factory = None
         self.connected = False
@@ -80,14 +120,17 @@ class GPIOHandler:
         self.leds_green: Dict[int, PWMLED] = {}
         self.leviers: Dict[int, Button] = {}
         self.boutons: Dict[int, Button] = {}
+        self.edges = EdgeCapture(self._on_edge, debounce_s=self.debounce_s)
+        # Image des LEDs : écrite par la logique, envoyée par update().
+        self.leds = LedFramebuffer()
 
         # LED rouge par nom d'action (ex: "STAGE_BOOSTERS" → pin 24).
         self._red_led_by_name: Dict[str, int] = {}
         # État "allumée" (True) / "éteinte" (False) pour chaque LED rouge.
         self._red_on: Dict[int, bool] = {}
-        self._sas_on = False
-        self._rcs_on = False
         self._throttle_lever_prev: Optional[bool] = None
+        # Hook entrées pilote : (source, pin, nom, valeur).
+        self.on_input: Optional[Callable[[str, int, str, float], None]] = None
 
         self._connect_factory()
         if self.connected:
@@ -104,6 +147,9 @@ class GPIOHandler:
             except Exception as e:
                 print(f"[GPIO] Erreur pigpio ({self.raspi_ip}): {e}")
                 self.connected = False
+                return
+            # Une commande socket pigpio par LED et par tick sinon.
+            self.leds = LedFramebuffer(PigpioBatchWriter(self.factory.connection))
         else:
             self.connected = True
             print("[GPIO] Mode GPIO local")
@@ -112,9 +158,9 @@ class GPIOHandler:
         for pin, action_name in self.leds_rouges_cfg.items():
             try:
                 led = PWMLED(pin, pin_factory=self.factory, active_high=self.red_active_high)
+                self.leds.add(pin, led, self.red_brightness)
                 self.leds_red[pin] = led
                 self._red_on[pin] = True
-                led.value = self.red_brightness
                 if isinstance(action_name, str):
                     self._red_led_by_name[action_name] = pin
             except Exception as e:
@@ -123,27 +169,30 @@ class GPIOHandler:
         for pin, role in self.leds_vertes_cfg.items():
             try:
                 led = PWMLED(pin, pin_factory=self.factory, active_high=self.green_active_high)
-                led.value = 0.0
+                self.leds.add(pin, led, 0.0)
                 self.leds_green[pin] = led
             except Exception as e:
                 print(f"[GPIO] LED verte {pin}: {e}")
+        self.leds.flush()
 
-        for pin, action in self.leviers_cfg.items():
+        # Pas de bounce_time gpiozero : l'anti-rebond est fait par
+        # EdgeCapture, qui ne perd ni ne retarde aucun front.
+        for pin in self.leviers_cfg:
             try:
-                btn = Button(pin, pull_up=True, pin_factory=self.factory, bounce_time=0.02)
-                btn.when_pressed = self._make_lever_callback(pin, action, True)
-                btn.when_released = self._make_lever_callback(pin, action, False)
+                btn = Button(pin, pull_up=True, pin_factory=self.factory, bounce_time=None)
+                self.edges.watch(pin, btn, self._debounce_by_pin.get(pin))
                 self.leviers[pin] = btn
             except Exception as e:
                 print(f"[GPIO] Levier {pin}: {e}")
 
-        for pin, action in self.boutons_cfg.items():
+        for pin in self.boutons_cfg:
             try:
-                btn = Button(pin, pull_up=True, pin_factory=self.factory, bounce_time=0.02)
-                btn.when_pressed = self._make_button_callback(pin, action)
+                btn = Button(pin, pull_up=True, pin_factory=self.factory, bounce_time=None)
+                self.edges.watch(pin, btn, self._debounce_by_pin.get(pin))
                 self.boutons[pin] = btn
             except Exception as e:
                 print(f"[GPIO] Bouton {pin}: {e}")
+        self.edges.start()
 
         print(
             f"[GPIO] {len(self.leds_red)} LED rouges (PWM dim {self.red_brightness:.2f}), "
@@ -162,51 +211,77 @@ class GPIOHandler:
                 f"is_pressed={btn.is_pressed} inverted={inv} → ON={self._lever_is_on(pin)}"
             )
 
-    # ---- Callbacks event-driven --------------------------------------
-
-    def _make_button_callback(self, pin: int, action: Dict):
-        def _cb():
-            self._dispatch_button(pin, action)
-        return _cb
+    # ---- Fronts (thread EdgeCapture, dans l'ordre) -------------------
 
-    def _make_lever_callback(self, pin: int, action: str, pressed_raw: bool):
-        def _cb():
-            inverted = self._lever_inverted.get(pin, False)
-            on = (not pressed_raw) if inverted else pressed_raw
-            print(f"[GPIO] Levier {action}: {'ON' if on else 'OFF'}")
-            if action == "SAS" and self.krpc:
-                self.krpc.set_sas(on)
-            elif action == "RCS" and self.krpc:
-                self.krpc.set_rcs(on)
-            # THROTTLE_CONTROL : la boucle _update_throttle (20 Hz) détecte
-            # la transition via _throttle_lever_prev et pousse la bonne valeur.
-        return _cb
-
-    def _dispatch_button(self, pin: int, action: Dict) -> None:
+    def _on_edge(self, edge: Edge) -> None:
+        action = self.boutons_cfg.get(edge.pin)
+        if action is not None:
+            if edge.pressed:
+                name = action.get("name", "")
+                self._emit_input("button", edge.pin, name, 1.0)
+                self._dispatch_button(edge.pin, action, origin=(name or f"pin{edge.pin}", edge.t))
+            return
+        lever = self.leviers_cfg.get(edge.pin)
+        if lever is not None:
+            inverted = self._lever_inverted.get(edge.pin, False)
+            on = (not edge.pressed) if inverted else edge.pressed
+            self._emit_input("lever", edge.pin, lever, 1.0 if on else 0.0)
+            self._apply_lever(lever, on, origin=(lever, edge.t))
+
+    def _apply_lever(self, action: str, on: bool, origin: Optional[Origin] = None) -> None:
+        print(f"[GPIO] Levier {action}: {'ON' if on else 'OFF'}")
+        if action == "SAS" and self.krpc:
+            self.krpc.set_sas(on, origin=origin)
+        elif action == "RCS" and self.krpc:
+            self.krpc.set_rcs(on, origin=origin)
+        # THROTTLE_CONTROL : la boucle _update_throttle (20 Hz) détecte
+        # la transition via _throttle_lever_prev et pousse la bonne valeur.
+
+    def _emit_input(self, source: str, pin: int, name: str, value: float) -> None:
+        hook = self.on_input
+        if hook is None:
+            return
+        try:
+            hook(source, pin, name, value)
+        except Exception as e:
+            print(f"[GPIO] Erreur hook entrée: {e}")
+
+    def replay_input(self, event) -> None:
+        """Réinjecte une entrée enregistrée (flight_recorder.InputEvent)."""
+        if event.source == "button":
+            action = self.boutons_cfg.get(event.pin)
+            if action is not None:
+                self._dispatch_button(event.pin, action)
+        elif event.source == "lever":
+            action = self.leviers_cfg.get(event.pin, event.name)
+            self._apply_lever(action, event.value >= 0.5)
+        elif event.source == "throttle" and self.krpc:
+            self.krpc.set_throttle(event.value)
+
+    def _dispatch_button(self, pin: int, action: Dict, origin: Optional[Origin] = None) -> None:
         if not self.krpc:
             return
         atype = action.get("type")
         name = action.get("name", "")
         if atype == "ag":
             value = int(action["value"])
-            self.krpc.trigger_action_group(value % 10)
+            self.krpc.trigger_action_group(value % 10, origin=origin)
             # Si ce bouton correspond à une LED rouge, on l'éteint (PWM → 0).
             self._turn_off_red_led(name)
         elif atype == "gear_brakes":
-            self.krpc.toggle_gear_and_brakes()
+            self.krpc.toggle_gear_and_brakes(origin=origin)
         elif atype == "map_toggle":
-            self.krpc.toggle_map_camera()
+            self.krpc.toggle_map_camera(origin=origin)
         else:
             print(f"[GPIO] Action inconnue sur pin {pin}: {action}")
 
     def _turn_off_red_led(self, action_name: str) -> None:
         pin = self._red_led_by_name.get(action_name)
-        if pin is None:
+        if pin is None or pin in self.led_rules.pins:
             return
-        led = self.leds_red.get(pin)
-        if led is None or not self._red_on.get(pin, False):
+        if pin not in self.leds_red or not self._red_on.get(pin, False):
             return
-        led.value = 0.0
+        self.leds.set(pin, 0.0)
         self._red_on[pin] = False
         print(f"[GPIO] LED rouge {action_name} (pin {pin}) éteinte")
 
@@ -217,9 +292,12 @@ class GPIOHandler:
         les LEDs rouges, pousse l'état des leviers vers kRPC.
         """
         print("[GPIO] Resync vaisseau : LEDs rouges rallumées, leviers poussés")
-        for pin, led in self.leds_red.items():
-            led.value = self.red_brightness
+        for pin in self.leds_red:
+            if pin in self.led_rules.pins:
+                continue
+            self.leds.set(pin, self.red_brightness)
             self._red_on[pin] = True
+        self.led_rules.reset()
         self._push_lever_states()
 
     def _push_lever_states(self) -> None:
@@ -248,8 +326,12 @@ class GPIOHandler:
     def update(self) -> None:
         if not self.connected:
             return
+        t0 = time.perf_counter()
         self._update_throttle()
         self._update_green_leds()
+        self._update_led_rules()
+        self.leds.flush()
+        _UPDATE_TIME.observe(time.perf_counter() - t0)
 
     def _lever_is_on(self, pin: int) -> bool:
         """État logique du levier : applique l'inversion si configurée."""
@@ -277,7 +359,7 @@ class GPIOHandler:
         # la prochaine transition OFF→ON reparte proprement.
         if not active:
             if self.krpc.throttle_state != 0.0:
-                self.krpc.set_throttle(0.0)
+                self._set_throttle(0.0)
             if self._throttle_lever_prev is not False:
                 self.pico.reset_emit()
                 self._throttle_lever_prev = False
@@ -287,7 +369,7 @@ class GPIOHandler:
         # immédiatement la valeur courante du pot, sans attendre un mouvement.
         if self._throttle_lever_prev is not True:
             value = self.pico.get_throttle()
-            self.krpc.set_throttle(value)
+            self._set_throttle(value)
             self.pico.sync_emit(value)
             self._throttle_lever_prev = True
             return
@@ -295,35 +377,57 @@ class GPIOHandler:
         # Régime établi : on ne pousse que sur changement au-delà du deadband.
         new_value = self.pico.get_throttle_if_changed()
         if new_value is not None:
-            self.krpc.set_throttle(new_value)
+            self._set_throttle(new_value)
+
+    def _set_throttle(self, value: float) -> None:
+        self._emit_input("throttle", -1, "THROTTLE", value)
+        self.krpc.set_throttle(value)
 
     def _update_green_leds(self) -> None:
-        if not self.krpc or not self.krpc.connected:
+        # Instantané publié : pas de verrou kRPC dans la boucle GPIO.
+        # État streamé depuis KSP : suit aussi le clavier et le SAS coupé par le jeu.
+        snapshot = self.krpc.snapshot() if self.krpc else None
+        if snapshot is None or not snapshot.connected:
             return
         for pin, role in self.leds_vertes_cfg.items():
-            led = self.leds_green.get(pin)
-            if led is None:
+            if pin not in self.leds_green or pin in self.led_rules.pins:
                 continue
             if role == "SAS":
-                self._set_green(led, self.krpc.sas_state, "_sas_on")
+                self._set_green(pin, bool(snapshot.get("sas")))
             elif role == "RCS":
-                self._set_green(led, self.krpc.rcs_state, "_rcs_on")
+                self._set_green(pin, bool(snapshot.get("rcs")))
+
+    def _set_green(self, pin: int, wanted: bool) -> None:
+        # Le framebuffer n'envoie que les changements.
+        self.leds.set(pin, self.green_brightness if wanted else 0.0)
 
-    def _set_green(self, led: PWMLED, wanted: bool, attr: str) -> None:
-        current = getattr(self, attr)
-        if wanted == current:
+    def _update_led_rules(self) -> None:
+        """Réévalue les règles dont un champ d'entrée a changé."""
+        engine = self.led_rules
+        if not engine.rules:
             return
-        led.value = self.green_brightness if wanted else 0.0
-        setattr(self, attr, wanted)
+        data = self.krpc.snapshot().data if self.krpc else {}
+        values = {field: self._led_input(field, data) for field in engine.fields}
+        for pin, (effect, level, period_s, duty) in engine.update(values).items():
+            if effect == "blink":
+                self.leds.blink(pin, level, period_s, duty)
+            else:
+                self.leds.set(pin, level)
+
+    def _led_input(self, field: str, data: Dict):
+        derived = DERIVED_FIELDS.get(field)
+        if derived is not None:
+            return derived[1](data)
+        return data.get(field)
 
     # ---- Cleanup -----------------------------------------------------
 
     def cleanup(self) -> None:
+        self.edges.stop()
         try:
-            for led in self.leds_red.values():
-                led.value = 0.0
-            for led in self.leds_green.values():
-                led.value = 0.0
+            for pin in self.leds.pins:
+                self.leds.set(pin, 0.0)
+            self.leds.flush()
             print("[GPIO] LEDs éteintes")
         except Exception as e:
             print(f"[GPIO] Erreur cleanup: {e}")
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+KRPC Connection - Connexion kRPC bornée dans le temps et sa supervision.
+
+Le client Python kRPC n'a aucun timeout : `krpc.connect()` vers un PC de
+jeu injoignable bloque pendant tout le timeout TCP du système, et une
+socket fermée par le serveur fait tourner `receive_message` en boucle
+(recv → b'' indéfiniment) — l'appel RPC ne rend jamais la main. Ici :
+
+- `open_client` : mêmes échanges que krpc.connect(), avec un timeout de
+  connexion TCP, un délai max de réponse RPC et le keepalive TCP activé
+  (liaison coupée sans fermeture détectée par le noyau, sans trafic
+  applicatif) ; une fermeture lève une erreur au lieu de boucler ;
+- `client_alive` : keepalive sans RPC (thread des streams vivant, socket
+  RPC non fermée) ;
+- `ConnectionSupervisor` : thread unique qui (re)connecte avec backoff
+  exponentiel à gigue et vérifie la liaison, pendant que le reste du
+  bridge sert l'instantané « déconnecté » sans jamais attendre ;
+- `CommandChannel` : connexion RPC dédiée aux commandes pilote, à côté de
+  celle de la télémétrie, avec son propre verrou et sa propre supervision.
+"""
+
+import random
+import select
+import socket
+import threading
+import time
+from typing import Callable, Optional
+
+from krpc.client import Client
+from krpc.connection import Connection
+from krpc.decoder import Decoder
+from krpc.error import ConnectionError as KRPCConnectionError
+from krpc.schema.KRPC_pb2 import ConnectionRequest, ConnectionResponse
+
+
+class BoundedConnection(Connection):
+    """Connection kRPC avec timeouts et détection de fermeture."""
+
+    def __init__(self, address: str, port: int, connect_timeout_s: float,
+                 io_timeout_s: Optional[float], keepalive_s: float = 2.0):
+        super().__init__(address, port)
+        self.connect_timeout_s = connect_timeout_s
+        # None : pas de délai max (connexion stream, silencieuse au repos).
+        self.io_timeout_s = io_timeout_s
+        self.keepalive_s = keepalive_s
+
+    def connect(self) -> None:
+        sock = socket.create_connection((self._address, self._port), timeout=self.connect_timeout_s)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        _enable_tcp_keepalive(sock, self.keepalive_s)
+        sock.settimeout(self.io_timeout_s)
+        self._socket = sock
+
+    def close(self) -> None:
+        if self._socket is not None:
+            try:
+                # Réveille un recv bloqué dans un autre thread.
+                self._socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._socket.close()
+
+    def receive_message(self, typ: type):
+        # Toute erreur ferme la socket : une réponse arrivée en retard
+        # serait sinon lue comme celle de l'appel suivant.
+        try:
+            deadline = None if self.io_timeout_s is None else time.monotonic() + self.io_timeout_s
+            data = b""
+            while True:
+                chunk = self.partial_receive(1)
+                if not chunk:
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise socket.timeout("kRPC: pas de réponse")
+                    continue
+                data += chunk
+                try:
+                    size = Decoder.decode_message_size(data)
+                    break
+                except IndexError:
+                    pass
+            data = self.receive(size)
+        except OSError:
+            self.close()
+            raise
+        return Decoder.decode_message(data, typ)
+
+    def partial_receive(self, length: int, timeout: float = 0.01) -> bytes:
+        try:
+            ready = select.select([self._socket], [], [], timeout)
+        except ValueError as exn:
+            raise socket.error("Connection closed") from exn
+        if not ready[0]:
+            return b""
+        data = self._socket.recv(length)
+        if not data:
+            raise socket.error("Connection closed")
+        return data
+
+    @property
+    def open(self) -> bool:
+        """Socket non fermée par le pair (lecture non bloquante, sans trafic)."""
+        sock = self._socket
+        if sock is None or sock.fileno() < 0:
+            return False
+        try:
+            ready = select.select([sock], [], [], 0)[0]
+            return not ready or sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) != b""
+        except BlockingIOError:
+            return True
+        except (OSError, ValueError):
+            return False
+
+
+def _enable_tcp_keepalive(sock: socket.socket, idle_s: float) -> None:
+    """Sondes TCP après `idle_s` de silence : ~idle_s + 3 s pour déclarer
+    morte une liaison coupée sans fermeture (câble, veille du PC)."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for name, value in (("TCP_KEEPIDLE", idle_s), ("TCP_KEEPINTVL", 1), ("TCP_KEEPCNT", 3)):
+        if hasattr(socket, name):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), max(1, int(value)))
+
+
+def _handshake(connection: BoundedConnection, request: ConnectionRequest) -> ConnectionResponse:
+    connection.send_message(request)
+    response = connection.receive_message(ConnectionResponse)
+    if response.status != ConnectionResponse.OK:
+        raise KRPCConnectionError(response.message)
+    return response
+
+
+def open_client(
+    name: str,
+    host: str,
+    rpc_port: int,
+    stream_port: Optional[int],
+    connect_timeout_s: float = 3.0,
+    rpc_timeout_s: float = 5.0,
+    keepalive_s: float = 2.0,
+) -> Client:
+    """Équivalent de krpc.connect() dont aucune étape ne bloque au-delà
+    de ses timeouts. `stream_port` None : connexion RPC seule."""
+    rpc = BoundedConnection(host, rpc_port, connect_timeout_s, rpc_timeout_s, keepalive_s)
+    stream = BoundedConnection(host, stream_port, connect_timeout_s, rpc_timeout_s, keepalive_s)
+    try:
+        rpc.connect()
+        request = ConnectionRequest(type=ConnectionRequest.RPC, client_name=name)
+        identifier = _handshake(rpc, request).client_identifier
+        if stream_port is None:
+            return Client(rpc, None)
+        stream.connect()
+        _handshake(stream, ConnectionRequest(type=ConnectionRequest.STREAM, client_identifier=identifier))
+        # Au repos, les streams peuvent rester silencieux indéfiniment.
+        stream.io_timeout_s = None
+        stream._socket.settimeout(None)
+        return Client(rpc, stream)
+    except Exception:
+        rpc.close()
+        stream.close()
+        raise
+
+
+def client_alive(client: Client) -> bool:
+    """Keepalive sans RPC : thread de réception des streams toujours actif
+    (il s'arrête sur fermeture ou erreur de sa socket) et socket RPC
+    ouverte."""
+    thread = getattr(client, "_stream_thread", None)
+    if thread is not None and not thread.is_alive():
+        return False
+    rpc = client._rpc_connection
+    return rpc.open if isinstance(rpc, BoundedConnection) else True
+
+
+def close_client(client: Client, timeout: float = 1.0) -> None:
+    """Ferme les deux sockets sans attendre indéfiniment le thread des streams."""
+    stop = getattr(client, "_stream_thread_stop", None)
+    if stop is not None:
+        stop.set()
+    for connection in (client._rpc_connection, getattr(client, "_stream_connection", None)):
+        if connection is not None:
+            try:
+                connection.close()
+            except OSError:
+                pass
+    thread = getattr(client, "_stream_thread", None)
+    if thread is not None and thread is not threading.current_thread():
+        thread.join(timeout)
+
+
+def on_client(obj, client: Optional[Client]):
+    """`obj` (objet distant) appelé via `client` : les handles d'objets
+    sont globaux côté serveur, aucun RPC pour les transposer."""
+    if client is None or obj is None or obj._client is client:
+        return obj
+    return type(obj)(client, obj._object_id)
+
+
+class CommandChannel:
+    """Connexion RPC seule (sans streams) réservée aux commandes pilote.
+
+    Le serveur kRPC traite les requêtes d'une connexion une à une : sur la
+    connexion télémétrie, une commande attend les requêtes déjà en vol
+    (repli RPC, carburant par étage, ouverture de streams). Ici elle ne
+    partage ni socket ni verrou avec la télémétrie. Même interface que le
+    handler pour ConnectionSupervisor : perdue, elle est rouverte seule,
+    sans toucher à la connexion télémétrie.
+    """
+
+    def __init__(self, name: str, host: str, port: int, connect_timeout_s: float = 3.0,
+                 rpc_timeout_s: float = 5.0, keepalive_s: float = 2.0):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.connect_timeout_s = connect_timeout_s
+        self.rpc_timeout_s = rpc_timeout_s
+        self.keepalive_s = keepalive_s
+        # Sérialise les commandes sur cette connexion (jamais pris avec
+        # le verrou de la télémétrie).
+        self.lock = threading.Lock()
+        self.client: Optional[Client] = None
+        self.connected = False
+        # Appelé avec chaque nouveau client (instrumentation).
+        self.on_open: Optional[Callable[[Client], None]] = None
+
+    def connect(self) -> bool:
+        try:
+            client = open_client(
+                self.name, self.host, self.port, None,
+                self.connect_timeout_s, self.rpc_timeout_s, self.keepalive_s,
+            )
+        except Exception as e:
+            print(f"[KRPC] Canal commandes ✗ {e or type(e).__name__}")
+            return False
+        if self.on_open is not None:
+            self.on_open(client)
+        with self.lock:
+            old, self.client = self.client, client
+            self.connected = True
+        if old is not None:
+            close_client(old)
+        print("[KRPC] Canal commandes ouvert")
+        return True
+
+    def check_alive(self) -> bool:
+        client = self.client
+        return client is not None and client_alive(client)
+
+    def mark_lost(self, reason: str) -> None:
+        """Sans verrou : appelé aussi par une commande en échec, qui le tient."""
+        if not self.connected:
+            return
+        self.connected = False
+        print(f"[KRPC] Canal commandes perdu ({reason}) : repli sur la connexion télémétrie")
+        if self.client is not None:
+            close_client(self.client, timeout=0)
+
+    def close(self) -> None:
+        with self.lock:
+            client, self.client = self.client, None
+            self.connected = False
+        if client is not None:
+            close_client(client)
+
+
+class Backoff:
+    """Délais de reconnexion : exponentiels, bornés, avec gigue.
+
+    La gigue retire jusqu'à `jitter` × le délai : plusieurs bridges (ou
+    un redémarrage du serveur) ne retentent pas tous au même instant.
+    """
+
+    def __init__(self, min_s: float = 0.5, max_s: float = 30.0, factor: float = 2.0,
+                 jitter: float = 0.5, rng: Optional[random.Random] = None):
+        self.min_s = min_s
+        self.max_s = max_s
+        self.factor = factor
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        self.attempts = 0
+
+    def next(self) -> float:
+        delay = min(self.max_s, self.min_s * self.factor ** self.attempts)
+        self.attempts += 1
+        return delay * (1.0 - self.jitter * self.rng.random())
+
+    def reset(self) -> None:
+        self.attempts = 0
+
+
+class ConnectionSupervisor:
+    """Thread de gestion de la connexion de `handler`.
+
+    `handler` expose `connected`, `connect()` (prépare hors verrou puis
+    substitue la connexion d'un bloc), `check_alive()` et
+    `mark_lost(raison)`. Déconnecté : tentatives espacées par `backoff`.
+    Connecté : keepalive toutes les `keepalive_s`. `wake()` déclenche une
+    vérification immédiate (perte constatée ailleurs).
+    """
+
+    def __init__(self, handler, backoff: Backoff, keepalive_s: float = 1.0,
+                 name: str = "krpc-supervisor"):
+        self.handler = handler
+        self.backoff = backoff
+        self.keepalive_s = keepalive_s
+        self.name = name
+        self.attempts = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            delay = self.step()
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def step(self) -> float:
+        """Un tour de supervision ; retourne le délai avant le suivant."""
+        handler = self.handler
+        if handler.connected:
+            if handler.check_alive():
+                return self.keepalive_s
+            handler.mark_lost("keepalive")
+        self.attempts += 1
+        if handler.connect():
+            self.backoff.reset()
+            return self.keepalive_s
+        delay = self.backoff.next()
+        print(f"[KRPC] Nouvelle tentative dans {delay:.1f} s")
+        return delay
@@ -2,18 +2,304 @@
 """
 KRPC Handler - Connexion et télémétrie Kerbal Space Program via kRPC.
 
-Gère la connexion (avec reconnexion périodique), la collecte de télémétrie
+Gère la connexion (supervisée, voir krpc_connection), la collecte de télémétrie
 via des streams kRPC (beaucoup plus rapide qu'un appel RPC par champ),
-les commandes (SAS, RCS, throttle, action groups, caméra) et le carburant
-par étage.
+les commandes (SAS, RCS, throttle, action groups, caméra, exécutées par
+un CommandWorker dédié) et le carburant par étage (lui aussi streamé,
+voir StageResourceStreams).
+
+L'état réel des commandes de bord (sas, rcs, gear, brakes, lights, abort,
+action_groups) est streamé et publié dans l'instantané : il suit aussi
+les changements faits dans KSP (clavier, SAS coupé par le jeu). Les
+toggles le lisent sans RPC supplémentaire.
+
+Le vaisseau actif est suivi par un stream d'identité : à chaque
+changement (switch, retour au lancement), les objets et streams du
+nouveau vaisseau sont préparés à côté des anciens (requêtes groupées,
+voir stream_batch) puis substitués d'un bloc.
+
+La connexion elle-même suit le même principe : un thread superviseur
+ouvre client, objets et streams hors verrou (timeouts TCP, backoff à
+gigue entre les tentatives) et les substitue d'un bloc. Tant qu'elle
+n'est pas en place, commandes et lecteurs de l'instantané « déconnecté »
+ne bloquent jamais.
+
+Les commandes passent par une seconde connexion RPC (CommandChannel),
+avec son verrou et sa supervision : elles ne font jamais la queue
+derrière les requêtes de télémétrie. Tant qu'elle est fermée, elles
+reprennent la connexion télémétrie.
 """
 
 import threading
 import time
-from typing import Callable, Dict, List, Optional
+from contextlib import contextmanager
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
 
 import krpc
 
+from command_worker import CommandWorker, Origin
+from krpc_connection import (
+    Backoff,
+    CommandChannel,
+    ConnectionSupervisor,
+    client_alive,
+    close_client,
+    on_client,
+    open_client,
+)
+from metrics import REGISTRY
+from stream_batch import call_batch, open_streams, read_settled, remove_streams, wait_first_values
+from telemetry_snapshot import TelemetrySnapshot
+
+
+# Ergols suivis par étage pour le calcul de fuel_percent.
+PROPELLANTS = ("LiquidFuel", "Oxidizer", "SolidFuel", "MonoPropellant")
+
+# Clé de stream → (attribut du handler, propriété kRPC lue).
+STREAM_SOURCES: Dict[str, Tuple[str, str]] = {
+    "altitude": ("flight", "surface_altitude"),
+    "speed": ("flight", "speed"),
+    "vertical_speed": ("flight", "vertical_speed"),
+    "g_force": ("flight", "g_force"),
+    "temperature": ("flight", "static_air_temperature"),
+    "apoapsis": ("orbit", "apoapsis"),
+    "periapsis": ("orbit", "periapsis"),
+    "apoapsis_time": ("orbit", "time_to_apoapsis"),
+    "periapsis_time": ("orbit", "time_to_periapsis"),
+    "current_stage": ("control", "current_stage"),
+    "throttle": ("control", "throttle"),
+    "sas": ("control", "sas"),
+    "rcs": ("control", "rcs"),
+    "gear": ("control", "gear"),
+    "brakes": ("control", "brakes"),
+    "lights": ("control", "lights"),
+    "abort": ("control", "abort"),
+}
+
+# Clé de stream → action group lu (Control.get_action_group).
+ACTION_GROUP_STREAMS: Dict[str, int] = {f"ag{n}": n for n in range(10)}
+
+# Champ du payload → streams nécessaires pour le produire.
+FIELD_STREAMS: Dict[str, Tuple[str, ...]] = {
+    **{k: (k,) for k in STREAM_SOURCES if k != "throttle"},
+    "engines_active": ("throttle",),
+    "ascending": ("vertical_speed",),
+    "stages": ("current_stage",),
+    "action_groups": tuple(ACTION_GROUP_STREAMS),
+}
+
+# État des commandes de bord : toujours dans l'instantané (toggles, LEDs).
+CONTROL_FIELDS = ("sas", "rcs", "gear", "brakes", "lights", "abort", "action_groups")
+
+# Toujours streamé : état des commandes (ces streams ne transmettent
+# presque jamais rien). L'identité du vaisseau a son propre stream.
+ALWAYS_STREAMED = ("current_stage",) + tuple(
+    key for field in CONTROL_FIELDS for key in FIELD_STREAMS[field]
+)
+
+# Durée pendant laquelle une commande envoyée prime sur la valeur streamée
+# (le stream n'a pas encore renvoyé le nouvel état).
+PENDING_CONTROL_S = 0.5
+
+# Attente max des premières valeurs d'un jeu de streams fraîchement ouvert.
+FIRST_VALUE_TIMEOUT_S = 1.0
+
+# Délai avant de retenter l'ouverture des streams carburant d'un étage
+# après un échec (entre-temps : lecture RPC groupée).
+STAGE_STREAM_RETRY_S = 5.0
+
+_UPDATE_TIME = REGISTRY.histogram(
+    "capsule_telemetry_update_seconds", "Durée de KRPCHandler.update_telemetry"
+)
+_RPC_TOTAL = REGISTRY.counter("capsule_krpc_rpc_total", "Requêtes RPC envoyées à kRPC")
+_RECONNECTS = REGISTRY.counter(
+    "capsule_krpc_reconnects_total", "Reconnexions kRPC réussies (hors première connexion)"
+)
+_CONNECTION_LOSSES = REGISTRY.counter(
+    "capsule_krpc_connection_losses_total", "Pertes de connexion kRPC détectées"
+)
+_VESSEL_SWITCHES = REGISTRY.counter(
+    "capsule_krpc_vessel_switches_total", "Changements de vaisseau actif détectés"
+)
+_REBIND_TIME = REGISTRY.histogram(
+    "capsule_krpc_rebind_seconds", "Changement de vaisseau : détection → nouveaux streams en place"
+)
+_BLACKOUT = REGISTRY.histogram(
+    "capsule_krpc_telemetry_blackout_seconds",
+    "Changement de vaisseau : dernier instantané de l'ancien → premier du nouveau",
+)
+
+
+def _count_rpcs(connection) -> None:
+    """Compte chaque requête RPC de `connection`.
+
+    Les méthodes des services kRPC capturent `client._invoke` à la
+    connexion : on instrumente donc l'envoi sur la socket RPC.
+    """
+    rpc = connection._rpc_connection
+    send = rpc.send_message
+
+    def counted(message):
+        _RPC_TOTAL.inc()
+        return send(message)
+
+    rpc.send_message = counted
+
+
+def _stage_entry(
+    stage_num: int, current: int, amounts: Dict[str, float], maxima: Dict[str, float]
+) -> Dict:
+    """Construit l'entrée {stage, fuel_percent, attached, propellants}.
+
+    fuel_percent agrège tous les ergols présents dans l'étage (un booster
+    à poudre n'a que du SolidFuel) ; propellants détaille chaque ergol
+    dont la capacité est non nulle.
+    """
+    total = sum(amounts.values())
+    total_max = sum(maxima.values())
+    propellants = {
+        name: amounts.get(name, 0.0) / m * 100.0 for name, m in maxima.items() if m > 0
+    }
+    return {
+        "stage": stage_num,
+        "fuel_percent": (total / total_max * 100.0) if total_max > 0 else 0.0,
+        "attached": stage_num <= current,
+        "propellants": propellants,
+    }
+
+
+class StageResourceStreams:
+    """Streams amount/max de chaque ergol pour les étages de découplage.
+
+    Les streams sont ouverts pour `max_stages` étages à partir du stage
+    courant et ne sont reconstruits que lorsque celui-ci change : en
+    régime établi, `read()` ne coûte aucun RPC (lecture du cache stream).
+    """
+
+    def __init__(self, max_stages: int = 4, on_update: Optional[Callable] = None):
+        self.max_stages = max_stages
+        # Callback stream (mode événementiel) : appelé à chaque nouvelle valeur.
+        self.on_update = on_update
+        self.stage: Optional[int] = None
+        # Dernier stage dont le rebind a échoué, et échéance du prochain essai.
+        self.failed_stage: Optional[int] = None
+        self._retry_at = 0.0
+        self._connection = None
+        # [(stage_num, {ergol: (stream_amount, stream_max)})]
+        self._streams: List[Tuple[int, Dict[str, Tuple]]] = []
+
+    @property
+    def active(self) -> bool:
+        return self.stage is not None
+
+    def needs_rebind(self, current: int) -> bool:
+        """Stage changé, hors délai d'attente après un échec sur ce stage."""
+        if self.stage == current:
+            return False
+        return current != self.failed_stage or time.monotonic() >= self._retry_at
+
+    def mark_failed(self, current: int) -> bool:
+        """Enregistre l'échec du rebind ; True s'il est nouveau (à loguer)."""
+        first = current != self.failed_stage
+        self.failed_stage = current
+        self._retry_at = time.monotonic() + STAGE_STREAM_RETRY_S
+        return first
+
+    def rebind(self, connection, vessel, current: int) -> None:
+        """(Ré)ouvre les streams pour les étages current..current-max_stages+1.
+
+        À n'appeler que sur changement de stage : trois requêtes groupées
+        (ressources des étages, ajout puis démarrage des streams), puis
+        attente des premières valeurs, reçues en parallèle.
+        """
+        self.close()
+        stage_nums = self.stage_nums(current)
+        resources = call_batch(connection, self.resource_calls(vessel, stage_nums))
+        sources = self.sources(stage_nums, resources)
+        opened, errors = open_streams(connection, sources, self.on_update)
+        if errors:
+            remove_streams(connection, opened.values())
+            raise next(iter(errors.values()))
+        wait_first_values(connection, opened.values(), FIRST_VALUE_TIMEOUT_S)
+        self.adopt(connection, current, opened)
+
+    # Étapes de rebind, aussi enchaînées par KRPCHandler._prepare_binding
+    # dans les requêtes groupées d'un changement de vaisseau.
+
+    def stage_nums(self, current: int) -> List[int]:
+        return [n for n in range(current, current - self.max_stages, -1) if n >= 0]
+
+    @staticmethod
+    def resource_calls(vessel, stage_nums: List[int]) -> List[Tuple[Callable, tuple]]:
+        return [(vessel.resources_in_decouple_stage, (n, False)) for n in stage_nums]
+
+    @staticmethod
+    def sources(stage_nums: List[int], resources: List) -> Dict[Tuple, Tuple[Callable, tuple]]:
+        """Clé (étage, ergol, "amount"|"max") → appel kRPC à streamer."""
+        sources = {}
+        for stage_num, res in zip(stage_nums, resources):
+            for name in PROPELLANTS:
+                sources[(stage_num, name, "amount")] = (res.amount, (name,))
+                sources[(stage_num, name, "max")] = (res.max, (name,))
+        return sources
+
+    def adopt(self, connection, current: int, opened: Dict[Tuple, "krpc.stream.Stream"]) -> None:
+        """Prend possession des streams ouverts pour `sources()`."""
+        stage_nums = sorted({key[0] for key in opened}, reverse=True)
+        self._streams = [
+            (n, {name: (opened[(n, name, "amount")], opened[(n, name, "max")]) for name in PROPELLANTS})
+            for n in stage_nums
+        ]
+        self._connection = connection
+        self.stage = current
+        self.failed_stage = None
+
+    def close(self) -> None:
+        streams = [s for _n, per_res in self._streams for pair in per_res.values() for s in pair]
+        if streams and self._connection is not None:
+            remove_streams(self._connection, streams)
+        self._streams = []
+        self.stage = None
+
+    def read(self) -> List[Dict]:
+        """Carburant par étage depuis le cache des streams (zéro RPC)."""
+        current = self.stage if self.stage is not None else -1
+        stages: List[Dict] = []
+        for stage_num, per_res in self._streams:
+            amounts: Dict[str, float] = {}
+            maxima: Dict[str, float] = {}
+            for name, (s_amount, s_max) in per_res.items():
+                try:
+                    amounts[name] = s_amount()
+                    maxima[name] = s_max()
+                except Exception:
+                    # Pas encore de première valeur reçue pour ce stream.
+                    amounts[name] = 0.0
+                    maxima[name] = 0.0
+            stages.append(_stage_entry(stage_num, current, amounts, maxima))
+        return stages
+
+
+class VesselBinding:
+    """Objets kRPC d'un vaisseau et ses streams, préparés hors verrou puis
+    substitués d'un bloc à ceux du vaisseau précédent."""
+
+    __slots__ = ("vessel", "vessel_id", "control", "flight", "orbit", "resources", "camera",
+                 "streams", "identity", "stage_streams")
+
+    def __init__(self, vessel):
+        self.vessel = vessel
+        # Identité côté jeu (id d'objet kRPC), stable pour un même vaisseau.
+        self.vessel_id: int = vessel._object_id
+        self.control = None
+        self.flight = None
+        self.orbit = None
+        self.resources = None
+        self.camera = None
+        self.streams: Dict[str, "krpc.stream.Stream"] = {}
+        self.identity: Optional["krpc.stream.Stream"] = None
+        self.stage_streams: Optional[StageResourceStreams] = None
+
 
 class KRPCHandler:
     """Connexion kRPC avec reconnexion automatique et télémétrie."""
@@ -24,17 +310,30 @@ class KRPCHandler:
         host: str = "192.168.1.31",
         rpc_port: int = 50008,
         stream_port: int = 50001,
-        reconnect_timeout_s: int = 5,
+        heartbeat_s: float = 1.0,
+        connect_timeout_s: float = 3.0,
+        rpc_timeout_s: float = 5.0,
+        keepalive_s: float = 1.0,
+        reconnect_min_s: float = 0.5,
+        reconnect_max_s: float = 30.0,
+        command_channel: bool = True,
     ):
         self.name = name
         self.host = host
         self.rpc_port = rpc_port
         self.stream_port = stream_port
-        self.reconnect_timeout_s = reconnect_timeout_s
+        # Bornes de chaque tentative : connexion TCP, réponse à un RPC.
+        self.connect_timeout_s = connect_timeout_s
+        self.rpc_timeout_s = rpc_timeout_s
+        self.keepalive_s = keepalive_s
+        # Un instantané identique au précédent n'est republié qu'après
+        # heartbeat_s (signe de vie pour les consommateurs).
+        self.heartbeat_s = heartbeat_s
 
         self.connection = None
         self.connected = False
         self.last_connection_attempt = 0.0
+        self.connect_count = 0
 
         self.vessel = None
         self.control = None
@@ -57,279 +356,800 @@ class KRPCHandler:
             "current_stage": -1,
             "engines_active": False,
             "stages": [],
+            "sas": False,
+            "rcs": False,
+            "gear": False,
+            "brakes": False,
+            "lights": False,
+            "abort": False,
+            "action_groups": [False] * len(ACTION_GROUP_STREAMS),
         }
 
+        # Miroirs de telemetry["sas"/"rcs"] (compatibilité).
         self.sas_state = False
         self.rcs_state = False
         self.throttle_state = 0.0
+        # Clé de stream → (valeur envoyée, échéance monotonic) : état
+        # optimiste tant que le stream n'a pas confirmé (double appui).
+        # Verrou propre : partagé par commandes et télémétrie, qui ne
+        # prennent pas le même verrou principal.
+        self._pending_controls: Dict[str, Tuple[object, float]] = {}
+        self._pending_lock = threading.Lock()
 
         self._lock = threading.RLock()
         self._streams: Dict[str, "krpc.stream.Stream"] = {}
+        # Champs demandés par consommateur (None = tous). Remplacé en bloc
+        # (copie + swap) : lisible sans verrou depuis n'importe quel thread.
+        self._requirements: Dict[str, Optional[FrozenSet[str]]] = {}
+        # Réveil du thread télémétrie par les callbacks stream (mode event).
+        self._changed = threading.Event()
+        self._stage_streams = StageResourceStreams(on_update=self._on_stream_update)
+        # Dernier instantané publié : lu sans verrou par les consommateurs.
+        self._seq = 0
+        self._snapshot = TelemetrySnapshot.disconnected(self._seq)
+        # Appelés à chaque publication, dans le thread qui publie (doivent
+        # être brefs : historique, enregistreur). Liste remplacée en bloc.
+        self._snapshot_listeners: Tuple[Callable[[TelemetrySnapshot], None], ...] = ()
         self._vessel_id: Optional[int] = None
+        # Stream SpaceCenter.active_vessel : détection du changement de vaisseau.
+        self._vessel_stream: Optional["krpc.stream.Stream"] = None
+        # time.time() du dernier relevé de télémétrie complet (publié ou
+        # identique au précédent).
+        self._fresh_at = 0.0
+        # Changement en cours de mesure : (durée du rebind, dernier relevé
+        # de l'ancien vaisseau).
+        self._switch: Optional[Tuple[float, float]] = None
+        self.last_rebind: Optional[Dict[str, float]] = None
         self.on_vessel_changed: Optional[Callable[[], None]] = None
+        # Commandes asynchrones : le worker est démarré par main.py.
+        self.commands = CommandWorker()
+        # Connexion et reconnexions : démarré par main.py. Sans lui (tests,
+        # outils), reconnect_if_needed() tente en ligne selon le backoff.
+        self._backoff = Backoff(reconnect_min_s, reconnect_max_s)
+        self._next_attempt = 0.0
+        self.supervisor = ConnectionSupervisor(self, self._backoff, keepalive_s)
+        # Connexion dédiée aux commandes, supervisée à part (None : les
+        # commandes partagent la connexion télémétrie).
+        self.command_channel: Optional[CommandChannel] = None
+        self.command_supervisor: Optional[ConnectionSupervisor] = None
+        if command_channel:
+            self.command_channel = CommandChannel(
+                f"{name} (commandes)", host, rpc_port, connect_timeout_s, rpc_timeout_s, keepalive_s
+            )
+            self.command_channel.on_open = _count_rpcs
+            self.command_supervisor = ConnectionSupervisor(
+                self.command_channel, Backoff(reconnect_min_s, reconnect_max_s), keepalive_s,
+                name="krpc-commands",
+            )
 
     # ---- Connexion ---------------------------------------------------
 
     def connect(self) -> bool:
+        """Ouvre client, objets et streams hors verrou, puis les substitue
+        d'un bloc : pendant la tentative (bornée par les timeouts), les
+        commandes et l'instantané « déconnecté » restent servis."""
+        self.last_connection_attempt = time.time()
+        print(f"[KRPC] Connexion à {self.host}:{self.rpc_port}...", end=" ", flush=True)
+        try:
+            client = open_client(
+                self.name, self.host, self.rpc_port, self.stream_port,
+                self.connect_timeout_s, self.rpc_timeout_s, self.keepalive_s,
+            )
+        except Exception as e:
+            print(f"✗ {e or type(e).__name__}")
+            return False
+        try:
+            _count_rpcs(client)
+            space_center = client.space_center
+            binding = self._bind_vessel(client, space_center)
+        except Exception as e:
+            close_client(client)
+            print(f"✗ {e or type(e).__name__}")
+            return False
         with self._lock:
-            self.last_connection_attempt = time.time()
+            old = self.connection
+            previous_vessel = self._vessel_id
+            self.connection = client
+            self.space_center = space_center
+            self._vessel_stream = binding.identity
+            self._swap_binding_locked(binding)
+            self.connected = True
+            self.connect_count += 1
+            if self.connect_count > 1:
+                _RECONNECTS.inc()
+        if old is not None:
+            close_client(old)
+        print("✓ OK")
+        self._ensure_command_channel()
+        if previous_vessel != binding.vessel_id and self.on_vessel_changed:
+            # Première connexion, ou autre vaisseau au retour de la liaison.
             try:
-                print(f"[KRPC] Connexion à {self.host}:{self.rpc_port}...", end=" ", flush=True)
-                self.connection = krpc.connect(
-                    name=self.name,
-                    address=self.host,
-                    rpc_port=self.rpc_port,
-                    stream_port=self.stream_port,
-                )
-                self.space_center = self.connection.space_center
-                self._bind_vessel()
-                self.connected = True
-                print("✓ OK")
-                return True
+                self.on_vessel_changed()
             except Exception as e:
-                self.connected = False
-                print(f"✗ {e}")
-                return False
+                print(f"[KRPC] on_vessel_changed erreur: {e}")
+        return True
+
+    def _ensure_command_channel(self) -> None:
+        """Canal commandes : ouvert ici sans superviseur (tests, outils),
+        sinon laissé à son superviseur."""
+        channel = self.command_channel
+        if channel is None or channel.check_alive():
+            return
+        channel.mark_lost("reconnexion")
+        if self.command_supervisor.running:
+            self.command_supervisor.wake()
+        else:
+            channel.connect()
 
-    def _bind_vessel(self) -> None:
-        self._close_streams()
-        self.vessel = self.space_center.active_vessel
-        self.control = self.vessel.control
-        self.flight = self.vessel.flight(self.vessel.orbit.body.reference_frame)
-        self.orbit = self.vessel.orbit
-        self.resources = self.vessel.resources
-        self.camera = self.space_center.camera
-        self._vessel_id = id(self.vessel)
-        self._open_streams()
-
-    def _open_streams(self) -> None:
-        """Ouvre des streams kRPC pour les champs lus en boucle."""
-        c = self.connection
+    def start_supervision(self) -> None:
+        """Démarre les superviseurs (connexion télémétrie, canal commandes)."""
+        self.supervisor.start()
+        if self.command_supervisor is not None:
+            self.command_supervisor.start()
+
+    def _bind_vessel(self, conn, space_center) -> VesselBinding:
+        """Liaison d'une nouvelle connexion : vaisseau actif, ses streams et
+        le stream d'identité. Sans streams, les objets seuls (mode RPC direct)."""
+        vessel = space_center.active_vessel
         try:
-            self._streams = {
-                "altitude": c.add_stream(getattr, self.flight, "surface_altitude"),
-                "speed": c.add_stream(getattr, self.flight, "speed"),
-                "vertical_speed": c.add_stream(getattr, self.flight, "vertical_speed"),
-                "g_force": c.add_stream(getattr, self.flight, "g_force"),
-                "temperature": c.add_stream(getattr, self.flight, "static_air_temperature"),
-                "apoapsis": c.add_stream(getattr, self.orbit, "apoapsis"),
-                "periapsis": c.add_stream(getattr, self.orbit, "periapsis"),
-                "apoapsis_time": c.add_stream(getattr, self.orbit, "time_to_apoapsis"),
-                "periapsis_time": c.add_stream(getattr, self.orbit, "time_to_periapsis"),
-                "current_stage": c.add_stream(getattr, self.control, "current_stage"),
-                "throttle": c.add_stream(getattr, self.control, "throttle"),
-            }
-            print(f"[KRPC] {len(self._streams)} streams ouverts")
+            binding = self._prepare_binding(
+                conn, space_center, vessel, self._wanted_streams(),
+                identity=True, stages="stages" in self.wanted_fields(),
+            )
+            print(f"[KRPC] {len(binding.streams)} streams ouverts")
         except Exception as e:
             print(f"[KRPC] Impossible d'ouvrir les streams: {e}")
-            self._streams = {}
+            binding = self._prepare_binding(conn, space_center, vessel, ())
+        return binding
+
+    def _prepare_binding(
+        self, conn, space_center, vessel, keys: Iterable[str],
+        identity: bool = False, stages: bool = False,
+    ) -> VesselBinding:
+        """Résout les objets de `vessel` et ouvre ses streams (et ceux du
+        carburant par étage si `stages`), sans toucher à la liaison
+        courante ni prendre le verrou.
+
+        Requêtes groupées : objets du vaisseau en quatre allers-retours
+        (dépendances orbit → body → reference_frame → flight), tous les
+        streams en deux, premières valeurs attendues en parallèle.
+        """
+        binding = VesselBinding(vessel)
+        binding.control, binding.orbit, binding.resources, binding.camera = call_batch(conn, [
+            (getattr, (vessel, "control")),
+            (getattr, (vessel, "orbit")),
+            (getattr, (vessel, "resources")),
+            (getattr, (space_center, "camera")),
+        ])
+        calls = [(getattr, (binding.orbit, "body"))]
+        if stages:
+            calls.append((getattr, (binding.control, "current_stage")))
+        body, *current = call_batch(conn, calls)
+        stage_streams = StageResourceStreams(on_update=self._on_stream_update)
+        stage_nums = stage_streams.stage_nums(current[0]) if stages else []
+        frame, *resources = call_batch(
+            conn, [(getattr, (body, "reference_frame"))]
+            + stage_streams.resource_calls(vessel, stage_nums)
+        )
+        (binding.flight,) = call_batch(conn, [(vessel.flight, (frame,))])
+
+        sources = {key: self._source(key, binding) for key in keys}
+        if identity:
+            sources["vessel"] = (getattr, (space_center, "active_vessel"))
+        sources.update(stage_streams.sources(stage_nums, resources))
+        streams, errors = open_streams(conn, sources, self._on_stream_update)
+        if errors or not wait_first_values(conn, streams.values(), FIRST_VALUE_TIMEOUT_S):
+            remove_streams(conn, streams.values())
+            if errors:
+                key, error = next(iter(errors.items()))
+                raise RuntimeError(f"stream {key}: {error}")
+            raise TimeoutError("premières valeurs des streams non reçues")
+        binding.identity = streams.pop("vessel", None)
+        if stages:
+            stage_streams.adopt(conn, current[0], {
+                k: streams.pop(k) for k in [k for k in streams if isinstance(k, tuple)]
+            })
+            binding.stage_streams = stage_streams
+        binding.streams = streams
+        return binding
+
+    def _swap_binding_locked(self, binding: VesselBinding) -> None:
+        self.vessel = binding.vessel
+        self.control = binding.control
+        self.flight = binding.flight
+        self.orbit = binding.orbit
+        self.resources = binding.resources
+        self.camera = binding.camera
+        self._vessel_id = binding.vessel_id
+        self._streams = binding.streams
+        self._stage_streams = binding.stage_streams or StageResourceStreams(
+            on_update=self._on_stream_update
+        )
+        with self._pending_lock:
+            self._pending_controls = {}
+
+    def _source(self, key: str, owner=None) -> Tuple[Callable, tuple]:
+        """Appel kRPC (fonction, arguments) qui produit la clé de stream `key`.
+
+        `owner` : porteur des objets kRPC (le handler ou une VesselBinding).
+        """
+        owner = self if owner is None else owner
+        group = ACTION_GROUP_STREAMS.get(key)
+        if group is not None:
+            return owner.control.get_action_group, (group,)
+        obj, attr = STREAM_SOURCES[key]
+        return getattr, (getattr(owner, obj), attr)
+
+    def _sync_streams_locked(self) -> None:
+        """Aligne les streams ouverts sur les champs demandés.
+
+        Ne coûte des RPC que lorsque l'ensemble demandé a changé (ouverture
+        des nouveaux, fermeture de ceux dont plus personne n'a besoin).
+        """
+        if not self._streams:
+            return
+        wanted = self._wanted_streams()
+        current = set(self._streams)
+        if wanted == current:
+            return
+        remove_streams(self.connection, [self._streams.pop(key) for key in current - wanted])
+        opened, errors = open_streams(
+            self.connection, {key: self._source(key) for key in wanted - current},
+            self._on_stream_update,
+        )
+        for key, e in errors.items():
+            print(f"[KRPC] Stream {key} indisponible: {e}")
+        if not wait_first_values(self.connection, opened.values(), FIRST_VALUE_TIMEOUT_S):
+            # Réessayé au tick suivant plutôt que lu sans valeur.
+            remove_streams(self.connection, opened.values())
+            opened = {}
+        self._streams.update(opened)
+        print(f"[KRPC] Streams: {len(self._streams)} ouverts ({', '.join(sorted(self._streams))})")
+
+    # ---- Champs demandés ---------------------------------------------
+
+    def require_fields(self, owner: str, fields: Optional[Iterable[str]]) -> None:
+        """Déclare les champs du payload dont `owner` a besoin.
+
+        None = tous les champs. Les streams sont ouverts/fermés au tick
+        télémétrie suivant pour couvrir l'union des besoins. Sans aucun
+        consommateur déclaré, tous les champs sont streamés. Ne prend
+        pas le verrou : appelable depuis la boucle asyncio.
+        """
+        requirements = dict(self._requirements)
+        requirements[owner] = None if fields is None else frozenset(fields)
+        self._requirements = requirements
+
+    def release_fields(self, owner: str) -> None:
+        requirements = dict(self._requirements)
+        requirements.pop(owner, None)
+        self._requirements = requirements
+
+    def wanted_fields(self) -> FrozenSet[str]:
+        """Union des champs du payload demandés par les consommateurs."""
+        requirements = self._requirements
+        if not requirements or any(f is None for f in requirements.values()):
+            return frozenset(FIELD_STREAMS)
+        fields = set()
+        for f in requirements.values():
+            fields.update(x for x in f if x in FIELD_STREAMS)
+        return frozenset(fields)
+
+    def _wanted_streams(self) -> set:
+        keys = set(ALWAYS_STREAMED)
+        for field in self.wanted_fields():
+            keys.update(FIELD_STREAMS[field])
+        return keys
+
+    def _on_stream_update(self, _value) -> None:
+        """Callback stream (thread de réception kRPC) : doit rester trivial."""
+        self._changed.set()
+
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        """Attend une mise à jour de stream (ou le timeout).
+
+        Retourne True si un stream a changé. Utilisé par la boucle
+        télémétrie en mode événementiel à la place d'une attente fixe.
+        """
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
+
+    def _drop_streams_locked(self) -> None:
+        """Oublie les streams d'une connexion morte (aucun RPC)."""
+        self._streams = {}
+        self._vessel_stream = None
+        self._stage_streams = StageResourceStreams(on_update=self._on_stream_update)
 
     def _close_streams(self) -> None:
-        for s in self._streams.values():
-            try:
-                s.remove()
-            except Exception:
-                pass
+        streams = list(self._streams.values())
+        if self._vessel_stream is not None:
+            streams.append(self._vessel_stream)
         self._streams = {}
+        self._vessel_stream = None
+        if streams:
+            remove_streams(self.connection, streams)
+        self._stage_streams.close()
 
-    def _check_vessel_changed(self, new_stage: int) -> bool:
-        """Détecte un retour au lancement / switch de vaisseau.
+    # ---- Changement de vaisseau --------------------------------------
 
-        Signal : le stage courant augmente (pendant un vol il ne fait que
-        décroître ; une hausse signifie un nouveau vaisseau).
-        """
-        prev_stage = self.telemetry.get("current_stage", -1)
-        # Premier relevé : pas de détection, on initialise.
-        if prev_stage < 0:
-            return False
-        if new_stage <= prev_stage:
+    def _active_vessel(self):
+        """Vaisseau actif : stream d'identité, ou RPC direct sans streams."""
+        if self._vessel_stream is not None:
+            return read_settled(self.connection, self._vessel_stream)
+        return self.space_center.active_vessel
+
+    def _vessel_switched(self) -> bool:
+        try:
+            vessel = self._active_vessel()
+        except Exception:
             return False
-        print(f"[KRPC] Relancement détecté (stage {prev_stage} → {new_stage})")
+        return vessel is not None and vessel._object_id != self._vessel_id
+
+    def _follow_active_vessel(self) -> None:
+        """Rebind à chaud quand le vaisseau actif change (switch, retour au
+        lancement).
+
+        La nouvelle liaison est préparée hors verrou, l'ancienne restant en
+        place (commandes et instantané publié inchangés) ; la bascule est
+        une substitution sous verrou, les anciens streams fermés ensuite.
+        """
         try:
-            self._bind_vessel()
+            vessel = self._active_vessel()
+        except Exception:
+            return  # update_telemetry constatera la perte de connexion
+        if vessel is None or vessel._object_id == self._vessel_id:
+            return
+        detected = time.perf_counter()
+        last_fresh = self._fresh_at
+        conn = self.connection
+        print(f"[KRPC] Changement de vaisseau ({self._vessel_id} → {vessel._object_id})")
+        try:
+            binding = self._prepare_binding(
+                conn, self.space_center, vessel, self._wanted_streams(),
+                stages="stages" in self.wanted_fields(),
+            )
         except Exception as e:
             print(f"[KRPC] Rebind erreur: {e}")
+            return
+        with self._lock:
+            if not self.connected or self.connection is not conn:
+                # Connexion perdue (ou remplacée) pendant la préparation.
+                if self.connection is conn:
+                    remove_streams(conn, list(binding.streams.values()))
+                    if binding.stage_streams is not None:
+                        binding.stage_streams.close()
+                return
+            old_streams = list(self._streams.values())
+            old_stages = self._stage_streams
+            self._swap_binding_locked(binding)
+            rebind_s = time.perf_counter() - detected
+            self._switch = (rebind_s, last_fresh)
+        remove_streams(self.connection, old_streams)
+        old_stages.close()
+        _VESSEL_SWITCHES.inc()
+        _REBIND_TIME.observe(rebind_s)
         if self.on_vessel_changed:
             try:
                 self.on_vessel_changed()
             except Exception as e:
                 print(f"[KRPC] on_vessel_changed erreur: {e}")
-        return True
 
-    def reconnect_if_needed(self) -> bool:
+    def _report_switch_locked(self) -> None:
+        """Premier instantané du nouveau vaisseau : mesure de l'interruption."""
+        rebind_s, last_fresh = self._switch
+        self._switch = None
+        blackout_s = max(0.0, self._fresh_at - last_fresh)
+        _BLACKOUT.observe(blackout_s)
+        self.last_rebind = {"rebind_ms": rebind_s * 1000.0, "blackout_ms": blackout_s * 1000.0}
+        print(
+            f"[KRPC] Vaisseau lié en {rebind_s * 1000.0:.0f} ms "
+            f"(télémétrie interrompue {blackout_s * 1000.0:.0f} ms)"
+        )
+
+    def check_alive(self) -> bool:
+        """Keepalive sans RPC (voir krpc_connection.client_alive)."""
+        client = self.connection
+        return client is not None and client_alive(client)
+
+    def mark_lost(self, reason: str) -> None:
         with self._lock:
             if self.connected:
-                try:
-                    _ = self.vessel.name
-                    return True
-                except Exception:
-                    print("[KRPC] Connexion perdue.")
-                    self.connected = False
-                    self._close_streams()
+                self._lose_connection_locked(reason)
 
-            if time.time() - self.last_connection_attempt >= self.reconnect_timeout_s:
-                return self.connect()
+    def _lose_connection_locked(self, reason: str) -> None:
+        """Bascule en « déconnecté » sans aucun RPC sur la liaison morte ;
+        le superviseur reconnecte aussitôt."""
+        print(f"[KRPC] Connexion perdue ({reason}).")
+        _CONNECTION_LOSSES.inc()
+        self.connected = False
+        self._drop_streams_locked()
+        with self._pending_lock:
+            self._pending_controls = {}
+        self._switch = None
+        if self.connection is not None:
+            # Sockets fermées sans attendre : débloque un appel en cours.
+            close_client(self.connection, timeout=0)
+        self._publish_locked()
+        self.supervisor.wake()
+
+    def reconnect_if_needed(self) -> bool:
+        """Ne bloque jamais quand le superviseur tourne. Sans superviseur
+        (tests, outils) : keepalive, puis tentative en ligne selon le backoff."""
+        if self.supervisor.running:
+            return self.connected
+        if self.connected:
+            if self.check_alive():
+                return True
+            self.mark_lost("keepalive")
+        if time.monotonic() < self._next_attempt:
             return False
+        if self.connect():
+            self._backoff.reset()
+            return True
+        self._next_attempt = time.monotonic() + self._backoff.next()
+        return False
 
     def disconnect(self) -> None:
+        # Arrêt des superviseurs et du worker hors verrou : ils peuvent
+        # attendre _lock pour finir leur tour.
+        self.supervisor.stop()
+        if self.command_supervisor is not None:
+            self.command_supervisor.stop()
+        self.commands.stop()
+        if self.command_channel is not None:
+            self.command_channel.close()
         with self._lock:
             try:
-                self._close_streams()
-                if self.connection:
-                    self.connection.close()
+                if self.connected:
+                    self._close_streams()
             except Exception:
                 pass
+            if self.connection is not None:
+                close_client(self.connection)
             self.connected = False
+            self._publish_locked()
 
     # ---- Télémétrie --------------------------------------------------
 
     def update_telemetry(self) -> None:
+        if self.connected:
+            self._follow_active_vessel()
         with self._lock:
             if not self.connected:
                 return
+            t0 = time.perf_counter()
             try:
-                streams = self._streams
-                new_stage = self.telemetry.get("current_stage", 0)
-                if streams:
-                    self.telemetry["altitude"] = streams["altitude"]()
-                    self.telemetry["speed"] = streams["speed"]()
-                    self.telemetry["vertical_speed"] = streams["vertical_speed"]()
-                    self.telemetry["g_force"] = streams["g_force"]()
-                    self.telemetry["temperature"] = streams["temperature"]()
-                    self.telemetry["apoapsis"] = streams["apoapsis"]()
-                    self.telemetry["periapsis"] = streams["periapsis"]()
-                    self.telemetry["apoapsis_time"] = streams["apoapsis_time"]()
-                    self.telemetry["periapsis_time"] = streams["periapsis_time"]()
-                    new_stage = streams["current_stage"]()
-                    self.telemetry["engines_active"] = streams["throttle"]() > 0.0
+                self._sync_streams_locked()
+                wanted = self.wanted_fields()
+                if self._streams:
+                    values = {key: s() for key, s in self._streams.items()}
                 else:
                     # Fallback RPC direct si les streams n'ont pas pu s'ouvrir.
-                    self.telemetry["altitude"] = self.flight.surface_altitude
-                    self.telemetry["speed"] = self.flight.speed
-                    self.telemetry["vertical_speed"] = self.flight.vertical_speed
-                    self.telemetry["g_force"] = self.flight.g_force
-                    self.telemetry["temperature"] = self.flight.static_air_temperature
-                    self.telemetry["apoapsis"] = self.orbit.apoapsis
-                    self.telemetry["periapsis"] = self.orbit.periapsis
-                    self.telemetry["apoapsis_time"] = self.orbit.time_to_apoapsis
-                    self.telemetry["periapsis_time"] = self.orbit.time_to_periapsis
-                    new_stage = self.control.current_stage
-                    self.telemetry["engines_active"] = self.control.throttle > 0.0
-                self._check_vessel_changed(new_stage)
+                    keys = set(ALWAYS_STREAMED)
+                    for field in wanted:
+                        keys.update(FIELD_STREAMS[field])
+                    values = {}
+                    for key in keys:
+                        fn, args = self._source(key)
+                        values[key] = fn(*args)
+                self._apply_pending_locked(values)
+                new_stage = values.pop("current_stage")
+                throttle = values.pop("throttle", None)
+                groups = [values.pop(key, False) for key in ACTION_GROUP_STREAMS]
+                self.telemetry.update(values)
+                self.telemetry["action_groups"] = groups
+                self.sas_state = self.telemetry["sas"]
+                self.rcs_state = self.telemetry["rcs"]
+                if throttle is not None:
+                    self.telemetry["engines_active"] = throttle > 0.0
                 self.telemetry["current_stage"] = new_stage
-                self.telemetry["stages"] = self._get_stages_fuel_locked()
+                if "stages" in wanted:
+                    self.telemetry["stages"] = self._read_stages_locked(new_stage)
+                elif self._stage_streams.active:
+                    self._stage_streams.close()
+                # Champs plus demandés par personne : retirés plutôt que figés.
+                for field in [f for f in self.telemetry if f not in wanted]:
+                    if field != "current_stage" and field not in CONTROL_FIELDS:
+                        del self.telemetry[field]
+                self._fresh_at = time.time()
+            except Exception as e:
+                if self._vessel_switched():
+                    # Handles de l'ancien vaisseau déjà invalides : rebind au
+                    # tick suivant, l'instantané précédent reste servi.
+                    return
+                self._lose_connection_locked(f"télémétrie: {e}")
+                return
+            self._publish_locked()
+            if self._switch is not None and self.connected:
+                self._report_switch_locked()
+            _UPDATE_TIME.observe(time.perf_counter() - t0)
+
+    def _apply_pending_locked(self, values: Dict) -> None:
+        """Remplace les valeurs streamées par les commandes pas encore
+        confirmées ; une commande est oubliée dès que le stream la reflète
+        ou à son échéance (KSP l'a refusée ou annulée)."""
+        if not self._pending_controls:
+            return
+        now = time.monotonic()
+        with self._pending_lock:
+            for key, (value, deadline) in list(self._pending_controls.items()):
+                if key not in values or values[key] == value or now >= deadline:
+                    del self._pending_controls[key]
+                else:
+                    values[key] = value
+
+    def _control_state(self, key: str, control) -> bool:
+        """État courant d'une commande de bord : commande en attente, sinon
+        cache du stream (zéro RPC), sinon lecture directe via `control`."""
+        with self._pending_lock:
+            pending = self._pending_controls.get(key)
+        if pending is not None and time.monotonic() < pending[1]:
+            return bool(pending[0])
+        stream = self._streams.get(key)
+        if stream is not None:
+            return bool(stream())
+        group = ACTION_GROUP_STREAMS.get(key)
+        if group is not None:
+            return bool(control.get_action_group(group))
+        return bool(getattr(control, STREAM_SOURCES[key][1]))
+
+    def _set_pending(self, key: str, value) -> None:
+        with self._pending_lock:
+            self._pending_controls[key] = (value, time.monotonic() + PENDING_CONTROL_S)
+
+    def _publish_locked(self) -> None:
+        """Publie un nouvel instantané (remplacement de référence unique).
+
+        Appelé uniquement avec _lock tenu : `seq` est donc strictement
+        croissant. Les lecteurs n'ont jamais besoin du verrou. Si rien n'a
+        changé, on ne republie qu'une fois par heartbeat_s.
+        """
+        if self.connected:
+            data = dict(self.telemetry)
+            data["connected"] = True
+            if "vertical_speed" in data:
+                data["ascending"] = data["vertical_speed"] > 0
+        else:
+            data = {"connected": False}
+        last = self._snapshot
+        if data == last.data and time.time() - last.timestamp < self.heartbeat_s:
+            return
+        self._seq += 1
+        snapshot = self._snapshot = TelemetrySnapshot(self._seq, data)
+        for listener in self._snapshot_listeners:
+            try:
+                listener(snapshot)
             except Exception as e:
-                print(f"[KRPC] Erreur télémétrie: {e}")
-                self.connected = False
-                self._close_streams()
+                print(f"[KRPC] Erreur listener instantané: {e}")
+
+    def add_snapshot_listener(self, listener: Callable[[TelemetrySnapshot], None]) -> None:
+        """Appelle `listener(snapshot)` à chaque nouvel instantané publié."""
+        self._snapshot_listeners = self._snapshot_listeners + (listener,)
+
+    def remove_snapshot_listener(self, listener: Callable[[TelemetrySnapshot], None]) -> None:
+        self._snapshot_listeners = tuple(l for l in self._snapshot_listeners if l is not listener)
+
+    def snapshot(self) -> TelemetrySnapshot:
+        """Dernier instantané publié (sans verrou, sans copie)."""
+        return self._snapshot
+
+    def changed_since(self, seq: int) -> bool:
+        """True si un instantané plus récent que `seq` a été publié."""
+        return self._snapshot.seq != seq
+
+    def _read_stages_locked(self, current: int) -> List[Dict]:
+        """Carburant par étage via les streams, reconstruits si le stage change.
+
+        Si les streams par étage ne peuvent pas s'ouvrir, on retombe sur
+        la lecture RPC groupée, et l'ouverture n'est retentée qu'après
+        STAGE_STREAM_RETRY_S (échec logué une fois par stage).
+        """
+        stage_streams = self._stage_streams
+        if self._streams and stage_streams.needs_rebind(current):
+            try:
+                stage_streams.rebind(self.connection, self.vessel, current)
+            except Exception as e:
+                if stage_streams.mark_failed(current):
+                    print(f"[KRPC] Streams carburant indisponibles: {e}")
+        if self._stage_streams.active:
+            return self._stage_streams.read()
+        return self._get_stages_fuel_locked(current=current)
 
     def get_stages_fuel(self, max_stages: int = 4) -> List[Dict]:
         with self._lock:
             return self._get_stages_fuel_locked(max_stages)
 
-    def _get_stages_fuel_locked(self, max_stages: int = 4) -> List[Dict]:
-        """Carburant par étage (du plus récent au plus ancien).
+    def _get_stages_fuel_locked(
+        self, max_stages: int = 4, current: Optional[int] = None
+    ) -> List[Dict]:
+        """Carburant par étage (du plus récent au plus ancien), en RPC direct.
 
-        Chaque entrée: {stage, fuel_percent, attached}.
+        Deux requêtes groupées (ressources des étages, puis amount/max de
+        chaque ergol) au lieu d'un appel par valeur. Un étage en erreur
+        donne une entrée vide.
+        Chaque entrée: {stage, fuel_percent, attached, propellants}.
         """
         if not self.connected:
             return []
         try:
-            current = self.control.current_stage
+            if current is None:
+                current = self.control.current_stage
+            stage_nums = [n for n in range(current, current - max_stages, -1) if n >= 0]
+            resources = call_batch(
+                self.connection, StageResourceStreams.resource_calls(self.vessel, stage_nums),
+                errors=True,
+            )
+            calls = [
+                (fn, (name,))
+                for res in resources if not isinstance(res, Exception)
+                for name in PROPELLANTS for fn in (res.amount, res.max)
+            ]
+            values = iter(call_batch(self.connection, calls, errors=True))
             stages: List[Dict] = []
-            for stage_num in range(current, current - max_stages, -1):
-                if stage_num < 0:
-                    break
-                try:
-                    res = self.vessel.resources_in_decouple_stage(
-                        stage=stage_num, cumulative=False
-                    )
-                    liquid = res.amount("LiquidFuel")
-                    liquid_max = res.max("LiquidFuel")
-                    pct = (liquid / liquid_max * 100.0) if liquid_max > 0 else 0.0
-                except Exception:
-                    pct = 0.0
-                stages.append(
-                    {
-                        "stage": stage_num,
-                        "fuel_percent": pct,
-                        "attached": stage_num <= current,
-                    }
-                )
+            for stage_num, res in zip(stage_nums, resources):
+                amounts: Dict[str, float] = {}
+                maxima: Dict[str, float] = {}
+                if not isinstance(res, Exception):
+                    for name in PROPELLANTS:
+                        amount, maximum = next(values), next(values)
+                        if not isinstance(amount, Exception) and not isinstance(maximum, Exception):
+                            amounts[name] = amount
+                            maxima[name] = maximum
+                stages.append(_stage_entry(stage_num, current, amounts, maxima))
             return stages
         except Exception:
             return []
 
     def get_telemetry(self) -> Dict:
-        with self._lock:
-            return self.telemetry.copy()
+        """Copie du dernier instantané publié (sans prendre le verrou)."""
+        return dict(self._snapshot.data)
 
     # ---- Commandes ---------------------------------------------------
+    #
+    # Les méthodes publiques déposent la commande dans self.commands et
+    # rendent la main immédiatement ; les _do_* s'exécutent dans le thread
+    # du CommandWorker (ou en ligne s'il n'est pas démarré) et retournent
+    # False si la commande n'a pas atteint KSP (pas d'acquittement mesuré).
 
     def set_throttle(self, value: float) -> None:
+        if not self.connected:
+            return
+        v = max(0.0, min(1.0, value))
+        # Mise à jour optimiste : la boucle GPIO compare throttle_state pour
+        # ne pas redéposer la même consigne à chaque tick.
+        self.throttle_state = v
+        self.commands.submit("throttle", self._do_set_throttle, v, continuous=True)
+
+    # `origin` (nom de l'entrée, horodatage du front) : latence front → ack.
+
+    def set_sas(self, enabled: bool, origin: Optional[Origin] = None) -> None:
+        if self.connected:
+            self.commands.submit("sas", self._do_set_sas, enabled, origin=origin)
+
+    def set_rcs(self, enabled: bool, origin: Optional[Origin] = None) -> None:
+        if self.connected:
+            self.commands.submit("rcs", self._do_set_rcs, enabled, origin=origin)
+
+    def trigger_action_group(self, group: int, origin: Optional[Origin] = None) -> None:
+        if self.connected:
+            self.commands.submit(f"ag{group}", self._do_trigger_action_group, group, origin=origin)
+
+    def toggle_gear_and_brakes(self, origin: Optional[Origin] = None) -> None:
+        if self.connected:
+            self.commands.submit("gear_brakes", self._do_toggle_gear_and_brakes, origin=origin)
+
+    def toggle_map_camera(self, origin: Optional[Origin] = None) -> None:
+        if self.connected:
+            self.commands.submit("map_toggle", self._do_toggle_map_camera, origin=origin)
+
+    @contextmanager
+    def _command_route(self) -> Iterator[Optional["krpc.client.Client"]]:
+        """Connexion d'une commande : canal dédié sous son propre verrou
+        (jamais derrière la télémétrie), sinon connexion télémétrie sous
+        _lock. Fournit le client à passer à on_client (None : télémétrie)."""
+        channel = self.command_channel
+        if channel is not None and channel.connected:
+            with channel.lock:
+                if channel.connected:
+                    yield channel.client
+                    return
         with self._lock:
+            yield None
+
+    def _command_failed(self, client, label: str, error: Exception) -> None:
+        print(f"[KRPC] Erreur {label}: {error}")
+        if client is not None and isinstance(error, OSError):
+            # Canal coupé ou réponse hors délai : repli immédiat sur la
+            # connexion télémétrie, le superviseur du canal le rouvre.
+            self.command_channel.mark_lost(str(error) or type(error).__name__)
+            if self.command_supervisor.running:
+                self.command_supervisor.wake()
+
+    def _do_set_throttle(self, v: float) -> bool:
+        with self._command_route() as client:
             if not self.connected:
-                return
+                return False
             try:
-                v = max(0.0, min(1.0, value))
-                self.control.throttle = v
-                self.throttle_state = v
+                on_client(self.control, client).throttle = v
+                return True
             except Exception as e:
-                print(f"[KRPC] Erreur throttle: {e}")
+                self._command_failed(client, "throttle", e)
+                return False
 
-    def set_sas(self, enabled: bool) -> None:
-        with self._lock:
+    def _do_set_sas(self, enabled: bool) -> bool:
+        with self._command_route() as client:
             if not self.connected:
-                return
+                return False
             try:
-                self.control.sas = enabled
+                on_client(self.control, client).sas = enabled
                 self.sas_state = enabled
+                self._set_pending("sas", enabled)
+                return True
             except Exception as e:
-                print(f"[KRPC] Erreur SAS: {e}")
+                self._command_failed(client, "SAS", e)
+                return False
 
-    def set_rcs(self, enabled: bool) -> None:
-        with self._lock:
+    def _do_set_rcs(self, enabled: bool) -> bool:
+        with self._command_route() as client:
             if not self.connected:
-                return
+                return False
             try:
-                self.control.rcs = enabled
+                on_client(self.control, client).rcs = enabled
                 self.rcs_state = enabled
+                self._set_pending("rcs", enabled)
+                return True
             except Exception as e:
-                print(f"[KRPC] Erreur RCS: {e}")
+                self._command_failed(client, "RCS", e)
+                return False
 
-    def trigger_action_group(self, group: int) -> None:
-        with self._lock:
+    def _do_trigger_action_group(self, group: int) -> bool:
+        with self._command_route() as client:
             if not self.connected:
-                return
+                return False
             try:
-                self.control.toggle_action_group(group)
+                control = on_client(self.control, client)
+                key = f"ag{group % 10}"
+                state = self._control_state(key, control)
+                control.toggle_action_group(group)
+                self._set_pending(key, not state)
                 print(f"[KSP] AG {group} déclenché")
+                return True
             except Exception as e:
-                print(f"[KRPC] Erreur AG {group}: {e}")
+                self._command_failed(client, f"AG {group}", e)
+                return False
 
-    def toggle_gear_and_brakes(self) -> None:
-        with self._lock:
+    def _do_toggle_gear_and_brakes(self) -> bool:
+        with self._command_route() as client:
             if not self.connected:
-                return
+                return False
             try:
-                new_state = not self.control.gear
-                self.control.gear = new_state
-                self.control.brakes = new_state
+                control = on_client(self.control, client)
+                new_state = not self._control_state("gear", control)
+                control.gear = new_state
+                control.brakes = new_state
+                self._set_pending("gear", new_state)
+                self._set_pending("brakes", new_state)
                 print(f"[KSP] Train/Freins: {'ON' if new_state else 'OFF'}")
+                return True
             except Exception as e:
-                print(f"[KRPC] Erreur gear/brakes: {e}")
+                self._command_failed(client, "gear/brakes", e)
+                return False
 
-    def toggle_map_camera(self) -> None:
-        with self._lock:
+    def _do_toggle_map_camera(self) -> bool:
+        with self._command_route() as client:
             if not self.connected:
-                return
+                return False
             try:
-                mode = self.camera.mode
-                if mode == self.space_center.CameraMode.map:
-                    self.camera.mode = self.space_center.CameraMode.automatic
+                camera = on_client(self.camera, client)
+                modes = self.space_center.CameraMode
+                if camera.mode == modes.map:
+                    camera.mode = modes.automatic
                     print("[KSP] Caméra: AUTO")
                 else:
-                    self.camera.mode = self.space_center.CameraMode.map
+                    camera.mode = modes.map
                     print("[KSP] Caméra: CARTE")
+                return True
             except Exception as e:
-                print(f"[KRPC] Erreur caméra: {e}")
+                self._command_failed(client, "caméra", e)
+                return False
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+LED Framebuffer - Sorties LED groupées, envoyées par différence.
+
+La logique (GPIOHandler, tous threads) écrit la luminosité voulue par
+broche — valeur fixe ou effet (clignotement, fondu) — dans le
+framebuffer. Une fois par tick de gpio_loop, flush() calcule l'image
+courante et n'envoie que les broches qui ont changé, en un seul lot :
+
+- PigpioBatchWriter (pigpio distant) : toutes les commandes PWM du lot
+  partent dans un seul envoi socket, les réponses sont lues ensuite
+  (pipeline : un aller-retour réseau par tick au lieu d'un par LED) ;
+- GpiozeroWriter (GPIO local, MockFactory) : `PWMLED.value` par broche.
+
+Les effets sont rendus par flush() à la cadence de la boucle : pas de
+thread par LED (contrairement à PWMLED.blink()/pulse()).
+"""
+
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import REGISTRY
+
+_FLUSH_TIME = REGISTRY.histogram("capsule_led_flush_seconds", "Durée d'un envoi groupé des LEDs")
+_WRITES = REGISTRY.counter("capsule_led_writes_total", "Écritures PWM envoyées aux LEDs")
+_WRITE_ERRORS = REGISTRY.counter("capsule_led_write_errors_total", "Envois LED en échec")
+
+# Résolution de comparaison : plage PWM que gpiozero configure sur pigpio.
+PWM_STEPS = 10000
+
+# Commande PWM du protocole socket pigpio (set_PWM_dutycycle).
+_PI_CMD_PWM = 5
+_CMD = struct.Struct("IIII")
+
+
+class Blink:
+    """Clignotement : `level` pendant `duty` × `period_s`, éteint sinon."""
+
+    def __init__(self, level: float, period_s: float = 1.0, duty: float = 0.5, start: float = 0.0):
+        self.level = level
+        self.period_s = period_s
+        self.duty = duty
+        self.start = start
+
+    def value(self, now: float) -> float:
+        phase = ((now - self.start) % self.period_s) / self.period_s
+        return self.level if phase < self.duty else 0.0
+
+    def finished(self, now: float) -> bool:
+        return False
+
+
+class Fade:
+    """Fondu linéaire de `origin` vers `target` en `duration_s`."""
+
+    def __init__(self, origin: float, target: float, duration_s: float, start: float = 0.0):
+        self.origin = origin
+        self.target = target
+        self.duration_s = max(duration_s, 1e-6)
+        self.start = start
+
+    def value(self, now: float) -> float:
+        k = min(1.0, max(0.0, (now - self.start) / self.duration_s))
+        return self.origin + (self.target - self.origin) * k
+
+    def finished(self, now: float) -> bool:
+        return now - self.start >= self.duration_s
+
+
+class GpiozeroWriter:
+    """Écriture broche par broche via les PWMLED gpiozero."""
+
+    def __init__(self):
+        self.leds: Dict[int, object] = {}
+
+    def add(self, pin: int, led) -> None:
+        self.leds[pin] = led
+
+    def write(self, values: List[Tuple[int, float]]) -> None:
+        for pin, value in values:
+            self.leds[pin].value = value
+
+
+class PigpioBatchWriter:
+    """Commandes PWM pigpio en pipeline sur la connexion de la factory.
+
+    Les PWMLED gpiozero restent propriétaires des broches (mode, fréquence,
+    plage PWM) ; seul le rapport cyclique passe par ce lot.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        # pin → (plage PWM, active_high)
+        self._pins: Dict[int, Tuple[int, bool]] = {}
+
+    def add(self, pin: int, led) -> None:
+        self._pins[pin] = (int(self.connection.get_PWM_range(pin)), bool(led.active_high))
+
+    def write(self, values: List[Tuple[int, float]]) -> None:
+        payload = bytearray()
+        for pin, value in values:
+            pwm_range, active_high = self._pins[pin]
+            duty = value if active_high else 1.0 - value
+            payload += _CMD.pack(_PI_CMD_PWM, pin, int(round(duty * pwm_range)), 0)
+        sl = self.connection.sl
+        expected = _CMD.size * len(values)
+        with sl.l:
+            sl.s.sendall(payload)
+            reply = b""
+            while len(reply) < expected:
+                chunk = sl.s.recv(expected - len(reply))
+                if not chunk:
+                    raise ConnectionError("pigpio: connexion fermée")
+                reply += chunk
+        errors = [
+            pin for (pin, _), offset in zip(values, range(0, expected, _CMD.size))
+            if struct.unpack_from("i", reply, offset + 12)[0] < 0
+        ]
+        if errors:
+            raise RuntimeError(f"pigpio PWM refusé sur {errors}")
+
+
+class LedFramebuffer:
+    """Luminosité voulue par broche (valeur ou effet), envoyée par différence."""
+
+    def __init__(self, writer=None, clock: Callable[[], float] = time.monotonic):
+        self.writer = writer if writer is not None else GpiozeroWriter()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._values: Dict[int, float] = {}
+        self._effects: Dict[int, object] = {}
+        # Dernière valeur envoyée (pas PWM), None = jamais envoyée.
+        self._shown: Dict[int, Optional[int]] = {}
+
+    def add(self, pin: int, led, value: float = 0.0) -> None:
+        self.writer.add(pin, led)
+        with self._lock:
+            self._values[pin] = value
+            self._shown[pin] = None
+
+    @property
+    def pins(self) -> List[int]:
+        return list(self._values)
+
+    # ---- Écriture de l'image -------------------------------------------
+
+    def set(self, pin: int, value: float) -> None:
+        """Valeur fixe (annule l'effet en cours)."""
+        with self._lock:
+            if pin in self._values:
+                self._values[pin] = value
+                self._effects.pop(pin, None)
+
+    def blink(self, pin: int, level: float, period_s: float = 1.0, duty: float = 0.5) -> None:
+        with self._lock:
+            if pin in self._values:
+                current = self._effects.get(pin)
+                if isinstance(current, Blink) and (current.level, current.period_s, current.duty) == (
+                    level, period_s, duty
+                ):
+                    return  # déjà en cours : on garde la phase
+                self._effects[pin] = Blink(level, period_s, duty, self.clock())
+
+    def fade(self, pin: int, target: float, duration_s: float) -> None:
+        with self._lock:
+            if pin in self._values:
+                now = self.clock()
+                self._effects[pin] = Fade(self._current(pin, now), target, duration_s, now)
+                self._values[pin] = target
+
+    def get(self, pin: int) -> float:
+        """Valeur courante de l'image (effet compris)."""
+        with self._lock:
+            return self._current(pin, self.clock())
+
+    def _current(self, pin: int, now: float) -> float:
+        effect = self._effects.get(pin)
+        return effect.value(now) if effect is not None else self._values.get(pin, 0.0)
+
+    # ---- Envoi ---------------------------------------------------------
+
+    def flush(self) -> int:
+        """Envoie les broches dont la valeur a changé. Retourne leur nombre."""
+        now = self.clock()
+        changes: List[Tuple[int, float]] = []
+        with self._lock:
+            for pin in self._values:
+                effect = self._effects.get(pin)
+                if effect is not None and effect.finished(now):
+                    del self._effects[pin]
+                value = max(0.0, min(1.0, self._current(pin, now)))
+                step = int(round(value * PWM_STEPS))
+                if step != self._shown[pin]:
+                    changes.append((pin, step / PWM_STEPS))
+        if not changes:
+            return 0
+        t0 = time.perf_counter()
+        try:
+            self.writer.write(changes)
+        except Exception as e:
+            # Rien n'est marqué envoyé : nouvel essai au prochain flush.
+            _WRITE_ERRORS.inc()
+            print(f"[GPIO] Erreur envoi LEDs: {e}")
+            return 0
+        _FLUSH_TIME.observe(time.perf_counter() - t0)
+        _WRITES.inc(len(changes))
+        with self._lock:
+            for pin, value in changes:
+                self._shown[pin] = int(round(value * PWM_STEPS))
+        return len(changes)
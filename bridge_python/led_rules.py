@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+LED Rules - Comportement des LEDs déclaré en règles sur la télémétrie.
+
+Section `hardware.gpio.led_rules` de config.json, par ordre de priorité :
+
+    {"led": 24, "when": "current_stage in [4, 5, 6]", "effect": "on"}
+    {"led": 27, "when": "fuel_percent < 10", "effect": "blink", "period_s": 0.5}
+    {"led": 18, "when": "sas"}
+
+- `when` : condition, ou liste de conditions (toutes requises) ; une
+  condition est `champ`, `not champ` ou `champ <op> valeur` avec op parmi
+  == != < <= > >= in, not in, et valeur en JSON (`{4, 5, 6}` accepté) ;
+- `effect` : "on" (défaut), "off" ou "blink" (`period_s`, `duty`) ;
+  `brightness` par défaut celle du groupe de la LED.
+
+Pour chaque LED, la première règle vraie l'emporte ; aucune → éteinte.
+Les règles sont compilées au démarrage en un index champ → LEDs : à
+chaque mise à jour, seules les LEDs dont un champ d'entrée a changé sont
+réévaluées.
+"""
+
+import json
+import operator
+import re
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+EFFECTS = ("on", "off", "blink")
+
+# Champs calculés : (champs du payload requis, calcul depuis l'instantané).
+DERIVED_FIELDS: Dict[str, Tuple[Tuple[str, ...], Callable[[Mapping[str, Any]], Any]]] = {
+    # Carburant de l'étage courant (première entrée de `stages`).
+    "fuel_percent": (
+        ("stages",),
+        lambda data: data["stages"][0]["fuel_percent"] if data.get("stages") else None,
+    ),
+}
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda a, b: a in b,
+    "not in": lambda a, b: a not in b,
+}
+
+_CONDITION = re.compile(
+    r"^(?P<neg>not\s+)?(?P<field>[A-Za-z_]\w*)"
+    r"(?:\s*(?P<op>==|!=|<=|>=|<|>|not\s+in\b|in\b)\s*(?P<value>.+))?$"
+)
+
+# État de sortie d'une LED : (effet, luminosité, période, rapport cyclique).
+LedOutput = Tuple[str, float, float, float]
+LED_OFF: LedOutput = ("off", 0.0, 0.0, 0.0)
+
+
+def _parse_value(text: str) -> Any:
+    text = text.strip()
+    if text.startswith("{") and text.endswith("}"):
+        text = "[" + text[1:-1] + "]"
+    try:
+        value = json.loads(text)
+    except ValueError:
+        raise ValueError(f"valeur invalide: {text}") from None
+    return frozenset(value) if isinstance(value, list) else value
+
+
+def compile_condition(text: str) -> Tuple[str, Callable[[Any], bool]]:
+    """"champ op valeur" → (champ, prédicat sur la valeur du champ)."""
+    m = _CONDITION.match(text.strip())
+    if m is None:
+        raise ValueError(f"condition invalide: {text!r}")
+    field = m.group("field")
+    if m.group("op") is None:
+        if m.group("neg"):
+            return field, lambda v: not v
+        return field, bool
+    if m.group("neg"):
+        raise ValueError(f"condition invalide: {text!r}")
+    op = _OPERATORS[" ".join(m.group("op").split())]
+    expected = _parse_value(m.group("value"))
+
+    def predicate(v: Any) -> bool:
+        if v is None:
+            return False
+        try:
+            return bool(op(v, expected))
+        except TypeError:
+            return False
+
+    return field, predicate
+
+
+class LedRule:
+    """Une règle compilée : conditions (toutes requises) → sortie de la LED."""
+
+    __slots__ = ("led", "conditions", "output", "text")
+
+    def __init__(self, led: int, conditions: List[Tuple[str, Callable[[Any], bool]]],
+                 output: LedOutput, text: str):
+        self.led = led
+        self.conditions = conditions
+        self.output = output
+        self.text = text
+
+    @property
+    def fields(self) -> Set[str]:
+        return {field for field, _ in self.conditions}
+
+    def matches(self, values: Mapping[str, Any]) -> bool:
+        return all(pred(values.get(field)) for field, pred in self.conditions)
+
+
+def compile_rule(raw: Dict, default_brightness: float = 1.0) -> LedRule:
+    led = int(raw["led"])
+    when = raw.get("when", [])
+    texts = [when] if isinstance(when, str) else list(when)
+    conditions = [compile_condition(t) for t in texts]
+    effect = raw.get("effect", "on")
+    if effect not in EFFECTS:
+        raise ValueError(f"effet inconnu: {effect}")
+    if effect == "off":
+        output = LED_OFF
+    else:
+        output = (
+            effect,
+            float(raw.get("brightness", default_brightness)),
+            float(raw.get("period_s", 1.0)),
+            float(raw.get("duty", 0.5)),
+        )
+    return LedRule(led, conditions, output, " and ".join(texts) or "toujours")
+
+
+class LedRuleEngine:
+    """Règles LED indexées par champ ; réévaluation sur changement seulement."""
+
+    def __init__(self, rules: Iterable[LedRule]):
+        self.rules: Dict[int, List[LedRule]] = {}
+        for rule in rules:
+            self.rules.setdefault(rule.led, []).append(rule)
+        # Index de dépendances : champ → LEDs dont une règle le lit.
+        deps: Dict[str, Set[int]] = {}
+        for led, led_rules in self.rules.items():
+            for rule in led_rules:
+                for field in rule.fields:
+                    deps.setdefault(field, set()).add(led)
+        self.index: Dict[str, FrozenSet[int]] = {field: frozenset(leds) for field, leds in deps.items()}
+        self.fields: FrozenSet[str] = frozenset(self.index)
+        self._values: Dict[str, Any] = {}
+        self._outputs: Dict[int, LedOutput] = {}
+        self._first = True
+        self.evaluations = 0
+
+    @classmethod
+    def from_config(cls, raw_rules: Iterable[Dict],
+                    brightness_by_pin: Optional[Mapping[int, float]] = None) -> "LedRuleEngine":
+        brightness_by_pin = brightness_by_pin or {}
+        rules = []
+        for raw in raw_rules:
+            try:
+                rules.append(compile_rule(raw, brightness_by_pin.get(int(raw["led"]), 1.0)))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Règle LED invalide {raw}: {e}") from None
+        return cls(rules)
+
+    @property
+    def pins(self) -> FrozenSet[int]:
+        return frozenset(self.rules)
+
+    def payload_fields(self) -> FrozenSet[str]:
+        """Champs du payload télémétrie à streamer pour ces règles."""
+        out: Set[str] = set()
+        for field in self.fields:
+            derived = DERIVED_FIELDS.get(field)
+            out.update(derived[0] if derived else (field,))
+        return frozenset(out)
+
+    def reset(self) -> None:
+        """La prochaine mise à jour réévalue et renvoie toutes les LEDs."""
+        self._first = True
+        self._outputs = {}
+
+    def update(self, values: Mapping[str, Any]) -> Dict[int, LedOutput]:
+        """`values` : valeur courante de chaque champ de `fields`.
+
+        Retourne les LEDs dont la sortie a changé.
+        """
+        if self._first:
+            dirty: Set[int] = set(self.rules)
+            self._first = False
+        else:
+            dirty = set()
+            for field, leds in self.index.items():
+                if values.get(field) != self._values.get(field):
+                    dirty.update(leds)
+        self._values = {field: values.get(field) for field in self.fields}
+        changed: Dict[int, LedOutput] = {}
+        for led in dirty:
+            self.evaluations += 1
+            output = next(
+                (rule.output for rule in self.rules[led] if rule.matches(self._values)), LED_OFF
+            )
+            if self._outputs.get(led) != output:
+                self._outputs[led] = output
+                changed[led] = output
+        return changed
+
+    def describe(self) -> List[str]:
+        return [
+            f"LED {led}: {rule.output[0]} si {rule.text}"
+            for led, led_rules in sorted(self.rules.items()) for rule in led_rules
+        ]
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Loop Scheduler - Cadence à échéances absolues pour les boucles périodiques.
+
+Les boucles (télémétrie, GPIO, diffusion WebSocket) ne font plus
+« travail puis attente(intervalle) », dont la cadence réelle vaut
+1/(travail + intervalle) et dérive avec la latence réseau : chaque tick
+vise une échéance absolue sur une grille fixe.
+
+- Tick en retard : compté comme dépassement (overrun) ; les échéances
+  entièrement manquées sont sautées (comptées) au lieu d'être rattrapées
+  en rafale, et la grille repart de l'instant courant.
+- Mode adaptatif (optionnel) : si la charge moyenne (durée du tick /
+  intervalle) dépasse 1, la cadence baisse par paliers jusqu'à `min_hz` ;
+  elle remonte vers la cadence cible quand la charge projetée redevient
+  faible.
+
+Tout est exporté dans metrics.py avec le label loop="<nom>".
+"""
+
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, Optional
+
+from metrics import REGISTRY
+
+# Palier de baisse / hausse de cadence en mode adaptatif.
+RATE_DOWN = 0.75
+RATE_UP = 1.25
+# Hausse seulement si la charge projetée à la nouvelle cadence reste sous ce seuil.
+RECOVER_LOAD = 0.7
+
+
+class DeadlineScheduler:
+    """Échéancier d'une boucle périodique (thread ou asyncio)."""
+
+    def __init__(
+        self,
+        name: str,
+        hz: float,
+        adaptive: bool = False,
+        min_hz: Optional[float] = None,
+        adapt_window: int = 40,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.target_hz = float(hz)
+        self.hz = self.target_hz
+        self.adaptive = adaptive
+        self.min_hz = min(self.target_hz, float(min_hz)) if min_hz else self.target_hz / 4.0
+        # Nombre de ticks entre deux ajustements (et fenêtre de la moyenne).
+        self.adapt_window = max(2, adapt_window)
+        self.clock = clock
+
+        self.interval = 1.0 / self.hz
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.last_late = 0.0
+        self._deadline: Optional[float] = None
+        # Moyenne exponentielle de la charge (durée du tick / intervalle).
+        self._load = 0.0
+        self._alpha = 2.0 / (self.adapt_window + 1)
+        self._since_adapt = 0
+
+        labels = {"loop": name}
+        # Gigue : retard du début de tick sur son échéance.
+        self.start_delay = REGISTRY.histogram(
+            "capsule_loop_start_delay_seconds", "Retard du début de tick sur son échéance", labels
+        )
+        self._m_tick = REGISTRY.histogram("capsule_loop_tick_seconds", "Durée d'un tick de boucle", labels)
+        self._m_late = REGISTRY.gauge(
+            "capsule_loop_overrun_seconds", "Retard du dernier tick sur son échéance", labels
+        )
+        self._m_overruns = REGISTRY.counter(
+            "capsule_loop_overruns_total", "Ticks terminés après l'échéance suivante", labels
+        )
+        self._m_skipped = REGISTRY.counter(
+            "capsule_loop_skipped_ticks_total", "Échéances sautées (non rattrapées)", labels
+        )
+        REGISTRY.gauge("capsule_loop_rate_hz", "Cadence courante de la boucle", labels, fn=lambda: self.hz)
+
+    # ---- Cadence -----------------------------------------------------
+
+    def set_hz(self, hz: float) -> None:
+        """Change la cadence cible (et courante) ; prise en compte au tick suivant."""
+        self.target_hz = float(hz)
+        self.min_hz = min(self.min_hz, self.target_hz)
+        self._set_rate(self.target_hz)
+
+    def _set_rate(self, hz: float) -> None:
+        old = self.hz
+        self.hz = hz
+        self.interval = 1.0 / hz
+        # Charge ramenée au nouvel intervalle.
+        self._load *= hz / old
+        self._since_adapt = 0
+
+    @property
+    def load(self) -> float:
+        return self._load
+
+    # ---- Échéances ---------------------------------------------------
+
+    def first_deadline(self) -> float:
+        self._deadline = self.clock()
+        return self._deadline
+
+    def tick_started(self) -> float:
+        """Horodate le début d'un tick (et mesure sa gigue)."""
+        started = self.clock()
+        if self._deadline is not None:
+            self.start_delay.observe(max(0.0, started - self._deadline))
+        return started
+
+    def tick_done(self, started: float, now: Optional[float] = None) -> float:
+        """Enregistre un tick [started, now] et renvoie l'échéance suivante."""
+        if now is None:
+            now = self.clock()
+        if self._deadline is None:
+            self._deadline = started
+        work = now - started
+        self.ticks += 1
+        self._m_tick.observe(work)
+
+        deadline = self._deadline + self.interval
+        late = now - deadline
+        if late > 0:
+            self.overruns += 1
+            self._m_overruns.inc()
+            missed = int(late // self.interval)
+            if missed:
+                self.skipped += missed
+                self._m_skipped.inc(missed)
+            # Pas de rafale de rattrapage : on repart de maintenant.
+            deadline = now
+        self.last_late = max(0.0, late)
+        self._m_late.set(self.last_late)
+
+        if self.adaptive:
+            self._adapt(work)
+        self._deadline = deadline
+        return deadline
+
+    def _adapt(self, work: float) -> None:
+        self._load += self._alpha * (work / self.interval - self._load)
+        self._since_adapt += 1
+        if self._since_adapt < self.adapt_window:
+            return
+        if self._load > 1.0 and self.hz > self.min_hz:
+            hz = max(self.min_hz, self.hz * RATE_DOWN)
+            print(f"[SCHED] {self.name}: surcharge ({self._load:.2f}), {self.hz:.1f} → {hz:.1f}Hz")
+            self._set_rate(hz)
+        elif self.hz < self.target_hz:
+            hz = min(self.target_hz, self.hz * RATE_UP)
+            if self._load * hz / self.hz < RECOVER_LOAD:
+                print(f"[SCHED] {self.name}: rétabli, {self.hz:.1f} → {hz:.1f}Hz")
+                self._set_rate(hz)
+
+    # ---- Boucles -----------------------------------------------------
+
+    def run(self, tick: Callable[[], None], stop_event: threading.Event) -> None:
+        """Exécute `tick` à chaque échéance jusqu'à stop_event (thread)."""
+        self.first_deadline()
+        while not stop_event.is_set():
+            started = self.tick_started()
+            tick()
+            deadline = self.tick_done(started)
+            delay = deadline - self.clock()
+            if delay > 0:
+                stop_event.wait(delay)
+
+    async def run_async(self, tick: Callable[[], Optional[Awaitable[None]]]) -> None:
+        """Variante asyncio (annulée avec sa tâche)."""
+        self.first_deadline()
+        while True:
+            started = self.tick_started()
+            result = tick()
+            if result is not None:
+                await result
+            deadline = self.tick_done(started)
+            await asyncio.sleep(max(0.0, deadline - self.clock()))
@@ -6,20 +6,45 @@ Orchestre KRPC, Pico (ADC throttle), GPIO (Raspberry) et le serveur
 WebSocket qui alimente l'UI Godot.
 
 Architecture multi-thread :
-- Thread télémétrie kRPC (update_hz, défaut 20Hz)
-- Thread GPIO (throttle + LEDs, 20Hz)
+- Thread télémétrie kRPC (update_hz, défaut 20Hz ; ou mode "event" réveillé
+  par les callbacks stream, plafonné à max_hz)
+- Thread GPIO (throttle + LEDs, hardware.gpio.update_hz, défaut 20Hz)
+- Boucles périodiques cadencées sur échéances absolues (loop_scheduler),
+  cadence éventuellement adaptative (`adaptive`, `min_hz`)
 - Thread WebSocket (asyncio, diffusion à update_hz)
-- Boutons/leviers : event-driven via callbacks gpiozero (thread pigpio)
+- Thread commandes kRPC (CommandWorker, file à priorité)
+- Threads superviseurs kRPC (connexion télémétrie, canal commandes :
+  keepalive, reconnexion avec backoff)
+- Boutons/leviers : event-driven via callbacks gpiozero (thread pigpio),
+  qui déposent leurs commandes sans bloquer
+- Enregistreur de vol optionnel (thread d'écriture)
+
+Mode alternatif (runtime.mode = "asyncio" ou --runtime asyncio) : une
+seule boucle asyncio porte WebSocket, télémétrie, GPIO et commandes, les
+appels bloquants passent par des exécuteurs bornés (voir async_runtime).
+
+Rejeu d'un vol enregistré, sans KSP :
+    python3 main.py --replay logs/flight-XXXX.caplog [--speed 4 | --speed 0]
 """
 
+import argparse
 import json
 import sys
 import threading
+import time
 from pathlib import Path
+from typing import Optional
 
+from adc_calibration import CalibrationProfile, ChannelCalibration
+from async_runtime import AsyncRuntime
+from flight_recorder import FlightLog, FlightRecorder, ReplaySource, replay
+from gpio_handler import GPIOHandler
 from krpc_handler import KRPCHandler
+from loop_scheduler import DeadlineScheduler
 from pico_handler import PicoHandler
-from gpio_handler import GPIOHandler
+from telemetry_history import REQUIRED_FIELDS as HISTORY_REQUIRED_FIELDS
+from telemetry_history import TelemetryHistory
+from throttle_filter import build_filter
 from websocket_server import WebSocketServer
 
 
@@ -42,43 +67,293 @@ def load_config() -> dict:
     sys.exit(1)
 
 
-def telemetry_loop(krpc: KRPCHandler, hz: int, stop_event: threading.Event) -> None:
-    """Lit la télémétrie kRPC à la cadence demandée et gère la reconnexion."""
-    interval = 1.0 / max(1, hz)
+def build_scheduler(name: str, cfg: dict, default_hz: float = 20.0) -> DeadlineScheduler:
+    """Échéancier d'une boucle depuis sa section de config
+    (`update_hz`, `adaptive`, `min_hz`)."""
+    return DeadlineScheduler(
+        name,
+        hz=max(1.0, float(cfg.get("update_hz", default_hz))),
+        adaptive=bool(cfg.get("adaptive", False)),
+        min_hz=cfg.get("min_hz"),
+    )
+
+
+def telemetry_tick(krpc: KRPCHandler) -> None:
+    """Un tick télémétrie : lecture, ou état de la connexion (la reconnexion
+    est faite par le superviseur kRPC : aucune attente ici)."""
+    try:
+        if krpc.connected:
+            krpc.update_telemetry()
+        else:
+            krpc.reconnect_if_needed()
+    except Exception as e:
+        print(f"[TELEM] Erreur: {e}")
+
+
+def telemetry_loop(
+    krpc: KRPCHandler, scheduler: DeadlineScheduler, stop_event: threading.Event
+) -> None:
+    """Lit la télémétrie kRPC à la cadence de `scheduler` et gère la reconnexion."""
+    scheduler.run(lambda: telemetry_tick(krpc), stop_event)
+
+
+def telemetry_event_loop(
+    krpc: KRPCHandler, max_hz: int, heartbeat_s: float, stop_event: threading.Event
+) -> None:
+    """Télémétrie événementielle : réveil par les callbacks stream kRPC.
+
+    Un instantané n'est publié que si une valeur a changé, au plus à
+    max_hz, et au moins toutes les heartbeat_s (signe de vie). Au repos
+    (pas de tir, time warp) le thread dort au lieu de relire les streams.
+    """
+    min_interval = 1.0 / max(1, max_hz)
+    last = 0.0
     while not stop_event.is_set():
         try:
             if krpc.connected:
+                krpc.wait_for_change(heartbeat_s)
+                wait = last + min_interval - time.monotonic()
+                if wait > 0:
+                    stop_event.wait(wait)
+                last = time.monotonic()
                 krpc.update_telemetry()
             else:
                 krpc.reconnect_if_needed()
+                stop_event.wait(min_interval)
         except Exception as e:
             print(f"[TELEM] Erreur: {e}")
-        stop_event.wait(interval)
+            stop_event.wait(min_interval)
 
 
-def gpio_loop(gpio: GPIOHandler, hz: int, stop_event: threading.Event) -> None:
-    """Rafraîchit throttle (lecture Pico) + LEDs à cadence fixe.
-
-    `picod` utilise des threading.local() : la connexion au Pico doit être
-    établie depuis ce thread pour que les adc_read() suivants fonctionnent.
-    """
+def gpio_setup(gpio: GPIOHandler) -> None:
+    """`picod` utilise des threading.local() : la connexion au Pico doit être
+    établie depuis le thread qui fera les adc_read() (en acquisition par
+    blocs, c'est le thread lecteur du PicoHandler qui s'en charge)."""
     if gpio.pico is not None and not gpio.pico.connected:
         gpio.pico.connect()
-    interval = 1.0 / max(1, hz)
-    while not stop_event.is_set():
-        try:
-            gpio.update()
-        except Exception as e:
-            print(f"[GPIO] Erreur: {e}")
-        stop_event.wait(interval)
+
+
+def gpio_tick(gpio: GPIOHandler) -> None:
+    try:
+        gpio.update()
+    except Exception as e:
+        print(f"[GPIO] Erreur: {e}")
+
+
+def gpio_loop(
+    gpio: GPIOHandler, scheduler: DeadlineScheduler, stop_event: threading.Event
+) -> None:
+    """Rafraîchit throttle (lecture Pico) + LEDs à la cadence de `scheduler`."""
+    gpio_setup(gpio)
+    scheduler.run(lambda: gpio_tick(gpio), stop_event)
+
+
+def build_history(config: dict, source) -> Optional[TelemetryHistory]:
+    """Historique en mémoire branché sur les instantanés de `source`."""
+    hcfg = config.get("history", {})
+    if not hcfg.get("enabled", True):
+        return None
+    history = TelemetryHistory(
+        window_s=float(hcfg.get("window_s", 3600.0)),
+        sample_hz=float(hcfg.get("sample_hz", 5.0)),
+    )
+    source.require_fields("history", HISTORY_REQUIRED_FIELDS)
+    source.add_snapshot_listener(history.append)
+    print(
+        f"[HIST] {history.window_s:g}s à {history.sample_hz:g}Hz "
+        f"({history.nbytes / 1e6:.1f} Mo)"
+    )
+    return history
+
+
+def build_ws_server(config: dict, source, history) -> WebSocketServer:
+    wcfg = config.get("websocket", {})
+    return WebSocketServer(
+        krpc=source,
+        host=wcfg.get("host", "0.0.0.0"),
+        port=wcfg.get("port", 8080),
+        update_hz=int(wcfg.get("update_hz", 20)),
+        delta_cfg=wcfg.get("delta"),
+        send_timeout_s=float(wcfg.get("send_timeout_s", 0.5)),
+        max_send_timeouts=int(wcfg.get("max_send_timeouts", 3)),
+        ping_interval_s=float(wcfg.get("ping_interval_s", 5.0)),
+        max_client_hz=float(wcfg.get("max_client_hz", 60.0)),
+        history=history,
+        metrics_path=wcfg.get("metrics_path", "/metrics"),
+    )
+
+
+def build_recorder(config: dict) -> Optional[FlightRecorder]:
+    rcfg = config.get("recorder", {})
+    if not rcfg.get("enabled", False):
+        return None
+    directory = Path(rcfg.get("dir", "logs"))
+    if not directory.is_absolute():
+        directory = Path(__file__).resolve().parent / directory
+    name = time.strftime("flight-%Y%m%d-%H%M%S.caplog")
+    return FlightRecorder(directory / name, max_queue=int(rcfg.get("max_queue", 10000)))
+
+
+def load_calibration(config: dict) -> Optional[ChannelCalibration]:
+    """Calibration du canal throttle (hardware.pico.calibration) ou None."""
+    pcfg = config.get("hardware", {}).get("pico", {})
+    if not pcfg.get("calibration"):
+        return None
+    path = Path(pcfg["calibration"])
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parent / path
+    try:
+        profile = CalibrationProfile.load(path)
+    except FileNotFoundError:
+        print(f"[PICO] ⚠ Profil de calibration absent ({path}) : course 0-4095 par défaut")
+        return None
+    except (ValueError, TypeError) as e:
+        print(f"[PICO] ⚠ Profil de calibration invalide ({path}): {e}")
+        return None
+    channel = pcfg.get("adc_channel_throttle", 0)
+    if channel not in profile.channels:
+        print(f"[PICO] ⚠ Profil '{profile.panel}' sans canal {channel} : course 0-4095 par défaut")
+        return None
+    print(f"[PICO] Calibration '{profile.panel}' (canal {channel})")
+    return profile.channels[channel]
+
+
+def run_replay(config: dict, path: str, speed: float) -> None:
+    """Rejoue un journal dans le vrai WebSocketServer et la logique LED."""
+    source = ReplaySource()
+    history = build_history(config, source)
+    gpio_cfg = config.get("hardware", {}).get("gpio")
+    gpio = GPIOHandler(krpc=source, pico=None, config=gpio_cfg)
+    ws = build_ws_server(config, source, history)
+    threading.Thread(target=ws.start, daemon=True).start()
+
+    stop_event = threading.Event()
+    gpio_sched = build_scheduler("gpio", gpio_cfg or {})
+    gpio_thread = threading.Thread(
+        target=gpio_loop, args=(gpio, gpio_sched, stop_event), daemon=True
+    )
+    gpio_thread.start()
+    label = "max" if speed <= 0 else f"{speed:g}×"
+    print(f"[REPLAY] {path} à vitesse {label}")
+    t0 = time.monotonic()
+    try:
+        with FlightLog(path) as log:
+            n = replay(log, source, on_input=gpio.replay_input, speed=speed, stop_event=stop_event)
+        print(f"[REPLAY] Terminé : {n} enregistrements en {time.monotonic() - t0:.1f}s")
+        # Le dernier état reste servi jusqu'à Ctrl-C.
+        stop_event.wait()
+    except KeyboardInterrupt:
+        print("\n[MAIN] Ctrl-C")
+    finally:
+        stop_event.set()
+        gpio_thread.join(timeout=2.0)
+        gpio.cleanup()
+        print("[MAIN] Arrêt")
+
+
+def run_threads(config: dict, krpc: KRPCHandler, gpio: GPIOHandler, ws: WebSocketServer) -> None:
+    """Un thread par sous-système ; bloque jusqu'à Ctrl-C."""
+    krpc.commands.start()
+    threading.Thread(target=ws.start, daemon=True).start()
+
+    stop_event = threading.Event()
+    telcfg = config.get("telemetry", {})
+    telem_mode = telcfg.get("mode", "poll")
+    telem_hz = int(telcfg.get("update_hz", 20))
+    gpio_sched = build_scheduler("gpio", config.get("hardware", {}).get("gpio") or {})
+
+    if telem_mode == "event":
+        telem_hz = int(telcfg.get("max_hz", telem_hz))
+        telem_thread = threading.Thread(
+            target=telemetry_event_loop,
+            args=(krpc, telem_hz, krpc.heartbeat_s, stop_event),
+            daemon=True,
+        )
+    else:
+        telem_thread = threading.Thread(
+            target=telemetry_loop,
+            args=(krpc, build_scheduler("telemetry", telcfg), stop_event),
+            daemon=True,
+        )
+    gpio_thread = threading.Thread(
+        target=gpio_loop, args=(gpio, gpio_sched, stop_event), daemon=True
+    )
+    telem_thread.start()
+    gpio_thread.start()
+
+    print("=" * 60)
+    print(
+        f"Threads lancés : télémétrie {telem_mode} {telem_hz}Hz, "
+        f"GPIO {gpio_sched.hz:g}Hz, WS {1.0 / ws.interval:g}Hz"
+    )
+    print("Boutons/leviers : event-driven (gpiozero callbacks)")
+    print("Ctrl-C pour arrêter")
+    print("=" * 60)
+
+    # ---- Attente jusqu'à Ctrl-C -------------------------------------
+    try:
+        stop_event.wait()
+    except KeyboardInterrupt:
+        print("\n[MAIN] Ctrl-C")
+    finally:
+        stop_event.set()
+        telem_thread.join(timeout=2.0)
+        gpio_thread.join(timeout=2.0)
+
+
+def build_runtime(
+    config: dict, krpc: KRPCHandler, gpio: GPIOHandler, ws: WebSocketServer, workers: int = 2
+) -> AsyncRuntime:
+    """Boucle asyncio unique : WS, télémétrie (scrutation), GPIO, commandes."""
+    telcfg = config.get("telemetry", {})
+    if telcfg.get("mode", "poll") == "event":
+        print("[MAIN] Runtime asyncio : télémétrie en mode poll (update_hz)")
+    runtime = AsyncRuntime(workers=workers)
+    runtime.add_service(ws.serve)
+    runtime.add_periodic(build_scheduler("telemetry", telcfg), lambda: telemetry_tick(krpc))
+    runtime.add_periodic(
+        build_scheduler("gpio", config.get("hardware", {}).get("gpio") or {}),
+        lambda: gpio_tick(gpio),
+        dedicated=True,
+        setup=lambda: gpio_setup(gpio),
+    )
+    runtime.add_commands(krpc.commands)
+    return runtime
+
+
+def run_asyncio(
+    config: dict, krpc: KRPCHandler, gpio: GPIOHandler, ws: WebSocketServer, workers: int = 2
+) -> None:
+    runtime = build_runtime(config, krpc, gpio, ws, workers)
+    print("=" * 60)
+    print(f"Runtime asyncio : 1 boucle, {runtime.workers} threads d'E/S + 1 thread Pico")
+    print("Ctrl-C pour arrêter")
+    print("=" * 60)
+    runtime.run()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="La Capsule V3 - bridge KSP")
+    parser.add_argument("--replay", metavar="JOURNAL", help="Rejoue un vol enregistré (sans KSP)")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="Vitesse de rejeu (1 = temps réel, 0 = max)"
+    )
+    parser.add_argument(
+        "--runtime", choices=("threads", "asyncio"), help="Surcharge runtime.mode de config.json"
+    )
+    return parser.parse_args()
 
 
 def main() -> None:
+    args = parse_args()
     print("=" * 60)
     print("La Capsule V3 - KSP Hardware Control")
     print("=" * 60)
 
     config = load_config()
+    if args.replay:
+        run_replay(config, args.replay, args.speed)
+        return
 
     # ---- KRPC -------------------------------------------------------
     kcfg = config.get("krpc", {})
@@ -86,12 +361,18 @@ def main() -> None:
         host=kcfg.get("host", "127.0.0.1"),
         rpc_port=kcfg.get("rpc_port", 50008),
         stream_port=kcfg.get("stream_port", 50001),
-        reconnect_timeout_s=kcfg.get("reconnect_timeout_s", 5),
+        heartbeat_s=float(config.get("telemetry", {}).get("heartbeat_s", 1.0)),
+        connect_timeout_s=float(kcfg.get("connect_timeout_s", 3.0)),
+        rpc_timeout_s=float(kcfg.get("rpc_timeout_s", 5.0)),
+        keepalive_s=float(kcfg.get("keepalive_s", 1.0)),
+        reconnect_min_s=float(kcfg.get("reconnect_min_s", 0.5)),
+        reconnect_max_s=float(kcfg.get("reconnect_max_s", 30.0)),
+        command_channel=bool(kcfg.get("command_channel", True)),
     )
-    krpc.connect()
 
     # ---- Pico (ADC) -------------------------------------------------
     pcfg = config.get("hardware", {}).get("pico", {})
+    scfg = pcfg.get("sampling", {})
     tcfg = config.get("throttle", {})
     pico = PicoHandler(
         port=pcfg.get("port", "/dev/ttyACM0"),
@@ -99,60 +380,53 @@ def main() -> None:
         alpha=tcfg.get("smoothing_alpha", 0.25),
         deadzone=tcfg.get("deadzone_percent", 3.0) / 100.0,
         output_deadband=tcfg.get("output_deadband_percent", 1.0) / 100.0,
+        sampling=scfg.get("mode", "tick"),
+        sample_hz=float(scfg.get("sample_hz", 250.0)),
+        channels=scfg.get("channels"),
+        reduce=scfg.get("reduce", "median"),
+        throttle_filter=build_filter(tcfg),
+        calibration=load_calibration(config),
     )
 
     # ---- GPIO -------------------------------------------------------
     gpio_cfg = config.get("hardware", {}).get("gpio")
     gpio = GPIOHandler(krpc=krpc, pico=pico, config=gpio_cfg)
 
-    # Retour au lancement : on ré-aligne LEDs et leviers sur le nouveau vaisseau.
+    # Connexion (puis retour au lancement, switch) : on ré-aligne LEDs et
+    # leviers sur le vaisseau lié.
     krpc.on_vessel_changed = gpio.resync_vessel_state
-    if krpc.connected:
-        gpio.resync_vessel_state()
-
-    # ---- WebSocket --------------------------------------------------
-    wcfg = config.get("websocket", {})
-    ws_hz = int(wcfg.get("update_hz", 20))
-    ws = WebSocketServer(
-        krpc=krpc,
-        host=wcfg.get("host", "0.0.0.0"),
-        port=wcfg.get("port", 8080),
-        update_hz=ws_hz,
-    )
-    threading.Thread(target=ws.start, daemon=True).start()
-
-    # ---- Threads télémétrie + GPIO ----------------------------------
-    stop_event = threading.Event()
-    telem_hz = int(config.get("telemetry", {}).get("update_hz", 20))
-    gpio_hz = 20
-
-    telem_thread = threading.Thread(
-        target=telemetry_loop, args=(krpc, telem_hz, stop_event), daemon=True
-    )
-    gpio_thread = threading.Thread(
-        target=gpio_loop, args=(gpio, gpio_hz, stop_event), daemon=True
-    )
-    telem_thread.start()
-    gpio_thread.start()
+    # Connexion en arrière-plan : le bridge démarre et sert l'instantané
+    # « déconnecté » même si le PC de jeu est injoignable.
+    krpc.start_supervision()
 
-    print("=" * 60)
-    print(f"Threads lancés : télémétrie {telem_hz}Hz, GPIO {gpio_hz}Hz, WS {ws_hz}Hz")
-    print("Boutons/leviers : event-driven (gpiozero callbacks)")
-    print("Ctrl-C pour arrêter")
-    print("=" * 60)
+    # ---- Historique + enregistreur ---------------------------------
+    history = build_history(config, krpc)
+    recorder = build_recorder(config)
+    if recorder is not None:
+        recorder.start()
+        recorder.attach(krpc)
+        gpio.on_input = recorder.record_input
 
-    # ---- Attente jusqu'à Ctrl-C -------------------------------------
+    # ---- WebSocket + boucles ---------------------------------------
+    ws = build_ws_server(config, krpc, history)
+    rcfg = config.get("runtime", {})
+    mode = args.runtime or rcfg.get("mode", "threads")
     try:
-        stop_event.wait()
-    except KeyboardInterrupt:
-        print("\n[MAIN] Ctrl-C")
+        if mode == "asyncio":
+            run_asyncio(config, krpc, gpio, ws, workers=int(rcfg.get("executor_workers", 2)))
+        else:
+            run_threads(config, krpc, gpio, ws)
     finally:
-        stop_event.set()
-        telem_thread.join(timeout=2.0)
-        gpio_thread.join(timeout=2.0)
         gpio.cleanup()
         pico.disconnect()
         krpc.disconnect()
+        if recorder is not None:
+            recorder.stop()
+        for label, st in sorted(krpc.commands.latency_summary().items()):
+            print(
+                f"[CMD] {label}: n={st['count']} p50={st['p50_ms']:.1f}ms "
+                f"p99={st['p99_ms']:.1f}ms max={st['max_ms']:.1f}ms"
+            )
         print("[MAIN] Arrêt")
 
 
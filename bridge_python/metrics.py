@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Metrics - Instrumentation légère des chemins chauds (format Prometheus).
+
+- Histogram : histogramme log-linéaire façon HDR (16 sous-seaux par
+  puissance de deux, ~6 % d'erreur relative) sur des microsecondes
+  entières ; enregistrement O(1) sans allocation. Exposé comme summary
+  Prometheus (quantiles + _sum + _count).
+- Counter : compteur monotone (ou lu via une fonction).
+- Gauge : valeur instantanée (ou lue via une fonction au scrape).
+
+Le registre global REGISTRY est rendu en texte Prometheus par render() ;
+websocket_server.py le sert sur HTTP GET /metrics.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+SUB_BITS = 4
+SUB_COUNT = 1 << SUB_BITS
+# Jusqu'à 2^40 µs (~12 jours) : largement au-delà de tout tick.
+MAX_EXPONENT = 40
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _bucket_index(us: int) -> int:
+    """Index log-linéaire : valeurs < 16 exactes, puis 16 seaux par octave."""
+    if us < SUB_COUNT:
+        return us
+    exponent = us.bit_length() - SUB_BITS - 1
+    return (exponent + 1) * SUB_COUNT + ((us >> exponent) - SUB_COUNT)
+
+
+def _bucket_upper(index: int) -> int:
+    """Borne haute (µs, incluse) du seau `index`."""
+    if index < SUB_COUNT:
+        return index
+    exponent = index // SUB_COUNT - 1
+    mantissa = index % SUB_COUNT + SUB_COUNT
+    return ((mantissa + 1) << exponent) - 1
+
+
+_N_BUCKETS = _bucket_index((1 << MAX_EXPONENT) - 1) + 1
+
+
+class Histogram:
+    """Durées (secondes) enregistrées dans des seaux HDR en microsecondes."""
+
+    __slots__ = ("name", "labels", "_counts", "_sum", "_count", "_max", "_lock")
+
+    def __init__(self, name: str, labels: Labels = ()):
+        self.name = name
+        self.labels = labels
+        self._counts = [0] * _N_BUCKETS
+        self._sum = 0.0
+        self._count = 0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        us = int(seconds * 1e6)
+        idx = _bucket_index(us) if us > 0 else 0
+        if idx >= _N_BUCKETS:
+            idx = _N_BUCKETS - 1
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += seconds
+            self._count += 1
+            if seconds > self._max:
+                self._max = seconds
+
+    def time(self) -> "_Timer":
+        """with hist.time(): ... — chronomètre un bloc."""
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def quantiles(self, qs: Iterable[float] = QUANTILES) -> Dict[float, float]:
+        """Quantiles (secondes) : borne haute du seau qui contient le rang."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._count
+            peak = self._max
+        out: Dict[float, float] = {}
+        if total == 0:
+            return {q: 0.0 for q in qs}
+        for q in sorted(qs):
+            rank = max(1, int(q * total + 0.5))
+            seen = 0
+            for idx, c in enumerate(counts):
+                seen += c
+                if seen >= rank:
+                    out[q] = min(_bucket_upper(idx) / 1e6, peak)
+                    break
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * _N_BUCKETS
+            self._sum = 0.0
+            self._count = 0
+            self._max = 0.0
+
+
+class _Timer:
+    __slots__ = ("_hist", "_t0")
+
+    def __init__(self, hist: Histogram):
+        self._hist = hist
+
+    def __enter__(self) -> "_Timer":
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._hist.observe(time.perf_counter() - self._t0)
+
+
+class Counter:
+    """Compteur monotone ; `fn` optionnelle lue au scrape à la place."""
+
+    __slots__ = ("name", "labels", "_value", "_fn", "_lock")
+
+    def __init__(self, name: str, labels: Labels = (), fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.labels = labels
+        self._value = 0
+        self._fn = fn
+        self._lock = threading.Lock()
+
+    def inc(self, n: int = 1) -> None:
+        with self._lock:
+            self._value += n
+
+    @property
+    def value(self) -> float:
+        return self._fn() if self._fn is not None else self._value
+
+
+class Gauge:
+    """Valeur instantanée ; `fn` optionnelle lue au scrape à la place."""
+
+    __slots__ = ("name", "labels", "_value", "_fn")
+
+    def __init__(self, name: str, labels: Labels = (), fn: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.labels = labels
+        self._value = 0.0
+        self._fn = fn
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    @property
+    def value(self) -> float:
+        return self._fn() if self._fn is not None else self._value
+
+
+def _fmt_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+
+class Registry:
+    """Ensemble des métriques, indexées par (nom, labels)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # nom → (type, aide, {labels: métrique})
+        self._families: Dict[str, Tuple[str, str, Dict[Labels, object]]] = {}
+
+    def _get(self, kind: str, cls, name: str, help_text: str, labels: Optional[Dict[str, str]], **kw):
+        key: Labels = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (kind, help_text, {})
+            elif family[0] != kind:
+                raise ValueError(f"Métrique {name} déjà déclarée en {family[0]}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = cls(name, key, **kw)
+            elif kw.get("fn") is not None:
+                metric._fn = kw["fn"]  # ré-enregistrement (nouvelle instance)
+            return metric
+
+    def histogram(self, name: str, help_text: str = "", labels: Optional[Dict[str, str]] = None) -> Histogram:
+        return self._get("summary", Histogram, name, help_text, labels)
+
+    def counter(
+        self, name: str, help_text: str = "", labels: Optional[Dict[str, str]] = None,
+        fn: Optional[Callable[[], float]] = None,
+    ) -> Counter:
+        return self._get("counter", Counter, name, help_text, labels, fn=fn)
+
+    def gauge(
+        self, name: str, help_text: str = "", labels: Optional[Dict[str, str]] = None,
+        fn: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        return self._get("gauge", Gauge, name, help_text, labels, fn=fn)
+
+    def render(self) -> str:
+        """Exposition texte Prometheus (version 0.0.4)."""
+        with self._lock:
+            families = [(n, k, h, list(m.values())) for n, (k, h, m) in sorted(self._families.items())]
+        lines: List[str] = []
+        for name, kind, help_text, metrics in families:
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for m in metrics:
+                if kind == "summary":
+                    for q, v in m.quantiles().items():
+                        lines.append(f"{name}{_fmt_labels(m.labels, (('quantile', str(q)),))} {v:.6g}")
+                    lines.append(f"{name}_sum{_fmt_labels(m.labels)} {m._sum:.6g}")
+                    lines.append(f"{name}_count{_fmt_labels(m.labels)} {m._count}")
+                else:
+                    try:
+                        value = m.value
+                    except Exception:
+                        continue
+                    lines.append(f"{name}{_fmt_labels(m.labels)} {float(value):.6g}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
@@ -2,12 +2,30 @@
 """
 Pico Handler - Lecture ADC du Pico RP2040 pour le throttle.
 
-Lissage EMA (filtre exponentiel) + deadzone aux extrémités +
-deadband de sortie pour éviter de spammer kRPC avec du bruit.
+Filtrage (EMA ou One-Euro, voir throttle_filter), puis table de
+calibration précalculée (course réelle du pot, deadzones, courbe, voir
+adc_calibration) + deadband de sortie pour éviter de spammer kRPC avec du
+bruit.
+
+Deux modes d'acquisition (`sampling`) :
+- "tick" : un adc_read (aller-retour série) par appel de read_raw(), donc
+  à la cadence de gpio_loop ;
+- "block" : un thread lecteur, seul propriétaire de la connexion picod,
+  échantillonne tous les `channels` à `sample_hz` dans des blocs bornés ;
+  read_raw() consomme le bloc accumulé depuis l'appel précédent et le
+  réduit (médiane ou moyenne) avant le filtre.
+
+Limite : picod n'expose qu'un adc_read par canal et par requête série (ni
+lecture multi-canaux groupée, ni échantillonnage cadencé côté Pico). En
+mode "block", chaque cycle enchaîne donc un adc_read par canal ; un vrai
+transfert groupé demanderait un firmware Pico dédié.
 """
 
+import statistics
+import threading
 import time
-from typing import Optional
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional
 
 try:
     import picod
@@ -15,9 +33,24 @@ except ImportError:
     print("⚠ Module 'picod' non installé. Installez: pip install picod")
     picod = None
 
+from adc_calibration import ADC_MAX, ChannelCalibration, build_lut
+from loop_scheduler import DeadlineScheduler
+from metrics import REGISTRY
+from throttle_filter import EmaFilter
+
+_ADC_READ_TIME = REGISTRY.histogram("capsule_pico_adc_read_seconds", "Durée d'un adc_read picod")
+_ADC_ERRORS = REGISTRY.counter("capsule_pico_adc_errors_total", "Lectures ADC en échec")
+_BLOCK_SIZE = REGISTRY.gauge("capsule_pico_block_samples", "Échantillons du dernier bloc consommé")
+
+SAMPLING_MODES = ("tick", "block")
+REDUCERS = {
+    "median": statistics.median_low,
+    "mean": lambda block: round(sum(block) / len(block)),
+}
+
 
 class PicoHandler:
-    """Gère la lecture ADC du Pico avec lissage EMA."""
+    """Gère la lecture ADC du Pico et le filtrage du throttle."""
 
     def __init__(
         self,
@@ -26,7 +59,17 @@ class PicoHandler:
         alpha: float = 0.25,
         deadzone: float = 0.03,
         output_deadband: float = 0.01,
+        sampling: str = "tick",
+        sample_hz: float = 250.0,
+        channels: Optional[Iterable[int]] = None,
+        reduce: str = "median",
+        throttle_filter=None,
+        calibration: Optional[ChannelCalibration] = None,
     ):
+        if sampling not in SAMPLING_MODES:
+            raise ValueError(f"sampling inconnu: {sampling}")
+        if reduce not in REDUCERS:
+            raise ValueError(f"reduce inconnu: {reduce}")
         self.port = port
         self.adc_channel = adc_channel
         self.alpha = alpha
@@ -37,17 +80,52 @@ class PicoHandler:
         self.connected = False
         self.last_error: Optional[str] = None
 
-        # État EMA : None tant qu'aucune valeur n'a été lue
-        self._ema: Optional[float] = None
+        # Filtre de la consigne normalisée (update(x, t) / reset()) ;
+        # par défaut l'EMA historique à `alpha`.
+        self.filter = throttle_filter if throttle_filter is not None else EmaFilter(alpha)
         self._last_emitted: float = 0.0
 
+        # Table valeur ADC → throttle ; sans profil, course 0..4095 linéaire
+        # avec `deadzone` aux deux extrémités.
+        self.lut = ()
+        self.set_calibration(calibration)
+
+        # Acquisition par blocs (sampling == "block").
+        self.sampling = sampling
+        self.sample_hz = sample_hz
+        self.channels = tuple(sorted({adc_channel, *(channels or ())}))
+        self._reduce = REDUCERS[reduce]
+        # 200 ms d'échantillons (quatre ticks gpio_loop à 20 Hz) de marge
+        # avant de perdre les plus anciens.
+        self._block_max = max(8, int(sample_hz / 5))
+        self._blocks: Dict[int, Deque[int]] = {
+            ch: deque(maxlen=self._block_max) for ch in self.channels
+        }
+        self._block_values: Dict[int, int] = {}
+        self._block_lock = threading.Lock()
+        self._reader: Optional[threading.Thread] = None
+        self._reader_stop = threading.Event()
+        self._reader_ready = threading.Event()
+
         # Pas de self.connect() ici : picod stocke son état dans un
         # threading.local() — la connexion doit être faite depuis le thread
-        # qui fera ensuite les adc_read(). L'appelant (gpio_loop) s'en charge.
+        # qui fera ensuite les adc_read(). En mode "tick" l'appelant
+        # (gpio_loop) s'en charge ; en mode "block" c'est le thread lecteur.
+
+    def set_calibration(self, calibration: Optional[ChannelCalibration]) -> None:
+        if calibration is None:
+            calibration = ChannelCalibration(deadzone_low=self.deadzone, deadzone_high=self.deadzone)
+        self.calibration = calibration
+        self.lut = build_lut(calibration)
 
     # ---- Connexion ---------------------------------------------------
 
     def connect(self) -> bool:
+        if self.sampling == "block":
+            return self._start_reader()
+        return self._connect_picod()
+
+    def _connect_picod(self) -> bool:
         if picod is None:
             self.last_error = "picod module not installed"
             return False
@@ -66,6 +144,15 @@ class PicoHandler:
             return False
 
     def disconnect(self) -> None:
+        if self._reader is not None:
+            # Le thread lecteur ferme lui-même sa connexion picod.
+            self._reader_stop.set()
+            self._reader.join(timeout=2.0)
+            self._reader = None
+            return
+        self._close_picod()
+
+    def _close_picod(self) -> None:
         try:
             if self.pico:
                 self.pico.close()
@@ -73,47 +160,100 @@ class PicoHandler:
             pass
         self.connected = False
 
+    # ---- Acquisition par blocs -------------------------------------
+
+    def _start_reader(self) -> bool:
+        if self._reader is None:
+            self._reader_stop.clear()
+            self._reader_ready.clear()
+            self._reader = threading.Thread(target=self._reader_run, name="pico-adc", daemon=True)
+            self._reader.start()
+        self._reader_ready.wait(timeout=3.0)
+        return self.connected
+
+    def _reader_run(self) -> None:
+        """Thread lecteur : connexion picod, puis échantillonnage cadencé."""
+        try:
+            ok = self._connect_picod()
+        finally:
+            self._reader_ready.set()
+        if not ok:
+            self._reader = None
+            return
+        print(f"[PICO] Acquisition par blocs : canaux {list(self.channels)} à {self.sample_hz:g}Hz")
+        try:
+            DeadlineScheduler("pico-adc", self.sample_hz).run(self._sample_once, self._reader_stop)
+        finally:
+            self._close_picod()
+
+    def _sample_once(self) -> None:
+        # Un aller-retour série par canal : picod n'a pas de lecture groupée.
+        for ch in self.channels:
+            val = self._adc_read(ch)
+            if val is not None:
+                with self._block_lock:
+                    self._blocks[ch].append(val)
+
+    def _take_block(self, ch: int) -> Optional[int]:
+        """Réduit les échantillons reçus depuis le dernier appel ; sans
+        nouvel échantillon, renvoie la dernière valeur réduite."""
+        with self._block_lock:
+            block = self._blocks.get(ch)
+            if block is None:
+                return None
+            samples = list(block)
+            block.clear()
+        if not samples:
+            return self._block_values.get(ch)
+        if ch == self.adc_channel:
+            _BLOCK_SIZE.set(len(samples))
+        value = self._reduce(samples)
+        self._block_values[ch] = value
+        return value
+
     # ---- Lecture ----------------------------------------------------
 
-    def read_raw(self, channel: Optional[int] = None) -> Optional[int]:
-        """Lit la valeur brute ADC (0-4095) ou None en cas d'erreur."""
-        if not self.connected or not self.pico:
-            return None
-        ch = self.adc_channel if channel is None else channel
+    def _adc_read(self, ch: int) -> Optional[int]:
+        t0 = time.perf_counter()
         try:
             _status, _ch, val = self.pico.adc_read(ch)
-            return val
         except Exception:
+            _ADC_ERRORS.inc()
             return None
+        _ADC_READ_TIME.observe(time.perf_counter() - t0)
+        return val
+
+    def read_raw(self, channel: Optional[int] = None) -> Optional[int]:
+        """Lit la valeur brute ADC (0-4095) ou None en cas d'erreur.
+
+        En mode "block", valeur réduite du bloc accumulé pour ce canal.
+        """
+        if not self.connected or not self.pico:
+            return None
+        ch = self.adc_channel if channel is None else channel
+        if self.sampling == "block":
+            return self._take_block(ch)
+        return self._adc_read(ch)
 
     def read_throttle_raw(self) -> Optional[float]:
-        """Valeur normalisée 0..1 lissée (EMA), sans deadzone ni deadband."""
+        """Valeur ADC normalisée 0..1 filtrée, avant calibration et deadband."""
         raw = self.read_raw(self.adc_channel)
         if raw is None:
             return None
 
-        norm = max(0.0, min(1.0, raw / 4095.0))
-        if self._ema is None:
-            self._ema = norm
-        else:
-            self._ema = self.alpha * norm + (1.0 - self.alpha) * self._ema
-        return self._ema
+        norm = max(0.0, min(1.0, raw / ADC_MAX))
+        return self.filter.update(norm, time.monotonic())
 
     def get_throttle(self) -> float:
-        """Throttle lissé avec deadzone aux bords (0 et 1).
+        """Throttle lissé puis calibré (table précalculée).
 
         Retourne toujours une valeur : si l'ADC est indisponible, renvoie
         la dernière valeur émise pour éviter les sauts.
         """
-        ema = self.read_throttle_raw()
-        if ema is None:
+        value = self.read_throttle_raw()
+        if value is None:
             return self._last_emitted
-
-        if ema < self.deadzone:
-            return 0.0
-        if ema > 1.0 - self.deadzone:
-            return 1.0
-        return ema
+        return self.lut[int(value * ADC_MAX + 0.5)]
 
     def get_throttle_if_changed(self) -> Optional[float]:
         """Renvoie la nouvelle valeur throttle uniquement si elle a bougé
@@ -140,8 +280,8 @@ class PicoHandler:
         return value
 
     def reset_emit(self) -> None:
-        """Reset l'EMA et le tracking d'émission : le prochain appel à
+        """Reset le filtre et le tracking d'émission : le prochain appel à
         `get_throttle_if_changed()` traitera la valeur courante comme neuve.
         """
-        self._ema = None
+        self.filter.reset()
         self._last_emitted = 0.0
@@ -0,0 +1,9 @@
+"""Simulation locale de KSP/kRPC pour tester le bridge sans le jeu.
+
+    python3 -m sim --latency-ms 15 --jitter-ms 5 --autolaunch
+"""
+
+from sim.krpc_server import KRPCStandIn, NetworkProfile
+from sim.vessel import SimVessel
+
+__all__ = ["KRPCStandIn", "NetworkProfile", "SimVessel"]
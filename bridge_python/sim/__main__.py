@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Lance le serveur kRPC simulé (depuis bridge_python/ : python3 -m sim).
+
+Pointer ensuite config.json → krpc.host sur 127.0.0.1 (mêmes ports) et
+lancer main.py normalement.
+"""
+
+import argparse
+import threading
+import time
+
+from sim.krpc_server import KRPCStandIn, NetworkProfile
+from sim.vessel import STAGING_GROUPS, SimVessel
+
+
+def autopilot(vessel: SimVessel, stop_event: threading.Event, delay_s: float) -> None:
+    """Décollage automatique puis staging dès qu'un étage est vide."""
+    if stop_event.wait(delay_s):
+        return
+    with vessel.lock:
+        vessel.throttle = 1.0
+    vessel.toggle_action_group(1)
+    print("[SIM] Décollage")
+    groups = iter(STAGING_GROUPS)
+    if vessel.stages and "SolidFuel" not in vessel.stages[0]["burn"]:
+        next(groups, None)
+    while not stop_event.wait(0.5):
+        props = vessel.stage_resources(vessel.current_stage)
+        if props and all(amount <= 0.0 for amount, _max in props.values()):
+            group = next(groups, None)
+            if group is None:
+                return
+            print(f"[SIM] Étage {vessel.current_stage} vide → AG {group}")
+            vessel.toggle_action_group(group)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serveur kRPC simulé (sans KSP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--rpc-port", type=int, default=50008)
+    parser.add_argument("--stream-port", type=int, default=50001)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latence aller simple")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Gigue ± sur la latence")
+    parser.add_argument("--seed", type=int, help="Graine de la gigue (reproductible)")
+    parser.add_argument("--stream-hz", type=float, default=50.0)
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Accélération du temps simulé")
+    parser.add_argument("--autolaunch", type=float, nargs="?", const=3.0, metavar="DELAI_S",
+                        help="Décollage automatique après DELAI_S secondes (défaut 3)")
+    args = parser.parse_args()
+
+    server = KRPCStandIn(
+        host=args.host,
+        rpc_port=args.rpc_port,
+        stream_port=args.stream_port,
+        network=NetworkProfile(args.latency_ms, args.jitter_ms, args.seed),
+        stream_hz=args.stream_hz,
+        time_scale=args.time_scale,
+    ).start()
+    stop_event = threading.Event()
+    if args.autolaunch is not None:
+        threading.Thread(
+            target=autopilot, args=(server.vessel, stop_event, args.autolaunch), daemon=True
+        ).start()
+    try:
+        while True:
+            time.sleep(5.0)
+            v = server.vessel
+            print(
+                f"[SIM] T+{v.met:6.1f}s alt={v.altitude:9.0f}m v={v.speed:7.1f}m/s "
+                f"stage={v.current_stage} rpc={server.rpc_count} maj_streams={server.stream_updates}"
+            )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+"""
+Serveur kRPC de substitution (protocole protobuf kRPC, RPC + streams).
+
+Implémente juste ce que le bridge appelle : getters Flight/Orbit,
+setters Control, action groups, ressources par étage de découplage, mode
+caméra, plus les procédures KRPC de gestion des streams. Les messages et
+l'encodage des valeurs réutilisent le schéma et les encodeurs du client
+`krpc` (KRPC_pb2, Encoder, Decoder) : le bridge se connecte avec
+krpc.connect() sans rien savoir de la substitution.
+
+Réseau simulé : chaque réponse RPC est retardée d'un aller-retour
+(2 × latence ± gigue), chaque mise à jour de stream d'un aller simple.
+Les mises à jour de stream ne contiennent, comme kRPC, que les valeurs
+qui ont changé depuis le dernier envoi.
+"""
+
+import heapq
+import os
+import random
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import krpc.schema.KRPC_pb2 as KRPC
+from krpc.decoder import Decoder
+from krpc.encoder import Encoder
+from krpc.types import Types
+
+from sim.vessel import KERBIN_RADIUS, SimVessel
+
+_T = Types()
+DOUBLE, FLOAT = _T.double_type, _T.float_type
+SINT32, UINT32, UINT64 = _T.sint32_type, _T.uint32_type, _T.uint64_type
+BOOL, STRING = _T.bool_type, _T.string_type
+
+# Types de handles exposés (un id par type et par génération de vaisseau).
+HANDLE_KINDS = ("Vessel", "Control", "Flight", "Orbit", "CelestialBody",
+                "ReferenceFrame", "Resources", "Camera")
+# Resources par étage : handle = base + génération * 1000 + étage.
+_STAGE_RES_BASE = 1_000_000
+
+
+class RPCError(Exception):
+    """Erreur renvoyée au client dans ProcedureResult.error."""
+
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk:
+            raise ConnectionError("connexion fermée")
+        data += chunk
+    return data
+
+
+def _recv_message(sock: socket.socket, typ):
+    """Message protobuf préfixé par sa taille (varint), comme kRPC."""
+    size = shift = 0
+    while True:
+        byte = _recv_exact(sock, 1)[0]
+        size |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    msg = typ()
+    msg.ParseFromString(_recv_exact(sock, size))
+    return msg
+
+
+def _send_message(sock: socket.socket, msg) -> None:
+    sock.sendall(Encoder.encode_message_with_size(msg))
+
+
+class NetworkProfile:
+    """Latence aller simple et gigue (ms) du réseau simulé."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._rng = random.Random(seed)
+
+    def one_way(self) -> float:
+        jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.latency_ms + jitter) / 1000.0
+
+
+class _StreamClient:
+    """Streams d'un client : appels, état démarré, dernière valeur envoyée."""
+
+    def __init__(self, identifier: bytes):
+        self.identifier = identifier
+        self.lock = threading.Lock()
+        # id → [ProcedureCall, démarré, dernière valeur encodée]
+        self.streams: Dict[int, list] = {}
+        self.by_call: Dict[bytes, int] = {}
+        self.sock: Optional[socket.socket] = None
+        # File d'envoi retardé : (échéance, ordre, message).
+        self.outbox: List[Tuple[float, int, bytes]] = []
+        self.out_cond = threading.Condition()
+        self.closed = False
+
+
+class KRPCStandIn:
+    """Serveur kRPC local (RPC + stream) adossé à un SimVessel."""
+
+    def __init__(
+        self,
+        vessel: Optional[SimVessel] = None,
+        host: str = "127.0.0.1",
+        rpc_port: int = 50008,
+        stream_port: int = 50001,
+        network: Optional[NetworkProfile] = None,
+        physics_hz: float = 50.0,
+        stream_hz: float = 50.0,
+        time_scale: float = 1.0,
+    ):
+        self.vessel = vessel or SimVessel()
+        self.host = host
+        self.rpc_port = rpc_port
+        self.stream_port = stream_port
+        self.network = network or NetworkProfile()
+        self.physics_hz = physics_hz
+        self.stream_hz = stream_hz
+        self.time_scale = time_scale
+
+        self._clients: Dict[bytes, _StreamClient] = {}
+        self._clients_lock = threading.Lock()
+        self._next_stream_id = 1
+        self._order = 0
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._listeners: List[socket.socket] = []
+        self._conns: set = set()
+
+        self.rpc_count = 0
+        self.stream_updates = 0
+        self._procedures = self._build_procedures()
+
+    # ---- Cycle de vie ------------------------------------------------
+
+    def start(self) -> "KRPCStandIn":
+        rpc_sock = self._listen(self.rpc_port)
+        stream_sock = self._listen(self.stream_port)
+        # Port 0 → port choisi par l'OS (tests).
+        self.rpc_port = rpc_sock.getsockname()[1]
+        self.stream_port = stream_sock.getsockname()[1]
+        for target, args in (
+            (self._accept_loop, (rpc_sock, self._serve_rpc)),
+            (self._accept_loop, (stream_sock, self._serve_stream)),
+            (self._physics_loop, ()),
+            (self._stream_loop, ()),
+        ):
+            t = threading.Thread(target=target, args=args, daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"[SIM] kRPC simulé sur {self.host}:{self.rpc_port}/{self.stream_port}")
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        for sock in self._listeners:
+            sock.close()
+        self.drop_connections()
+        with self._clients_lock:
+            for client in self._clients.values():
+                self._close_client(client)
+        for t in self._threads:
+            t.join(timeout=1.0)
+
+    def drop_connections(self) -> None:
+        """Coupe toutes les connexions clientes (test de reconnexion)."""
+        for sock in list(self._conns):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _listen(self, port: int) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, port))
+        sock.listen(8)
+        sock.settimeout(0.2)
+        self._listeners.append(sock)
+        return sock
+
+    def _accept_loop(self, sock: socket.socket, serve: Callable) -> None:
+        while not self._stop.is_set():
+            try:
+                conn, _addr = sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            conn.settimeout(None)
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._conns.add(conn)
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    # ---- Connexion RPC -----------------------------------------------
+
+    def _serve_rpc(self, conn: socket.socket) -> None:
+        identifier = None
+        try:
+            request = _recv_message(conn, KRPC.ConnectionRequest)
+            response = KRPC.ConnectionResponse()
+            if request.type != KRPC.ConnectionRequest.RPC:
+                response.status = KRPC.ConnectionResponse.WRONG_TYPE
+                response.message = "port RPC"
+                _send_message(conn, response)
+                return
+            identifier = os.urandom(16)
+            with self._clients_lock:
+                self._clients[identifier] = _StreamClient(identifier)
+            response.status = KRPC.ConnectionResponse.OK
+            response.client_identifier = identifier
+            _send_message(conn, response)
+
+            while not self._stop.is_set():
+                req = _recv_message(conn, KRPC.Request)
+                received = time.monotonic()
+                reply = KRPC.Response()
+                for call in req.calls:
+                    reply.results.append(self._call(identifier, call))
+                # Aller-retour simulé, temps de traitement déduit.
+                delay = self.network.one_way() * 2 - (time.monotonic() - received)
+                if delay > 0:
+                    time.sleep(delay)
+                _send_message(conn, reply)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._conns.discard(conn)
+            conn.close()
+            if identifier is not None:
+                with self._clients_lock:
+                    client = self._clients.pop(identifier, None)
+                if client is not None:
+                    self._close_client(client)
+
+    def _call(self, identifier: bytes, call) -> "KRPC.ProcedureResult":
+        self.rpc_count += 1
+        return self._evaluate(identifier, call)
+
+    def _evaluate(self, identifier: bytes, call) -> "KRPC.ProcedureResult":
+        result = KRPC.ProcedureResult()
+        try:
+            value = self._invoke(identifier, call)
+            if value is not None:
+                result.value = value
+        except RPCError as e:
+            result.error.description = str(e)
+        except Exception as e:
+            result.error.description = f"{call.service}.{call.procedure}: {e}"
+        return result
+
+    def _invoke(self, identifier: bytes, call) -> Optional[bytes]:
+        entry = self._procedures.get((call.service, call.procedure))
+        if entry is None:
+            raise RPCError(f"Procédure inconnue {call.service}.{call.procedure}")
+        fn, arg_types, return_type = entry
+        args: List[object] = [None] * len(arg_types)
+        for arg in call.arguments:
+            if arg.position < len(arg_types):
+                typ = arg_types[arg.position]
+                args[arg.position] = arg.value if typ is None else Decoder.decode(None, arg.value, typ)
+        value = fn(identifier, *args)
+        if return_type is None:
+            return None
+        if isinstance(return_type, str):
+            return value  # déjà encodé (messages KRPC)
+        return Encoder.encode(value, return_type)
+
+    # ---- Handles -----------------------------------------------------
+
+    def _handle(self, kind: str) -> int:
+        return self.vessel.generation * 100 + HANDLE_KINDS.index(kind) + 1
+
+    def _check(self, handle: int, kind: str) -> None:
+        if handle != self._handle(kind):
+            raise RPCError(f"No such object ({kind} {handle})")
+
+    def _stage_handle(self, stage: int) -> int:
+        return _STAGE_RES_BASE + self.vessel.generation * 1000 + stage
+
+    def _stage_of(self, handle: int) -> int:
+        base = _STAGE_RES_BASE + self.vessel.generation * 1000
+        if not base <= handle < base + 1000:
+            raise RPCError(f"No such object (Resources {handle})")
+        return handle - base
+
+    def _resources(self, handle: int) -> Dict[str, List[float]]:
+        if handle == self._handle("Resources"):
+            with self.vessel.lock:
+                totals: Dict[str, List[float]] = {}
+                for s in self.vessel.stages:
+                    for name, (amount, maximum) in s["propellants"].items():
+                        t = totals.setdefault(name, [0.0, 0.0])
+                        t[0] += amount
+                        t[1] += maximum
+                return totals
+        return self.vessel.stage_resources(self._stage_of(handle))
+
+    # ---- Table des procédures ---------------------------------------
+
+    def _build_procedures(self) -> Dict[Tuple[str, str], Tuple[Callable, list, object]]:
+        v = self.vessel
+        procs: Dict[Tuple[str, str], Tuple[Callable, list, object]] = {}
+
+        def sc(name, arg_types, return_type):
+            def deco(fn):
+                procs[("SpaceCenter", name)] = (fn, arg_types, return_type)
+                return fn
+            return deco
+
+        def getter(kind, name, typ, read):
+            procs[("SpaceCenter", f"{kind}_get_{name}")] = (
+                lambda _c, h: (self._check(h, kind), read())[1], [UINT64], typ,
+            )
+
+        def setter(kind, name, typ, write):
+            def fn(_c, h, value):
+                self._check(h, kind)
+                with v.lock:
+                    write(value)
+            procs[("SpaceCenter", f"{kind}_set_{name}")] = (fn, [UINT64, typ], None)
+
+        # SpaceCenter
+        procs[("SpaceCenter", "get_ActiveVessel")] = (lambda _c: self._handle("Vessel"), [], UINT64)
+        procs[("SpaceCenter", "get_Camera")] = (lambda _c: self._handle("Camera"), [], UINT64)
+        procs[("SpaceCenter", "get_UT")] = (lambda _c: v.met, [], DOUBLE)
+
+        # Vessel
+        getter("Vessel", "Name", STRING, lambda: v.name)
+        getter("Vessel", "MET", DOUBLE, lambda: v.met)
+        for kind in ("Control", "Orbit", "Resources"):
+            getter("Vessel", kind, UINT64, lambda k=kind: self._handle(k))
+
+        @sc("Vessel_Flight", [UINT64, UINT64], UINT64)
+        def _flight(_c, h, _frame):
+            self._check(h, "Vessel")
+            return self._handle("Flight")
+
+        @sc("Vessel_ResourcesInDecoupleStage", [UINT64, SINT32, BOOL], UINT64)
+        def _res_stage(_c, h, stage, _cumulative):
+            self._check(h, "Vessel")
+            return self._stage_handle(stage or 0)
+
+        # Orbit / CelestialBody
+        getter("Orbit", "Body", UINT64, lambda: self._handle("CelestialBody"))
+        getter("CelestialBody", "ReferenceFrame", UINT64, lambda: self._handle("ReferenceFrame"))
+        getter("CelestialBody", "Name", STRING, lambda: "Kerbin")
+        getter("CelestialBody", "EquatorialRadius", FLOAT, lambda: KERBIN_RADIUS)
+        getter("Orbit", "Apoapsis", DOUBLE, lambda: v.orbit()["apoapsis"])
+        getter("Orbit", "Periapsis", DOUBLE, lambda: v.orbit()["periapsis"])
+        getter("Orbit", "ApoapsisAltitude", DOUBLE, lambda: v.orbit()["apoapsis"] - KERBIN_RADIUS)
+        getter("Orbit", "PeriapsisAltitude", DOUBLE, lambda: v.orbit()["periapsis"] - KERBIN_RADIUS)
+        getter("Orbit", "TimeToApoapsis", DOUBLE, lambda: v.orbit()["time_to_apoapsis"])
+        getter("Orbit", "TimeToPeriapsis", DOUBLE, lambda: v.orbit()["time_to_periapsis"])
+
+        # Flight
+        getter("Flight", "SurfaceAltitude", DOUBLE, lambda: v.altitude)
+        getter("Flight", "MeanAltitude", DOUBLE, lambda: v.altitude)
+        getter("Flight", "Speed", DOUBLE, lambda: v.speed)
+        getter("Flight", "VerticalSpeed", DOUBLE, lambda: v.v_radial)
+        getter("Flight", "HorizontalSpeed", DOUBLE, lambda: v.v_tangential)
+        getter("Flight", "GForce", FLOAT, lambda: v.g_force)
+        getter("Flight", "StaticAirTemperature", FLOAT, lambda: v.static_air_temperature)
+
+        # Control
+        getter("Control", "CurrentStage", SINT32, lambda: v.current_stage)
+        for name, attr, typ in (
+            ("Throttle", "throttle", FLOAT),
+            ("SAS", "sas", BOOL),
+            ("RCS", "rcs", BOOL),
+            ("Gear", "gear", BOOL),
+            ("Brakes", "brakes", BOOL),
+            ("Lights", "lights", BOOL),
+            ("Abort", "abort", BOOL),
+        ):
+            getter("Control", name, typ, lambda a=attr: getattr(v, a))
+            setter("Control", name, typ, lambda value, a=attr: setattr(v, a, value))
+
+        @sc("Control_ToggleActionGroup", [UINT64, UINT32], None)
+        def _toggle_ag(_c, h, group):
+            self._check(h, "Control")
+            v.toggle_action_group(group)
+
+        @sc("Control_GetActionGroup", [UINT64, UINT32], BOOL)
+        def _get_ag(_c, h, group):
+            self._check(h, "Control")
+            return v.action_groups[group % 10]
+
+        @sc("Control_SetActionGroup", [UINT64, UINT32, BOOL], None)
+        def _set_ag(_c, h, group, state):
+            self._check(h, "Control")
+            with v.lock:
+                if v.action_groups[group % 10] != state:
+                    v.toggle_action_group(group)
+
+        @sc("Control_ActivateNextStage", [UINT64], None)
+        def _next_stage(_c, h):
+            self._check(h, "Control")
+            v.activate_next_stage()
+            return None
+
+        # Resources
+        @sc("Resources_Amount", [UINT64, STRING], FLOAT)
+        def _amount(_c, h, name):
+            return self._resources(h).get(name, [0.0, 0.0])[0]
+
+        @sc("Resources_Max", [UINT64, STRING], FLOAT)
+        def _max(_c, h, name):
+            return self._resources(h).get(name, [0.0, 0.0])[1]
+
+        # Camera (CameraMode : enum sint32)
+        getter("Camera", "Mode", SINT32, lambda: v.camera_mode)
+        setter("Camera", "Mode", SINT32, lambda value: setattr(v, "camera_mode", value))
+
+        # KRPC : services et streams
+        def _services(_c):
+            msg = KRPC.Services()
+            for name in ("KRPC", "SpaceCenter"):
+                msg.services.add(name=name)
+            return msg.SerializeToString()
+
+        procs[("KRPC", "GetServices")] = (_services, [], "message")
+        procs[("KRPC", "AddStream")] = (self._add_stream, [None, BOOL], "message")
+        procs[("KRPC", "StartStream")] = (self._start_stream, [UINT64], None)
+        procs[("KRPC", "RemoveStream")] = (self._remove_stream, [UINT64], None)
+        procs[("KRPC", "SetStreamRate")] = (lambda _c, _id, _rate: None, [UINT64, FLOAT], None)
+        return procs
+
+    # ---- Streams -----------------------------------------------------
+
+    def _client(self, identifier: bytes) -> _StreamClient:
+        with self._clients_lock:
+            return self._clients[identifier]
+
+    def _add_stream(self, identifier: bytes, raw_call: bytes, start) -> bytes:
+        call = KRPC.ProcedureCall()
+        call.ParseFromString(raw_call)
+        # Valide l'appel tout de suite (erreur synchrone comme kRPC).
+        self._invoke(identifier, call)
+        client = self._client(identifier)
+        key = call.SerializeToString()
+        with client.lock:
+            stream_id = client.by_call.get(key)
+            if stream_id is None:
+                stream_id = self._next_stream_id
+                self._next_stream_id += 1
+                client.by_call[key] = stream_id
+                client.streams[stream_id] = [call, False, None]
+            if start:
+                client.streams[stream_id][1] = True
+        return KRPC.Stream(id=stream_id).SerializeToString()
+
+    def _start_stream(self, identifier: bytes, stream_id: int) -> None:
+        client = self._client(identifier)
+        with client.lock:
+            if stream_id not in client.streams:
+                raise RPCError(f"Stream {stream_id} inexistant")
+            client.streams[stream_id][1] = True
+
+    def _remove_stream(self, identifier: bytes, stream_id: int) -> None:
+        client = self._client(identifier)
+        with client.lock:
+            entry = client.streams.pop(stream_id, None)
+            if entry is not None:
+                client.by_call.pop(entry[0].SerializeToString(), None)
+
+    def _serve_stream(self, conn: socket.socket) -> None:
+        try:
+            request = _recv_message(conn, KRPC.ConnectionRequest)
+            response = KRPC.ConnectionResponse()
+            with self._clients_lock:
+                client = self._clients.get(request.client_identifier)
+            if request.type != KRPC.ConnectionRequest.STREAM or client is None:
+                response.status = KRPC.ConnectionResponse.MALFORMED_MESSAGE
+                response.message = "client inconnu"
+                _send_message(conn, response)
+                conn.close()
+                return
+            response.status = KRPC.ConnectionResponse.OK
+            _send_message(conn, response)
+            client.sock = conn
+            self._stream_sender(client)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._conns.discard(conn)
+            conn.close()
+
+    def _stream_sender(self, client: _StreamClient) -> None:
+        """Envoie les mises à jour à leur échéance (latence aller simulée)."""
+        while not self._stop.is_set():
+            with client.out_cond:
+                while not client.closed and (
+                    not client.outbox or client.outbox[0][0] > time.monotonic()
+                ):
+                    timeout = client.outbox[0][0] - time.monotonic() if client.outbox else None
+                    client.out_cond.wait(timeout)
+                if client.closed:
+                    return
+                _due, _order, payload = heapq.heappop(client.outbox)
+            client.sock.sendall(payload)
+
+    def _stream_loop(self) -> None:
+        interval = 1.0 / self.stream_hz
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            with self._clients_lock:
+                clients = [c for c in self._clients.values() if c.sock is not None and not c.closed]
+            for client in clients:
+                update = KRPC.StreamUpdate()
+                with client.lock:
+                    for stream_id, entry in client.streams.items():
+                        call, started, last = entry
+                        if not started:
+                            continue
+                        result = self._evaluate(client.identifier, call)
+                        encoded = result.SerializeToString()
+                        if encoded == last:
+                            continue
+                        entry[2] = encoded
+                        update.results.add(id=stream_id).result.CopyFrom(result)
+                if update.results:
+                    self.stream_updates += 1
+                    payload = Encoder.encode_message_with_size(update)
+                    now = time.monotonic()
+                    with client.out_cond:
+                        # Ordre FIFO conservé (TCP) malgré la gigue.
+                        last_due = max((d for d, _o, _p in client.outbox), default=0.0)
+                        due = max(now + self.network.one_way(), last_due)
+                        self._order += 1
+                        heapq.heappush(client.outbox, (due, self._order, payload))
+                        client.out_cond.notify()
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_tick = time.monotonic()
+
+    def _close_client(self, client: _StreamClient) -> None:
+        with client.out_cond:
+            client.closed = True
+            client.out_cond.notify_all()
+
+    # ---- Physique ----------------------------------------------------
+
+    def _physics_loop(self) -> None:
+        dt = 1.0 / self.physics_hz
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            self.vessel.step(dt * self.time_scale)
+            next_tick += dt
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                next_tick = time.monotonic()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Vaisseau simulé pour le serveur kRPC de substitution.
+
+Modèle volontairement simple mais plausible : ascension à gravity turn
+au-dessus de Kerbin (pesanteur en 1/r², atmosphère exponentielle, traînée
+quadratique), étages avec ergols qui se vident sous la poussée, staging
+par action groups comme sur le panneau de La Capsule. Les grandeurs
+orbitales (apoapsis, périapsis, temps jusqu'à Ap/Pe) sont calculées à
+partir de l'état képlérien.
+
+Tout l'état est protégé par `lock` : le serveur lit les propriétés depuis
+ses threads de connexion pendant que `step()` avance la simulation.
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional
+
+KERBIN_RADIUS = 600000.0
+KERBIN_MU = 3.5316e12
+G0 = 9.81
+# Masse volumique des ergols KSP (t/unité).
+DENSITY = {"LiquidFuel": 0.005, "Oxidizer": 0.005, "SolidFuel": 0.0075, "MonoPropellant": 0.004}
+
+# Fusée par défaut : 4 étages découplés à 3, 2, 1, 0 (boosters → capsule).
+DEFAULT_STAGES = [
+    {"stage": 3, "dry_t": 3.0, "thrust_kn": 400.0, "burn": {"SolidFuel": 20.0},
+     "propellants": {"SolidFuel": 800.0}},
+    {"stage": 2, "dry_t": 2.0, "thrust_kn": 215.0, "burn": {"LiquidFuel": 6.0, "Oxidizer": 7.3},
+     "propellants": {"LiquidFuel": 720.0, "Oxidizer": 880.0}},
+    {"stage": 1, "dry_t": 1.0, "thrust_kn": 60.0, "burn": {"LiquidFuel": 1.6, "Oxidizer": 2.0},
+     "propellants": {"LiquidFuel": 360.0, "Oxidizer": 440.0}},
+    {"stage": 0, "dry_t": 0.8, "thrust_kn": 0.0, "burn": {},
+     "propellants": {"MonoPropellant": 30.0}},
+]
+
+# Action groups du panneau (config.json → boutons) : 1 allume les moteurs,
+# 2..5 larguent un étage.
+IGNITION_GROUP = 1
+STAGING_GROUPS = (2, 3, 4, 5)
+
+
+class SimVessel:
+    """État et dynamique d'un vaisseau simulé."""
+
+    def __init__(self, name: str = "Capsule Sim", stages: Optional[List[Dict]] = None):
+        self.name = name
+        self._template = stages or DEFAULT_STAGES
+        self.lock = threading.RLock()
+        # Incrémenté à chaque retour au lancement (nouveaux handles kRPC).
+        self.generation = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Retour au lancement : vaisseau neuf sur le pas de tir."""
+        with self.lock:
+            self.generation += 1
+            self.met = 0.0
+            self.altitude = 0.0
+            self.v_radial = 0.0
+            self.v_tangential = 0.0
+            self.g_force = 1.0
+            self.throttle = 0.0
+            self.engines_on = False
+            self.sas = False
+            self.rcs = False
+            self.gear = True
+            self.brakes = True
+            self.lights = False
+            self.abort = False
+            self.action_groups = [False] * 10
+            self.camera_mode = 0  # CameraMode.automatic
+            self.stages = [
+                {**s, "propellants": {k: [v, v] for k, v in s["propellants"].items()}}
+                for s in self._template
+            ]
+            # Étage courant = le plus bas encore attaché (moteurs actifs).
+            self.current_stage = max(s["stage"] for s in self.stages)
+
+    # ---- Commandes ---------------------------------------------------
+
+    def toggle_action_group(self, group: int) -> None:
+        with self.lock:
+            self.action_groups[group % 10] = not self.action_groups[group % 10]
+            if group == IGNITION_GROUP:
+                self.engines_on = True
+            elif group in STAGING_GROUPS:
+                self.activate_next_stage()
+
+    def activate_next_stage(self) -> None:
+        """Largue l'étage en cours (ses réservoirs et moteurs disparaissent)."""
+        with self.lock:
+            if self.current_stage <= 0:
+                return
+            self.current_stage -= 1
+            self.stages = [s for s in self.stages if s["stage"] <= self.current_stage]
+
+    # ---- Ressources --------------------------------------------------
+
+    def stage_resources(self, stage: int) -> Dict[str, List[float]]:
+        """{ergol: [quantité, max]} des pièces découplées à `stage`."""
+        with self.lock:
+            for s in self.stages:
+                if s["stage"] == stage:
+                    return s["propellants"]
+            return {}
+
+    def _mass_t(self) -> float:
+        total = 0.0
+        for s in self.stages:
+            total += s["dry_t"]
+            for name, (amount, _max) in s["propellants"].items():
+                total += amount * DENSITY.get(name, 0.005)
+        return total
+
+    # ---- Dynamique ---------------------------------------------------
+
+    @property
+    def speed(self) -> float:
+        return math.hypot(self.v_radial, self.v_tangential)
+
+    def step(self, dt: float) -> None:
+        with self.lock:
+            self.met += dt
+            r = KERBIN_RADIUS + self.altitude
+            thrust_n = 0.0
+            if self.engines_on and self.stages:
+                # Moteurs de l'étage le plus bas encore attaché.
+                low = max(self.stages, key=lambda s: s["stage"])
+                solid = "SolidFuel" in low["burn"]
+                level = 1.0 if solid else self.throttle
+                props = low["propellants"]
+                if level > 0 and all(props.get(k, [0.0])[0] > 0 for k in low["burn"]):
+                    thrust_n = low["thrust_kn"] * 1000.0 * level
+                    for name, rate in low["burn"].items():
+                        props[name][0] = max(0.0, props[name][0] - rate * level * dt)
+
+            mass_kg = self._mass_t() * 1000.0
+            # Gravity turn : vertical jusqu'à 1 km, horizontal vers 45 km.
+            pitch = math.radians(90.0 - 90.0 * min(1.0, max(0.0, (self.altitude - 1000.0) / 44000.0)))
+            rho = 1.2 * math.exp(-self.altitude / 5600.0)
+            speed = self.speed
+            drag_n = 0.5 * rho * speed * speed * 2.0
+            a_thrust = thrust_n / mass_kg
+            a_drag = drag_n / mass_kg
+            g = KERBIN_MU / (r * r)
+
+            a_r = a_thrust * math.sin(pitch) - g + self.v_tangential ** 2 / r
+            a_t = a_thrust * math.cos(pitch)
+            if speed > 0:
+                a_r -= a_drag * self.v_radial / speed
+                a_t -= a_drag * self.v_tangential / speed
+
+            self.v_radial += a_r * dt
+            self.v_tangential += a_t * dt
+            self.altitude += self.v_radial * dt
+            if self.altitude <= 0.0:
+                # Au sol (pas de tir ou atterrissage).
+                self.altitude = 0.0
+                self.v_radial = max(0.0, self.v_radial)
+                if thrust_n == 0.0:
+                    self.v_tangential = 0.0
+            on_ground = self.altitude <= 0.0 and thrust_n * math.sin(pitch) <= mass_kg * g
+            self.g_force = (1.0 if on_ground else abs(a_thrust - a_drag) / G0)
+
+    # ---- Grandeurs dérivées -----------------------------------------
+
+    @property
+    def static_air_temperature(self) -> float:
+        return max(288.15 - 0.0065 * self.altitude, 160.0)
+
+    def orbit(self) -> Dict[str, float]:
+        """Apoapsis/périapsis (rayons, m) et temps jusqu'à Ap/Pe (s)."""
+        with self.lock:
+            r = KERBIN_RADIUS + self.altitude
+            v_r, v_t = self.v_radial, self.v_tangential
+        v2 = v_r * v_r + v_t * v_t
+        energy = v2 / 2.0 - KERBIN_MU / r
+        h = r * v_t
+        ecc = math.sqrt(max(0.0, 1.0 + 2.0 * energy * h * h / KERBIN_MU ** 2))
+        if energy >= 0.0:
+            # Trajectoire d'évasion : pas d'apoapsis.
+            p = h * h / KERBIN_MU
+            return {"apoapsis": math.inf, "periapsis": p / (1.0 + ecc),
+                    "time_to_apoapsis": math.inf, "time_to_periapsis": 0.0}
+        a = -KERBIN_MU / (2.0 * energy)
+        apo, peri = a * (1.0 + ecc), a * (1.0 - ecc)
+        period = 2.0 * math.pi * math.sqrt(a ** 3 / KERBIN_MU)
+        if ecc < 1e-9:
+            return {"apoapsis": apo, "periapsis": peri,
+                    "time_to_apoapsis": period / 2.0, "time_to_periapsis": 0.0}
+        # Anomalie vraie → excentrique → moyenne (Kepler).
+        p = h * h / KERBIN_MU
+        cos_nu = max(-1.0, min(1.0, (p / r - 1.0) / ecc))
+        nu = math.acos(cos_nu)
+        if v_r < 0:
+            nu = 2.0 * math.pi - nu
+        big_e = 2.0 * math.atan2(math.sqrt(1.0 - ecc) * math.sin(nu / 2.0),
+                                 math.sqrt(1.0 + ecc) * math.cos(nu / 2.0))
+        mean = (big_e - ecc * math.sin(big_e)) % (2.0 * math.pi)
+        n = 2.0 * math.pi / period
+        return {
+            "apoapsis": apo,
+            "periapsis": peri,
+            "time_to_apoapsis": ((math.pi - mean) % (2.0 * math.pi)) / n,
+            "time_to_periapsis": ((2.0 * math.pi - mean) % (2.0 * math.pi)) / n,
+        }
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Stream Batch - Appels et streams kRPC groupés en une seule requête.
+
+Le client Python kRPC envoie une requête par appel : ouvrir N streams
+coûte N × (AddStream + StartStream) allers-retours, plus l'attente de la
+première valeur de chacun si on les lit aussitôt. Le protocole accepte
+pourtant plusieurs appels par requête (`Request.calls`) : ici, tous les
+AddStream partent dans une requête, tous les StartStream dans une autre,
+et les premières valeurs arrivent en parallèle.
+
+Utilise l'intérieur du client krpc (connexion RPC, gestionnaire de
+streams) : tout accès privé au client est regroupé dans ce module.
+"""
+
+import time
+from typing import Callable, Dict, Hashable, Iterable, List, Mapping, Sequence, Tuple, TypeVar
+
+import krpc.schema.KRPC_pb2 as KRPC
+from krpc.decoder import Decoder
+from krpc.error import StreamError
+from krpc.stream import Stream
+
+K = TypeVar("K", bound=Hashable)
+
+# (fonction kRPC, arguments) : même forme que connection.add_stream(fn, *args).
+Source = Tuple[Callable, tuple]
+
+
+def invoke_batch(connection, calls: Sequence["KRPC.ProcedureCall"]) -> List["KRPC.ProcedureResult"]:
+    """Envoie `calls` en une seule requête et retourne les résultats bruts."""
+    if not calls:
+        return []
+    request = KRPC.Request()
+    request.calls.extend(calls)
+    with connection._rpc_connection_lock:
+        connection._rpc_connection.send_message(request)
+        response = connection._rpc_connection.receive_message(KRPC.Response)
+    if response.HasField("error"):
+        raise connection._build_error(response.error)
+    return list(response.results)
+
+
+def call_batch(connection, sources: Sequence[Source], errors: bool = False) -> List[object]:
+    """Exécute des appels kRPC (fn, args) en une requête ; lève la première
+    erreur, ou la place dans le résultat de son appel si `errors`."""
+    calls = [connection.get_call(fn, *args) for fn, args in sources]
+    types = [connection._get_return_type(fn, *args) for fn, args in sources]
+    values: List[object] = []
+    for result, typ in zip(invoke_batch(connection, calls), types):
+        if result.HasField("error"):
+            error = connection._build_error(result.error)
+            if not errors:
+                raise error
+            values.append(error)
+        else:
+            values.append(Decoder.decode(connection, result.value, typ) if typ is not None else None)
+    return values
+
+
+def _krpc_call(connection, procedure: str, args: list, names: list, types: list, ret):
+    return connection._build_call("KRPC", procedure, args, names, types, ret)
+
+
+def open_streams(
+    connection,
+    sources: Mapping[K, Source],
+    on_update: Callable[[object], None] = None,
+) -> Tuple[Dict[K, Stream], Dict[K, Exception]]:
+    """Ouvre et démarre un stream par source en deux requêtes.
+
+    Les streams sont enregistrés avant d'être démarrés : aucune première
+    valeur ne peut arriver pour un stream encore inconnu du client.
+    Retourne (streams ouverts, erreurs par clé).
+    """
+    t = connection._types
+    keys = list(sources)
+    adds, return_types = [], []
+    for key in keys:
+        fn, args = sources[key]
+        adds.append(_krpc_call(
+            connection, "AddStream", [connection.get_call(fn, *args), False],
+            ["call", "start"], [t.procedure_call_type, t.bool_type], t.stream_type,
+        ))
+        return_types.append(connection._get_return_type(fn, *args))
+
+    streams: Dict[K, Stream] = {}
+    errors: Dict[K, Exception] = {}
+    for key, typ, result in zip(keys, return_types, invoke_batch(connection, adds)):
+        if result.HasField("error"):
+            errors[key] = connection._build_error(result.error)
+            continue
+        stream_id = Decoder.decode(connection, result.value, t.stream_type).id
+        stream = Stream.from_stream_id(connection, stream_id, typ)
+        if on_update is not None:
+            stream.add_callback(on_update)
+        streams[key] = stream
+
+    starts = [
+        _krpc_call(connection, "StartStream", [s._stream._stream_id], ["id"], [t.uint64_type], None)
+        for s in streams.values()
+    ]
+    for (key, stream), result in zip(list(streams.items()), invoke_batch(connection, starts)):
+        if result.HasField("error"):
+            errors[key] = connection._build_error(result.error)
+            del streams[key]
+        else:
+            stream._stream._started = True
+    return streams, errors
+
+
+def remove_streams(connection, streams: Iterable[Stream]) -> None:
+    """Ferme des streams en une requête (au mieux : erreurs ignorées)."""
+    manager = connection._stream_manager
+    ids = []
+    with manager._update_lock:
+        for stream in streams:
+            impl = stream._stream
+            if manager._streams.pop(impl._stream_id, None) is not None:
+                ids.append(impl._stream_id)
+            impl._value = StreamError("Stream does not exist")
+    t = connection._types
+    try:
+        invoke_batch(connection, [
+            _krpc_call(connection, "RemoveStream", [i], ["id"], [t.uint64_type], None) for i in ids
+        ])
+    except Exception:
+        pass
+
+
+def wait_first_values(connection, streams: Iterable[Stream], timeout: float) -> bool:
+    """Attend que chaque stream ait reçu une valeur. False si timeout."""
+    impls = [s._stream for s in streams]
+    deadline = time.monotonic() + timeout
+    condition = connection.stream_update_condition
+    with condition:
+        while not all(impl.updated for impl in impls):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            condition.wait(remaining)
+    return True
+
+
+def read_settled(connection, stream: Stream):
+    """Valeur du stream une fois traité le message de mise à jour en cours.
+
+    Un message porte les valeurs de plusieurs streams, appliquées une à
+    une : cette lecture est cohérente avec celles des autres streams du
+    même message (ex. identité du vaisseau vs. erreurs des anciens handles).
+    """
+    with connection._stream_manager._update_lock:
+        return stream()
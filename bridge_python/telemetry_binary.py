@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Telemetry Binary - Trames binaires compactes (sous-protocole WebSocket).
+
+Alternative au JSON négociée via le sous-protocole `capsule.bin.v1` : une
+trame à disposition fixe, little-endian, décodable côté Godot avec
+PackedByteArray.decode_* sans allocation de Dictionary.
+
+Disposition (v1) :
+
+    off  type  champ
+    0    u8    version du schéma (1)
+    1    u8    flags : bit0 connected, bit1 engines_active, bit2 ascending
+    2    u8    nombre d'étages N
+    3    -     padding
+    4    u32   seq (numéro d'instantané)
+    8    f64   altitude
+    16   f64   apoapsis
+    24   f64   periapsis
+    32   f32   speed
+    36   f32   vertical_speed
+    40   f32   g_force
+    44   f32   temperature
+    48   f32   apoapsis_time
+    52   f32   periapsis_time
+    56   i16   current_stage
+    58   -     padding
+    60   N × { i16 stage, u8 attached, pad, f32 fuel_percent }   (8 octets)
+"""
+
+import struct
+from typing import Any, Dict
+
+SUBPROTOCOL = "capsule.bin.v1"
+SCHEMA_VERSION = 1
+
+FLAG_CONNECTED = 0x01
+FLAG_ENGINES_ACTIVE = 0x02
+FLAG_ASCENDING = 0x04
+
+_HEADER = struct.Struct("<BBBxI")
+_BODY = struct.Struct("<dddffffffhxx")
+_STAGE = struct.Struct("<hBxf")
+HEADER_SIZE = _HEADER.size + _BODY.size
+STAGE_SIZE = _STAGE.size
+
+_DOUBLES = ("altitude", "apoapsis", "periapsis")
+_FLOATS = ("speed", "vertical_speed", "g_force", "temperature", "apoapsis_time", "periapsis_time")
+
+
+def encode(data: Dict[str, Any], seq: int = 0) -> bytes:
+    """Encode un document de télémétrie (format du payload JSON) en trame v1."""
+    flags = 0
+    if data.get("connected"):
+        flags |= FLAG_CONNECTED
+    if data.get("engines_active"):
+        flags |= FLAG_ENGINES_ACTIVE
+    if data.get("ascending"):
+        flags |= FLAG_ASCENDING
+    stages = data.get("stages") or []
+    n = min(len(stages), 255)
+
+    buf = bytearray(HEADER_SIZE + n * STAGE_SIZE)
+    _HEADER.pack_into(buf, 0, SCHEMA_VERSION, flags, n, seq & 0xFFFFFFFF)
+    _BODY.pack_into(
+        buf,
+        _HEADER.size,
+        *(float(data.get(k, 0.0)) for k in _DOUBLES),
+        *(float(data.get(k, 0.0)) for k in _FLOATS),
+        int(data.get("current_stage", -1)),
+    )
+    off = HEADER_SIZE
+    for s in stages[:n]:
+        _STAGE.pack_into(
+            buf, off, int(s.get("stage", 0)), 1 if s.get("attached") else 0,
+            float(s.get("fuel_percent", 0.0)),
+        )
+        off += STAGE_SIZE
+    return bytes(buf)
+
+
+def decode(frame: bytes) -> Dict[str, Any]:
+    """Décode une trame v1 vers le format du payload JSON (outils, tests)."""
+    version, flags, n, seq = _HEADER.unpack_from(frame, 0)
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"Version de schéma inconnue: {version}")
+    data: Dict[str, Any] = {"seq": seq, "connected": bool(flags & FLAG_CONNECTED)}
+    if not data["connected"]:
+        return data
+    values = _BODY.unpack_from(frame, _HEADER.size)
+    for key, value in zip(_DOUBLES + _FLOATS, values):
+        data[key] = value
+    data["current_stage"] = values[-1]
+    data["engines_active"] = bool(flags & FLAG_ENGINES_ACTIVE)
+    data["ascending"] = bool(flags & FLAG_ASCENDING)
+    stages = []
+    for i in range(n):
+        stage, attached, fuel = _STAGE.unpack_from(frame, HEADER_SIZE + i * STAGE_SIZE)
+        stages.append({"stage": stage, "fuel_percent": fuel, "attached": bool(attached)})
+    data["stages"] = stages
+    return data
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Telemetry Delta - Encodage différentiel de la télémétrie (protocole v2).
+
+Au lieu de renvoyer tout le document à chaque tick, on envoie :
+- une keyframe {"type": "key", "seq", "data"} à la connexion, toutes les
+  keyframe_interval_s et sur demande du client (resync) ;
+- sinon des deltas {"type": "delta", "seq", "changes"} ne contenant que
+  les champs qui ont bougé au-delà de leur seuil de quantification.
+
+L'état de référence est commun à tous les clients v2 : un delta est
+calculé et sérialisé une seule fois par tick.
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+# Seuils par défaut (unités du payload) : en dessous, le champ n'est pas renvoyé.
+DEFAULT_THRESHOLDS: Dict[str, float] = {
+    "altitude": 1.0,
+    "speed": 0.1,
+    "vertical_speed": 0.1,
+    "g_force": 0.01,
+    "temperature": 0.1,
+    "apoapsis": 1.0,
+    "periapsis": 1.0,
+    "apoapsis_time": 1.0,
+    "periapsis_time": 1.0,
+    "fuel_percent": 0.1,
+}
+
+
+def _stages_changed(old, new, fuel_threshold: float) -> bool:
+    if not isinstance(old, list) or len(old) != len(new):
+        return True
+    for a, b in zip(old, new):
+        if a.get("stage") != b.get("stage") or a.get("attached") != b.get("attached"):
+            return True
+        if abs(a.get("fuel_percent", 0.0) - b.get("fuel_percent", 0.0)) >= fuel_threshold:
+            return True
+    return False
+
+
+class DeltaEncoder:
+    """Calcule les deltas quantifiés par rapport au dernier état envoyé."""
+
+    def __init__(
+        self,
+        thresholds: Optional[Dict[str, float]] = None,
+        keyframe_interval_s: float = 5.0,
+    ):
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        if thresholds:
+            self.thresholds.update(thresholds)
+        self.keyframe_interval_s = keyframe_interval_s
+        self.seq = 0
+        # État tel que reconstruit par les clients (valeurs envoyées).
+        self.state: Dict[str, Any] = {}
+        self._last_keyframe = 0.0
+
+    def keyframe(self) -> Dict[str, Any]:
+        """Keyframe de l'état de référence courant (connexion, resync)."""
+        return {"type": "key", "seq": self.seq, "data": self.state}
+
+    def _keyframe_due(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_keyframe < self.keyframe_interval_s:
+            return False
+        self._last_keyframe = now
+        return True
+
+    def periodic_keyframe(self) -> Optional[Dict[str, Any]]:
+        """Keyframe si keyframe_interval_s s'est écoulé depuis la précédente
+        (ticks sans nouvel instantané ; sinon update() s'en charge)."""
+        return self.keyframe() if self._keyframe_due() else None
+
+    def update(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Compare `data` à l'état de référence.
+
+        Retourne la trame à diffuser (delta, ou keyframe si l'ensemble des
+        champs a changé, ex. connexion/déconnexion, ou si keyframe_interval_s
+        est écoulé), ou None si rien n'a bougé au-delà des seuils. La
+        keyframe périodique remplace le delta du tick : en vol, tout change
+        à chaque tick, et un client qui a manqué un delta doit se recaler.
+        """
+        if data.keys() != self.state.keys():
+            self.seq += 1
+            self.state = dict(data)
+            self._last_keyframe = time.monotonic()
+            return self.keyframe()
+
+        changes: Dict[str, Any] = {}
+        for key, value in data.items():
+            old = self.state[key]
+            if key == "stages":
+                if _stages_changed(old, value, self.thresholds["fuel_percent"]):
+                    changes[key] = value
+            elif isinstance(value, float) and isinstance(old, (int, float)):
+                if abs(value - old) >= self.thresholds.get(key, 0.0) and value != old:
+                    changes[key] = value
+            elif value != old:
+                changes[key] = value
+
+        if changes:
+            self.seq += 1
+            # Nouveau dict : une keyframe déjà sérialisée reste cohérente.
+            self.state = {**self.state, **changes}
+        if self._keyframe_due():
+            return self.keyframe()
+        if not changes:
+            return None
+        return {"type": "delta", "seq": self.seq, "changes": changes}
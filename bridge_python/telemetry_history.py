@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Telemetry History - Historique de vol en mémoire fixe.
+
+Tampon circulaire préalloué (module `array`, un tableau de doubles par
+champ) couvrant les `window_s` dernières secondes à `sample_hz`. La
+mémoire ne dépend pas de la durée du vol : ~8 octets × (champs + 1) ×
+window_s × sample_hz.
+
+Les requêtes renvoient une fenêtre temporelle sous-échantillonnée côté
+bridge (seaux min/max ou LTTB) au nombre de points demandé, pour que
+l'UI trace un vol complet avec quelques centaines de points.
+"""
+
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Champs numériques historisés ; fuel_percent = étage courant (stages[0]).
+HISTORY_FIELDS = (
+    "altitude",
+    "speed",
+    "vertical_speed",
+    "g_force",
+    "temperature",
+    "apoapsis",
+    "periapsis",
+    "apoapsis_time",
+    "periapsis_time",
+    "current_stage",
+    "fuel_percent",
+)
+
+# Champs du payload nécessaires pour alimenter l'historique.
+REQUIRED_FIELDS = tuple(f for f in HISTORY_FIELDS if f != "fuel_percent") + ("stages",)
+
+
+def _minmax(t: Sequence[float], v: Sequence[float], points: int) -> Tuple[List[float], List[float]]:
+    """Seaux min/max : 2 points par seau, dans l'ordre chronologique."""
+    n = len(v)
+    buckets = max(1, points // 2)
+    if n <= points:
+        return list(t), list(v)
+    out_t: List[float] = []
+    out_v: List[float] = []
+    for b in range(buckets):
+        lo = b * n // buckets
+        hi = (b + 1) * n // buckets
+        if hi <= lo:
+            continue
+        i_min = i_max = lo
+        for i in range(lo + 1, hi):
+            if v[i] < v[i_min]:
+                i_min = i
+            elif v[i] > v[i_max]:
+                i_max = i
+        for i in sorted({i_min, i_max}):
+            out_t.append(t[i])
+            out_v.append(v[i])
+    return out_t, out_v
+
+
+def _lttb(t: Sequence[float], v: Sequence[float], points: int) -> Tuple[List[float], List[float]]:
+    """Largest-Triangle-Three-Buckets : garde la forme visuelle de la courbe."""
+    n = len(v)
+    if points >= n or points < 3:
+        return list(t), list(v)
+    out_t = [t[0]]
+    out_v = [v[0]]
+    every = (n - 2) / (points - 2)
+    a = 0
+    for i in range(points - 2):
+        # Moyenne du seau suivant (sommet C du triangle).
+        start = int((i + 1) * every) + 1
+        end = min(int((i + 2) * every) + 1, n)
+        count = max(1, end - start)
+        avg_t = sum(t[start:end]) / count
+        avg_v = sum(v[start:end]) / count
+        # Point du seau courant qui maximise l'aire du triangle.
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        best, best_area = lo, -1.0
+        ta, va = t[a], v[a]
+        for j in range(lo, hi):
+            area = abs((ta - avg_t) * (v[j] - va) - (ta - t[j]) * (avg_v - va))
+            if area > best_area:
+                best, best_area = j, area
+        out_t.append(t[best])
+        out_v.append(v[best])
+        a = best
+    out_t.append(t[n - 1])
+    out_v.append(v[n - 1])
+    return out_t, out_v
+
+
+class TelemetryHistory:
+    """Tampon circulaire des champs numériques de la télémétrie."""
+
+    def __init__(
+        self,
+        window_s: float = 3600.0,
+        sample_hz: float = 5.0,
+        fields: Iterable[str] = HISTORY_FIELDS,
+    ):
+        self.fields = tuple(fields)
+        self.window_s = window_s
+        self.sample_hz = sample_hz
+        self.capacity = max(1, int(window_s * sample_hz))
+        self._min_interval = 1.0 / sample_hz
+
+        zeros = bytes(8 * self.capacity)
+        self._t = array("d", zeros)
+        self._cols: Dict[str, array] = {f: array("d", zeros) for f in self.fields}
+        self._head = 0  # prochain index d'écriture
+        self._count = 0
+        self._last_t = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return 8 * self.capacity * (len(self.fields) + 1)
+
+    # ---- Écriture (thread télémétrie) --------------------------------
+
+    def append(self, snapshot) -> None:
+        """Ajoute un instantané (décimé à sample_hz ; ignoré si déconnecté)."""
+        if not snapshot.connected:
+            return
+        t = snapshot.timestamp
+        if t - self._last_t < self._min_interval:
+            return
+        data = snapshot.data
+        stages = data.get("stages") or []
+        with self._lock:
+            i = self._head
+            self._t[i] = t
+            for field, col in self._cols.items():
+                if field == "fuel_percent":
+                    value = stages[0].get("fuel_percent", 0.0) if stages else 0.0
+                else:
+                    value = data.get(field, 0.0)
+                col[i] = float(value)
+            self._head = (i + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self._last_t = t
+
+    # ---- Lecture -----------------------------------------------------
+
+    def _window(self, fields: Sequence[str], since: float) -> Tuple[List[float], Dict[str, List[float]]]:
+        """Copie chronologique des échantillons postérieurs à `since`."""
+        with self._lock:
+            n = self._count
+            start = (self._head - n) % self.capacity
+            order = [(start + k) % self.capacity for k in range(n)]
+            t = [self._t[i] for i in order]
+            # Recherche du premier échantillon dans la fenêtre (t croissant).
+            lo, hi = 0, n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if t[mid] < since:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            order = order[lo:]
+            cols = {f: [self._cols[f][i] for i in order] for f in fields}
+        return t[lo:], cols
+
+    def query(
+        self,
+        fields: Optional[Iterable[str]] = None,
+        window_s: Optional[float] = None,
+        points: int = 300,
+        method: str = "minmax",
+    ) -> Dict:
+        """Fenêtre [now - window_s, now] sous-échantillonnée à ~`points` points.
+
+        Retourne {"window_s", "points", "series": {champ: {"t": [...], "v": [...]}}}
+        avec des horodatages absolus (time.time()).
+        """
+        wanted = [f for f in (fields or self.fields) if f in self._cols]
+        window_s = self.window_s if window_s is None else min(float(window_s), self.window_s)
+        points = max(3, int(points))
+        t, cols = self._window(wanted, time.time() - window_s)
+        reduce = _lttb if method == "lttb" else _minmax
+        series = {}
+        for field in wanted:
+            out_t, out_v = reduce(t, cols[field], points)
+            series[field] = {"t": out_t, "v": out_v}
+        return {"window_s": window_s, "points": points, "method": method, "series": series}
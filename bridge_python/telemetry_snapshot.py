@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Telemetry Snapshot - Instantanés immuables de la télémétrie.
+
+Le thread télémétrie construit un TelemetrySnapshot complet puis le publie
+par simple remplacement de référence (atomique sous le GIL). Les lecteurs
+(WebSocket, LEDs, ...) lisent la référence courante sans prendre le verrou
+kRPC ni copier le dict, et comparent `seq` pour savoir si quelque chose a
+changé depuis leur dernière lecture.
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+
+class TelemetrySnapshot:
+    """Instantané de télémétrie en lecture seule.
+
+    `data` est le dict publié tel quel (sérialisable directement en JSON) :
+    il n'est jamais modifié après publication, le producteur en construit
+    un nouveau à chaque fois.
+    """
+
+    __slots__ = ("seq", "timestamp", "data")
+
+    def __init__(self, seq: int, data: Dict[str, Any], timestamp: Optional[float] = None):
+        object.__setattr__(self, "seq", seq)
+        object.__setattr__(self, "timestamp", time.time() if timestamp is None else timestamp)
+        object.__setattr__(self, "data", data)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("TelemetrySnapshot est immuable")
+
+    @classmethod
+    def disconnected(cls, seq: int = 0) -> "TelemetrySnapshot":
+        return cls(seq, {"connected": False})
+
+    @property
+    def connected(self) -> bool:
+        return bool(self.data.get("connected", False))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.data.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        return self.data[key]
+
+    def changed_since(self, seq: int) -> bool:
+        return self.seq != seq
+
+    def __repr__(self) -> str:
+        return f"TelemetrySnapshot(seq={self.seq}, connected={self.connected})"
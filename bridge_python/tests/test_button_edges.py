@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Tests EdgeCapture - fronts GPIO horodatés, anti-rebond sans perte (MockFactory)."""
+
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from gpiozero import Button, Device
+from gpiozero.pins.mock import MockFactory, MockPWMPin
+
+from button_edges import EdgeCapture
+from gpio_handler import GPIOHandler
+
+LOW, HIGH = 0, 1  # bouton pull-up : appuyé = niveau bas
+
+
+class TestEdgeCapture(unittest.TestCase):
+    def setUp(self):
+        self.factory = MockFactory()
+        self.button = Button(17, pull_up=True, bounce_time=None, pin_factory=self.factory)
+        self.addCleanup(self.button.close)
+        self.edges = []
+        self.capture = EdgeCapture(self.edges.append, debounce_s=0.02)
+        self.capture.watch(17, self.button)
+        self.capture.clock.sync()
+        # Fronts injectés avec leurs ticks, une seconde dans le passé.
+        self.base = self.factory.ticks() - 1.0
+
+    def _feed(self, *edges):
+        tap = self.capture._taps[17]
+        for offset_ms, level in edges:
+            tap.changed(self.base + offset_ms / 1000.0, level)
+        self.capture.process()
+
+    def test_bounces_filtered_quick_presses_kept(self):
+        self._feed(
+            (0, LOW), (2, HIGH), (4, LOW),          # appui avec rebonds
+            (60, HIGH), (61, LOW), (63, HIGH),      # relâché avec rebonds
+            (100, LOW), (130, HIGH), (160, LOW),    # deux appuis rapprochés
+        )
+        self.assertEqual([e.pressed for e in self.edges], [True, False, True, False, True])
+        self.assertEqual(self.capture.filtered, 2)
+        # Horodatage du premier front de chaque transition.
+        self.assertAlmostEqual(self.edges[2].t - self.edges[0].t, 0.100, places=3)
+
+    def test_edge_inside_window_is_settled_not_lost(self):
+        # Appui puis relâché 10 ms après (dans la fenêtre) : le relâché est
+        # accepté à la fin de la fenêtre, avec son horodatage d'origine.
+        self._feed((0, LOW), (10, HIGH))
+        self.assertEqual([e.pressed for e in self.edges], [True, False])
+        self.assertAlmostEqual(self.edges[1].t - self.edges[0].t, 0.010, places=3)
+
+
+class FakeKRPC:
+    def __init__(self):
+        self.groups = []
+
+    def trigger_action_group(self, group, origin=None):
+        self.groups.append((group, origin))
+
+
+class TestGPIOHandlerEdges(unittest.TestCase):
+    def setUp(self):
+        Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+        self.krpc = FakeKRPC()
+        self.gpio = GPIOHandler(krpc=self.krpc, config={
+            "use_remote": False,
+            "boutons": {"8": {"type": "ag", "value": 3, "name": "STAGE_1"}},
+        })
+
+    def tearDown(self):
+        self.gpio.cleanup()
+        Device.pin_factory = None
+
+    def test_press_dispatched_with_capture_timestamp(self):
+        pin = self.gpio.boutons[8].pin
+        before = time.perf_counter()
+        pin.drive_low()
+        end = time.time() + 1.0
+        while not self.krpc.groups and time.time() < end:
+            time.sleep(0.002)
+        self.assertEqual(len(self.krpc.groups), 1)
+        group, (name, captured) = self.krpc.groups[0]
+        self.assertEqual((group, name), (3, "STAGE_1"))
+        self.assertGreaterEqual(captured, before - 0.005)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
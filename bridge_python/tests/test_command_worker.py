@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Tests CommandWorker - priorités, fusion des consignes, latence."""
+
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from async_runtime import AsyncRuntime
+from command_worker import CommandWorker
+from loop_scheduler import DeadlineScheduler
+
+
+class TestCommandWorker(unittest.TestCase):
+    def setUp(self):
+        self.worker = CommandWorker(history=16)
+        self.done = []
+
+    def tearDown(self):
+        self.worker.stop()
+
+    def _wait_executed(self, n: int, timeout: float = 2.0) -> None:
+        end = time.time() + timeout
+        while self.worker.executed < n and time.time() < end:
+            time.sleep(0.005)
+
+    def test_inline_when_not_started(self):
+        self.worker.submit("ag1", self.done.append, "ag1")
+        self.assertEqual(self.done, ["ag1"])
+
+    def test_discrete_first_and_throttle_coalesced(self):
+        gate = threading.Event()
+        self.worker.start()
+        self.worker.submit("block", gate.wait)
+        time.sleep(0.05)  # le worker est bloqué dans "block"
+        for v in (0.1, 0.2, 0.3):
+            self.worker.submit("throttle", self.done.append, v, continuous=True)
+        self.worker.submit("ag2", self.done.append, "ag2")
+        gate.set()
+        self._wait_executed(3)
+        self.assertEqual(self.done, ["ag2", 0.3])
+        self.assertEqual(self.worker.coalesced, 2)
+        summary = self.worker.latency_summary()
+        self.assertIn("throttle", summary)
+        self.assertEqual(summary["ag2"]["count"], 1)
+
+    def test_origin_latency_per_input(self):
+        captured = time.perf_counter() - 0.010  # front matériel 10 ms plus tôt
+        self.worker.submit("ag1", self.done.append, "ag1", origin=("STAGE_1", captured))
+        summary = self.worker.input_latency_summary()
+        self.assertEqual(list(summary), ["STAGE_1"])
+        self.assertGreaterEqual(summary["STAGE_1"]["p50_ms"], 10.0)
+
+    def test_failed_command_not_measured(self):
+        captured = time.perf_counter()
+        self.worker.submit("ag1", lambda: False, origin=("STAGE_1", captured))
+        self.worker.submit("ag2", self.done.append, "ag2", origin=("STAGE_2", captured))
+        self.assertEqual(self.worker.failed, 1)
+        self.assertEqual(self.worker.executed, 1)
+        self.assertEqual(list(self.worker.latency_summary()), ["ag2"])
+        self.assertEqual(list(self.worker.input_latency_summary()), ["STAGE_2"])
+
+    def test_driven_by_async_runtime(self):
+        runtime = AsyncRuntime(workers=1)
+        threads = set()
+        runtime.add_periodic(
+            DeadlineScheduler("t_runtime", hz=50),
+            lambda: threads.add(threading.current_thread().name),
+            dedicated=True,
+        )
+        runtime.add_commands(self.worker)
+
+        def press():
+            time.sleep(0.1)
+            self.worker.submit("ag3", self.done.append, "ag3")
+
+        threading.Thread(target=press).start()
+        runtime.run(duration=0.4)
+        self.assertEqual(self.done, ["ag3"])
+        # Tâche dédiée : toujours le même thread.
+        self.assertEqual(len(threads), 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -24,6 +24,12 @@ class TestConfiguration(unittest.TestCase):
         self.assertEqual(k["rpc_port"], 50008)
         self.assertEqual(k["stream_port"], 50001)
 
+    def test_telemetry(self):
+        t = self.cfg["telemetry"]
+        self.assertIn(t.get("mode", "poll"), ("poll", "event"))
+        self.assertGreater(t["update_hz"], 0)
+        self.assertGreater(t.get("heartbeat_s", 1.0), 0.0)
+
     def test_websocket(self):
         w = self.cfg["websocket"]
         self.assertEqual(w["host"], "0.0.0.0")
@@ -54,6 +60,13 @@ class TestConfiguration(unittest.TestCase):
             if action["type"] == "ag":
                 self.assertIsInstance(action.get("value"), int)
 
+    def test_led_rules_compile_on_configured_leds(self):
+        from led_rules import LedRuleEngine
+        g = self.cfg["hardware"]["gpio"]
+        engine = LedRuleEngine.from_config(g.get("led_rules", []))
+        leds = {int(p) for p in list(g["leds_rouges"]["pins"]) + list(g["leds_vertes"]["pins"])}
+        self.assertLessEqual(engine.pins, leds)
+
     def test_throttle_params_in_range(self):
         t = self.cfg["throttle"]
         self.assertGreater(t["smoothing_alpha"], 0.0)
@@ -61,6 +74,10 @@ class TestConfiguration(unittest.TestCase):
         self.assertGreaterEqual(t["deadzone_percent"], 0.0)
         self.assertLess(t["deadzone_percent"], 50.0)
 
+    def test_throttle_filter_builds(self):
+        from throttle_filter import build_filter
+        self.assertIsNotNone(build_filter(self.cfg["throttle"]))
+
 
 class TestPicoHandlerAPI(unittest.TestCase):
     """Tests API PicoHandler - pas de hardware requis."""
@@ -89,6 +106,48 @@ class TestPicoHandlerAPI(unittest.TestCase):
         self.assertAlmostEqual(ph._ema, 0.5, places=2)
 
 
+class TestKRPCHandlerAPI(unittest.TestCase):
+    """Carburant par étage - pas de KSP requis (streams simulés)."""
+
+    def test_stage_streams_read_aggregates_propellants(self):
+        try:
+            from krpc_handler import StageResourceStreams
+        except ImportError as e:
+            self.skipTest(f"krpc indispo: {e}")
+        srs = StageResourceStreams()
+        const = lambda v: (lambda: v)
+        srs._streams = [
+            (3, {"LiquidFuel": (const(45.0), const(90.0)),
+                 "Oxidizer": (const(55.0), const(110.0))}),
+            (2, {"SolidFuel": (const(0.0), const(0.0))}),
+        ]
+        srs.stage = 3
+        stages = srs.read()
+        self.assertEqual([s["stage"] for s in stages], [3, 2])
+        self.assertAlmostEqual(stages[0]["fuel_percent"], 50.0)
+        self.assertEqual(set(stages[0]["propellants"]), {"LiquidFuel", "Oxidizer"})
+        self.assertEqual(stages[1]["fuel_percent"], 0.0)
+        self.assertTrue(all(s["attached"] for s in stages))
+
+    def test_wanted_fields_union(self):
+        try:
+            from krpc_handler import ALWAYS_STREAMED, FIELD_STREAMS, KRPCHandler
+        except ImportError as e:
+            self.skipTest(f"krpc indispo: {e}")
+        k = KRPCHandler()
+        self.assertEqual(k.wanted_fields(), frozenset(FIELD_STREAMS))
+        k.require_fields("ws", ["altitude"])
+        k.require_fields("leds", ["engines_active"])
+        self.assertEqual(k.wanted_fields(), {"altitude", "engines_active"})
+        self.assertEqual(k._wanted_streams(), {"altitude", "throttle", *ALWAYS_STREAMED})
+        self.assertIn("sas", ALWAYS_STREAMED)
+        k.require_fields("history", None)
+        self.assertEqual(k.wanted_fields(), frozenset(FIELD_STREAMS))
+        k.release_fields("history")
+        k.require_fields("ws", [])
+        self.assertEqual(k.wanted_fields(), {"engines_active"})
+
+
 class TestGPIOHandlerAPI(unittest.TestCase):
     """Test import et gestion config invalide."""
 
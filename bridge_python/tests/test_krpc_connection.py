@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Tests de krpc_connection : backoff, timeouts et supervision."""
+
+import random
+import socket
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from krpc_connection import Backoff, ConnectionSupervisor, open_client
+from krpc_handler import KRPCHandler
+
+
+class TestBackoff(unittest.TestCase):
+    def test_exponential_bounded_with_jitter(self):
+        backoff = Backoff(min_s=0.5, max_s=4.0, jitter=0.5, rng=random.Random(3))
+        delays = [backoff.next() for _ in range(6)]
+        for delay, base in zip(delays, (0.5, 1.0, 2.0, 4.0, 4.0, 4.0)):
+            self.assertGreaterEqual(delay, base * 0.5)
+            self.assertLessEqual(delay, base)
+        backoff.reset()
+        self.assertLessEqual(backoff.next(), 0.5)
+
+
+class FakeHandler:
+    def __init__(self, results):
+        self.results = list(results)
+        self.connected = False
+        self.alive = True
+        self.lost = []
+
+    def connect(self):
+        self.connected = self.results.pop(0)
+        return self.connected
+
+    def check_alive(self):
+        return self.alive
+
+    def mark_lost(self, reason):
+        self.lost.append(reason)
+        self.connected = False
+
+
+class TestSupervisor(unittest.TestCase):
+    def test_retries_then_keepalive(self):
+        handler = FakeHandler([False, False, True, True])
+        supervisor = ConnectionSupervisor(handler, Backoff(min_s=1.0, jitter=0.0), keepalive_s=0.25)
+        self.assertEqual(supervisor.step(), 1.0)
+        self.assertEqual(supervisor.step(), 2.0)
+        self.assertEqual(supervisor.step(), 0.25)
+        self.assertEqual(supervisor.step(), 0.25)  # keepalive OK : pas de tentative
+        self.assertEqual(supervisor.attempts, 3)
+        handler.alive = False
+        self.assertEqual(supervisor.step(), 0.25)  # perte → reconnexion immédiate
+        self.assertEqual(handler.lost, ["keepalive"])
+        self.assertEqual(supervisor.attempts, 4)
+
+
+class SilentServer:
+    """Accepte les connexions TCP mais ne répond jamais (kRPC figé)."""
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(8)
+        self.port = self.sock.getsockname()[1]
+        self.conns = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                self.conns.append(self.sock.accept()[0])
+            except OSError:
+                return
+
+    def close(self):
+        self.sock.close()
+        for conn in self.conns:
+            conn.close()
+
+
+class TestNeverBlocks(unittest.TestCase):
+    def setUp(self):
+        self.server = SilentServer()
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_handshake_timeout(self):
+        t0 = time.monotonic()
+        with self.assertRaises(OSError):
+            open_client("test", "127.0.0.1", self.server.port, self.server.port,
+                        connect_timeout_s=0.2, rpc_timeout_s=0.2)
+        self.assertLess(time.monotonic() - t0, 1.0)
+
+    def test_bridge_served_while_connecting(self):
+        krpc = KRPCHandler(
+            host="127.0.0.1", rpc_port=self.server.port, stream_port=self.server.port,
+            connect_timeout_s=0.2, rpc_timeout_s=0.3,
+        )
+        krpc.supervisor.start()
+        try:
+            self.assertTrue(_eventually(lambda: krpc.supervisor.attempts >= 1))
+            # Tentative en cours : lecteurs et commandes rendent la main aussitôt.
+            t0 = time.monotonic()
+            for _ in range(100):
+                self.assertFalse(krpc.snapshot().connected)
+                krpc.get_telemetry()
+                krpc.set_sas(True)
+                krpc.update_telemetry()
+                self.assertFalse(krpc.reconnect_if_needed())
+            self.assertLess(time.monotonic() - t0, 0.1)
+        finally:
+            t0 = time.monotonic()
+            krpc.disconnect()
+            self.assertLess(time.monotonic() - t0, 1.0)
+
+
+def _eventually(predicate, timeout: float = 2.0) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Tests KRPCHandler contre le serveur kRPC simulé (sans KSP)."""
+
+import sys
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from krpc_handler import _RPC_TOTAL, KRPCHandler
+from sim import KRPCStandIn, NetworkProfile
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> bool:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class TestKRPCHandlerWithSim(unittest.TestCase):
+    def setUp(self):
+        self.sim = KRPCStandIn(
+            rpc_port=0, stream_port=0, network=NetworkProfile(latency_ms=2.0, jitter_ms=1.0, seed=1)
+        ).start()
+        self.krpc = KRPCHandler(
+            host="127.0.0.1", rpc_port=self.sim.rpc_port, stream_port=self.sim.stream_port
+        )
+        self.assertTrue(self.krpc.connect())
+        self.krpc.commands.start()
+
+    def tearDown(self):
+        self.krpc.disconnect()
+        self.sim.stop()
+
+    def _update_until(self, predicate, timeout: float = 2.0) -> bool:
+        # Même logique que main.telemetry_loop.
+        def check():
+            if self.krpc.connected:
+                self.krpc.update_telemetry()
+            else:
+                self.krpc.reconnect_if_needed()
+            return predicate(self.krpc.snapshot())
+        return _wait_for(check, timeout)
+
+    def test_telemetry_from_streams(self):
+        self.assertTrue(self._update_until(lambda s: len(s.get("stages") or []) == 4))
+        snap = self.krpc.snapshot()
+        self.assertTrue(snap.connected)
+        self.assertEqual(snap["current_stage"], 3)
+        self.assertEqual(snap["stages"][0]["propellants"], {"SolidFuel": 100.0})
+
+    def test_stage_stream_failure_backs_off(self):
+        self.assertTrue(self._update_until(lambda s: len(s.get("stages") or []) == 4))
+        stage_streams = self.krpc._stage_streams
+        stage_streams.close()
+        attempts = []
+
+        def failing_rebind(*args):
+            attempts.append(args)
+            raise RuntimeError("streams refusés")
+
+        stage_streams.rebind = failing_rebind
+        before = _RPC_TOTAL.value
+        for _ in range(5):
+            self.krpc.update_telemetry()
+        # Un seul essai pendant STAGE_STREAM_RETRY_S ; repli RPC groupé :
+        # deux requêtes par tick au lieu d'une par valeur.
+        self.assertEqual(len(attempts), 1)
+        self.assertLessEqual(_RPC_TOTAL.value - before, 5 * 2)
+        stages = self.krpc.snapshot()["stages"]
+        self.assertEqual(len(stages), 4)
+        self.assertEqual(stages[0]["propellants"], {"SolidFuel": 100.0})
+
+    def test_commands_reach_vessel(self):
+        self.krpc.set_sas(True)
+        self.krpc.set_throttle(0.5)
+        self.assertTrue(_wait_for(lambda: self.sim.vessel.sas and self.sim.vessel.throttle == 0.5))
+        self.assertTrue(self.krpc.sas_state)
+
+    def test_control_state_streamed(self):
+        self.assertTrue(self._update_until(lambda s: s.get("gear") is True))
+        # Changements faits dans KSP (clavier) : visibles sans commande du bridge.
+        self.sim.vessel.sas = True
+        self.sim.vessel.toggle_action_group(7)
+        self.assertTrue(self._update_until(lambda s: s.get("sas") and s["action_groups"][7]))
+        self.assertTrue(self.krpc.sas_state)
+        self.sim.vessel.sas = False
+        self.assertTrue(self._update_until(lambda s: s.get("sas") is False))
+        self.assertFalse(self.krpc.sas_state)
+
+    def test_gear_toggle_reads_streamed_state(self):
+        self.assertTrue(self._update_until(lambda s: s.get("gear") is True))
+        before = _RPC_TOTAL.value
+        self.krpc.toggle_gear_and_brakes()
+        self.krpc.toggle_gear_and_brakes()  # double appui avant le retour du stream
+        self.assertTrue(_wait_for(lambda: _RPC_TOTAL.value - before >= 4))
+        time.sleep(0.1)
+        # Deux écritures par toggle, aucune lecture de control.gear.
+        self.assertEqual(_RPC_TOTAL.value - before, 4)
+        self.assertTrue(self.sim.vessel.gear and self.sim.vessel.brakes)
+
+    def test_staging_and_revert(self):
+        self._update_until(lambda s: s.get("current_stage") == 3)
+        self.krpc.trigger_action_group(2)
+        self.assertTrue(self._update_until(lambda s: s.get("current_stage") == 2))
+        # Retour au lancement : les anciens handles sont invalides ; le
+        # stream d'identité signale le vaisseau neuf, rebind à chaud sans
+        # reconnexion ni instantané "déconnecté".
+        snapshots = []
+        switched = []
+        self.krpc.add_snapshot_listener(snapshots.append)
+        self.krpc.on_vessel_changed = lambda: switched.append(True)
+        self.sim.vessel.reset()
+        self.assertTrue(self._update_until(
+            lambda s: s.get("current_stage") == 3 and len(s.get("stages") or []) == 4
+        ))
+        self.assertEqual(switched, [True])
+        self.assertEqual(self.krpc.connect_count, 1)
+        self.assertTrue(all(s.connected for s in snapshots))
+        self.assertEqual(self.krpc.snapshot()["stages"][0]["propellants"], {"SolidFuel": 100.0})
+        self.assertIsNotNone(self.krpc.last_rebind)
+        self.assertLessEqual(self.krpc.last_rebind["rebind_ms"], self.krpc.last_rebind["blackout_ms"])
+
+    def test_commands_bypass_telemetry(self):
+        self.assertTrue(self.krpc.command_channel.connected)
+        # Tick télémétrie en cours (verrou tenu, RPC en vol) : la commande
+        # passe par son canal sans attendre.
+        with self.krpc._lock:
+            self.krpc.set_throttle(0.75)
+            self.assertTrue(_wait_for(lambda: self.sim.vessel.throttle == 0.75, timeout=1.0))
+        # Canal coupé : repli sur la connexion télémétrie.
+        self.krpc.command_channel.mark_lost("test")
+        self.krpc.set_sas(True)
+        self.assertTrue(_wait_for(lambda: self.sim.vessel.sas))
+
+    def test_connection_loss_and_supervised_reconnect(self):
+        self.assertTrue(self._update_until(lambda s: s.get("current_stage") == 3))
+        self.krpc._backoff.min_s = 0.05
+        self.krpc.supervisor.start()
+        self.sim.drop_connections()
+        # Perte constatée par la télémétrie ou le keepalive, sans RPC bloquant.
+        t0 = time.monotonic()
+        self.assertTrue(_wait_for(lambda: self._tick() or not self.krpc.connected))
+        self.assertLess(time.monotonic() - t0, 1.5)
+        self.assertFalse(self.krpc.snapshot().connected)
+        # Reconnexion par le superviseur ; la télémétrie repart.
+        self.assertTrue(_wait_for(lambda: self.krpc.connect_count == 2, timeout=3.0))
+        self.assertTrue(self._update_until(lambda s: s.connected and s.get("current_stage") == 3))
+        self.assertTrue(self.krpc.command_channel.connected)
+
+    def _tick(self) -> bool:
+        if self.krpc.connected:
+            self.krpc.update_telemetry()
+        return False
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Tests LedFramebuffer - envoi par différence, effets, lot pigpio pipeliné."""
+
+import struct
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory, MockPWMPin
+
+from gpio_handler import GPIOHandler
+from led_framebuffer import LedFramebuffer, PigpioBatchWriter
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.batches = []
+
+    def add(self, pin, led):
+        pass
+
+    def write(self, values):
+        self.batches.append(list(values))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLedFramebuffer(unittest.TestCase):
+    def setUp(self):
+        self.writer = RecordingWriter()
+        self.clock = FakeClock()
+        self.fb = LedFramebuffer(self.writer, clock=self.clock)
+        for pin in (18, 24, 27):
+            self.fb.add(pin, led=None)
+
+    def test_only_changes_flushed_in_one_batch(self):
+        self.assertEqual(self.fb.flush(), 3)  # premier envoi : toutes les broches
+        self.assertEqual(self.fb.flush(), 0)
+        self.fb.set(24, 0.2)
+        self.fb.set(27, 0.2)
+        self.fb.set(18, 0.0)  # inchangée
+        self.assertEqual(self.fb.flush(), 2)
+        self.assertEqual(self.writer.batches[-1], [(24, 0.2), (27, 0.2)])
+
+    def test_blink_and_fade_rendered_by_flush(self):
+        self.fb.flush()
+        self.fb.blink(18, 0.5, period_s=1.0)
+        self.fb.flush()
+        self.assertEqual(self.writer.batches[-1], [(18, 0.5)])
+        self.clock.now += 0.6
+        self.fb.flush()
+        self.assertEqual(self.writer.batches[-1], [(18, 0.0)])
+
+        self.fb.fade(24, 1.0, duration_s=1.0)
+        self.clock.now += 0.5
+        self.fb.flush()
+        self.assertIn((24, 0.5), self.writer.batches[-1])  # 18 clignote toujours
+        self.clock.now += 1.0
+        self.fb.flush()
+        self.assertEqual(self.writer.batches[-1][-1], (24, 1.0))
+        self.assertEqual(self.fb.get(24), 1.0)
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+
+    def sendall(self, data):
+        self.sent.append(bytes(data))
+        self._reply = b"".join(
+            struct.pack("IIII", cmd, p1, p2, 0) for cmd, p1, p2, _ in struct.iter_unpack("IIII", data)
+        )
+
+    def recv(self, n):
+        chunk, self._reply = self._reply[:7], self._reply[7:]  # réponses fragmentées
+        return chunk
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sl = type("SL", (), {"s": FakeSocket(), "l": threading.Lock()})()
+
+    def get_PWM_range(self, pin):
+        return 10000
+
+
+class FakeLed:
+    def __init__(self, active_high=True):
+        self.active_high = active_high
+
+
+class TestPigpioBatchWriter(unittest.TestCase):
+    def test_single_send_for_all_changes(self):
+        conn = FakeConnection()
+        writer = PigpioBatchWriter(conn)
+        writer.add(18, FakeLed())
+        writer.add(24, FakeLed(active_high=False))
+        writer.write([(18, 0.25), (24, 0.25)])
+        self.assertEqual(len(conn.sl.s.sent), 1)
+        cmds = list(struct.iter_unpack("IIII", conn.sl.s.sent[0]))
+        self.assertEqual(cmds, [(5, 18, 2500, 0), (5, 24, 7500, 0)])
+
+
+class TestGPIOHandlerLeds(unittest.TestCase):
+    def test_led_writes_deferred_to_update(self):
+        Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+        self.addCleanup(setattr, Device, "pin_factory", None)
+        gpio = GPIOHandler(config={
+            "use_remote": False,
+            "leds_rouges": {"brightness": 0.2, "pins": {"24": "STAGE_BOOSTERS"}},
+        })
+        self.addCleanup(gpio.cleanup)
+        led = gpio.leds_red[24]
+        self.assertAlmostEqual(led.value, 0.2)
+        gpio._turn_off_red_led("STAGE_BOOSTERS")
+        self.assertAlmostEqual(led.value, 0.2)  # rien d'envoyé avant le tick
+        gpio.update()
+        self.assertEqual(led.value, 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
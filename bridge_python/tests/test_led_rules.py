@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Tests LedRuleEngine - règles LED déclaratives, réévaluation sur changement."""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from gpiozero import Device
+from gpiozero.pins.mock import MockFactory, MockPWMPin
+
+from gpio_handler import GPIOHandler
+from led_rules import LED_OFF, LedRuleEngine, compile_condition
+from telemetry_snapshot import TelemetrySnapshot
+
+RULES = [
+    {"led": 24, "when": "current_stage in {4, 5, 6}"},
+    {"led": 27, "when": "fuel_percent < 10", "effect": "blink", "period_s": 0.5},
+    {"led": 27, "when": "fuel_percent >= 10", "brightness": 0.3},
+    {"led": 18, "when": "sas"},
+]
+
+
+class TestLedRuleEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = LedRuleEngine.from_config(RULES, {24: 0.2, 27: 0.2, 18: 0.1})
+
+    def test_conditions(self):
+        field, pred = compile_condition("altitude >= 70000")
+        self.assertEqual(field, "altitude")
+        self.assertTrue(pred(70000))
+        self.assertFalse(pred(None))
+        self.assertFalse(compile_condition("current_stage not in [1, 2]")[1](2))
+        self.assertTrue(compile_condition("not sas")[1](False))
+        with self.assertRaises(ValueError):
+            LedRuleEngine.from_config([{"led": 1, "when": "altitude ~ 3"}])
+
+    def test_dependency_index_and_payload_fields(self):
+        self.assertEqual(self.engine.index["fuel_percent"], {27})
+        self.assertEqual(self.engine.index["sas"], {18})
+        self.assertEqual(self.engine.payload_fields(), {"current_stage", "stages", "sas"})
+
+    def test_only_changed_fields_reevaluated(self):
+        values = {"current_stage": 5, "fuel_percent": 50.0, "sas": False}
+        out = self.engine.update(values)
+        self.assertEqual(out, {24: ("on", 0.2, 1.0, 0.5), 27: ("on", 0.3, 1.0, 0.5), 18: LED_OFF})
+        evaluated = self.engine.evaluations
+        self.assertEqual(self.engine.update(dict(values)), {})
+        self.assertEqual(self.engine.evaluations, evaluated)
+
+        values["fuel_percent"] = 8.0
+        out = self.engine.update(values)
+        self.assertEqual(out, {27: ("blink", 0.2, 0.5, 0.5)})
+        self.assertEqual(self.engine.evaluations, evaluated + 1)
+
+
+class FakeKRPC:
+    def __init__(self):
+        self.fields = {}
+        self._snapshot = TelemetrySnapshot.disconnected()
+
+    def require_fields(self, owner, fields):
+        self.fields[owner] = fields
+
+    def snapshot(self):
+        return self._snapshot
+
+    def publish(self, seq, **data):
+        self._snapshot = TelemetrySnapshot(seq, dict(data, connected=True))
+
+
+class TestGPIOHandlerRules(unittest.TestCase):
+    def setUp(self):
+        Device.pin_factory = MockFactory(pin_class=MockPWMPin)
+        self.krpc = FakeKRPC()
+        self.gpio = GPIOHandler(krpc=self.krpc, config={
+            "use_remote": False,
+            "leds_rouges": {"brightness": 0.2, "pins": {"24": "STAGE_BOOSTERS", "27": "STAGE_1"}},
+            "leds_vertes": {"brightness": 0.1, "pins": {"18": "SAS"}},
+            "led_rules": RULES,
+        })
+
+    def tearDown(self):
+        self.gpio.cleanup()
+        Device.pin_factory = None
+
+    def test_rules_drive_leds_from_snapshot(self):
+        self.assertEqual(self.krpc.fields["led_rules"], {"current_stage", "stages", "sas"})
+        self.gpio.update()
+        self.assertEqual(self.gpio.leds_red[24].value, 0.0)  # déconnecté : aucune règle vraie
+
+        self.krpc.publish(1, current_stage=4, sas=True, stages=[{"stage": 4, "fuel_percent": 80.0}])
+        self.gpio.update()
+        self.assertAlmostEqual(self.gpio.leds_red[24].value, 0.2)
+        self.assertAlmostEqual(self.gpio.leds_red[27].value, 0.3)
+        self.assertAlmostEqual(self.gpio.leds_green[18].value, 0.1)
+
+        # Un bouton AG n'éteint plus une LED pilotée par règle.
+        self.gpio._turn_off_red_led("STAGE_BOOSTERS")
+        self.gpio.update()
+        self.assertAlmostEqual(self.gpio.leds_red[24].value, 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
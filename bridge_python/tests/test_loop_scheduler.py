@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Tests DeadlineScheduler - échéances absolues, sauts, cadence adaptative."""
+
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loop_scheduler import DeadlineScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestDeadlineScheduler(unittest.TestCase):
+    def test_deadlines_do_not_drift_with_work(self):
+        clock = FakeClock()
+        sched = DeadlineScheduler("t_drift", hz=10, clock=clock)
+        start = sched.first_deadline()
+        for _ in range(50):
+            clock.now += 0.03  # travail du tick
+            deadline = sched.tick_done(clock.now - 0.03)
+            clock.now = deadline
+        self.assertAlmostEqual(clock.now, start + 5.0, places=9)
+        self.assertEqual(sched.overruns, 0)
+
+    def test_missed_ticks_are_skipped_not_bunched(self):
+        clock = FakeClock()
+        sched = DeadlineScheduler("t_skip", hz=10, clock=clock)
+        sched.first_deadline()
+        clock.now += 0.35  # tick bloqué 3,5 intervalles
+        deadline = sched.tick_done(clock.now - 0.35)
+        self.assertEqual(deadline, clock.now)
+        self.assertEqual(sched.overruns, 1)
+        self.assertEqual(sched.skipped, 2)
+        # La grille repart de l'instant courant.
+        clock.now += 0.01
+        self.assertAlmostEqual(sched.tick_done(clock.now - 0.01), deadline + 0.1)
+
+    def test_adaptive_rate_down_then_up(self):
+        clock = FakeClock()
+        sched = DeadlineScheduler("t_adapt", hz=20, adaptive=True, min_hz=5, adapt_window=10, clock=clock)
+        sched.first_deadline()
+
+        def run(work: float, n: int) -> None:
+            for _ in range(n):
+                clock.now += work
+                clock.now = max(clock.now, sched.tick_done(clock.now - work))
+
+        run(0.1, 200)  # 100 ms par tick : intenable à 20 Hz
+        self.assertLess(sched.hz, 10)
+        self.assertGreaterEqual(sched.hz, 5)
+        run(0.5, 200)  # même min_hz est dépassé : plancher
+        self.assertEqual(sched.hz, 5)
+        run(0.005, 200)
+        self.assertEqual(sched.hz, 20)
+
+    def test_threaded_run_rate(self):
+        sched = DeadlineScheduler("t_run", hz=50)
+        stop = threading.Event()
+        count = []
+        thread = threading.Thread(target=sched.run, args=(lambda: count.append(1), stop))
+        thread.start()
+        time.sleep(0.5)
+        stop.set()
+        thread.join()
+        self.assertGreaterEqual(len(count), 20)
+        self.assertLessEqual(len(count), 27)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Tests du registre de métriques et de l'export Prometheus HTTP."""
+
+import asyncio
+import socket
+import sys
+import unittest
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import websockets
+
+from flight_recorder import ReplaySource
+from metrics import REGISTRY, Registry
+from websocket_server import PROMETHEUS_CONTENT_TYPE, WebSocketServer
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles_within_bucket_error(self):
+        reg = Registry()
+        hist = reg.histogram("t_seconds")
+        for us in range(1, 10001):
+            hist.observe(us / 1e6)
+        q = hist.quantiles()
+        # 16 seaux par octave : erreur relative < 1/16.
+        self.assertAlmostEqual(q[0.5], 0.005, delta=0.005 / 16)
+        self.assertAlmostEqual(q[0.99], 0.0099, delta=0.0099 / 16)
+        self.assertLessEqual(q[0.999], 0.01)
+        self.assertEqual(hist.count, 10000)
+
+    def test_render_prometheus_text(self):
+        reg = Registry()
+        reg.histogram("cmd_seconds", "Durée", {"command": "sas"}).observe(0.002)
+        reg.counter("rpc_total", "RPC").inc(3)
+        reg.gauge("clients", fn=lambda: 2)
+        text = reg.render()
+        self.assertIn("# TYPE cmd_seconds summary", text)
+        self.assertIn('cmd_seconds{command="sas",quantile="0.99"}', text)
+        self.assertIn('cmd_seconds_count{command="sas"} 1', text)
+        self.assertIn("rpc_total 3", text)
+        self.assertIn("clients 2", text)
+        with self.assertRaises(ValueError):
+            reg.gauge("rpc_total")
+
+
+class TestMetricsEndpoint(unittest.TestCase):
+    def test_http_get_metrics_on_ws_port(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        server = WebSocketServer(krpc=ReplaySource(), host="127.0.0.1", port=port)
+
+        async def scenario():
+            task = asyncio.ensure_future(server.serve())
+            await asyncio.sleep(0.2)
+            loop = asyncio.get_running_loop()
+            url = f"http://127.0.0.1:{port}/metrics"
+            resp = await loop.run_in_executor(None, urllib.request.urlopen, url)
+            body = resp.read().decode()
+            # Le WebSocket reste servi sur le même port.
+            async with websockets.connect(f"ws://127.0.0.1:{port}") as ws:
+                await asyncio.sleep(0.1)
+                self.assertIn("capsule_ws_clients 1", REGISTRY.render())
+                await ws.recv()
+            task.cancel()
+            return resp.headers["Content-Type"], body
+
+        content_type, body = asyncio.run(scenario())
+        self.assertEqual(content_type, PROMETHEUS_CONTENT_TYPE)
+        self.assertIn("# TYPE capsule_ws_broadcast_seconds summary", body)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
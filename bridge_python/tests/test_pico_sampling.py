@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Tests PicoHandler - acquisition ADC par blocs (picod simulé), filtres throttle,
+calibration ADC."""
+
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pico_handler
+from adc_calibration import CalibrationProfile, Calibrator, ChannelCalibration, build_lut
+from pico_handler import PicoHandler
+from throttle_filter import EmaFilter, OneEuroFilter, build_filter
+
+
+class FakePico:
+    """adc_read() d'un potentiomètre bruité ; connexion liée à son thread."""
+
+    def __init__(self, device):
+        self.owner = threading.current_thread()
+        self.reads = {0: 0, 1: 0}
+        self.values = {0: 2000, 1: 500}
+
+    def adc_read(self, ch):
+        assert threading.current_thread() is self.owner, "picod hors de son thread"
+        self.reads[ch] += 1
+        # Pic parasite une lecture sur dix : la médiane doit l'ignorer.
+        spike = 4095 if self.reads[ch] % 10 == 0 else 0
+        return 0, ch, max(self.values[ch], spike)
+
+    def close(self):
+        pass
+
+
+class FakePicod:
+    pico = FakePico
+
+
+class TestBlockSampling(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(pico_handler, "picod", FakePicod)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pico = PicoHandler(sampling="block", sample_hz=500, channels=[1], reduce="median")
+        self.addCleanup(self.pico.disconnect)
+
+    def test_reader_thread_samples_all_channels(self):
+        self.assertTrue(self.pico.connect())
+        time.sleep(0.2)
+        self.assertEqual(self.pico.read_raw(), 2000)
+        self.assertEqual(self.pico.read_raw(1), 500)
+        # Bien plus d'échantillons qu'un adc_read par tick gpio_loop (20 Hz).
+        self.assertGreater(self.pico.pico.reads[0], 40)
+        self.assertEqual(self.pico.pico.reads[0], self.pico.pico.reads[1])
+
+    def test_empty_block_keeps_last_value(self):
+        self.assertTrue(self.pico.connect())
+        time.sleep(0.05)
+        first = self.pico.read_raw()
+        self.pico.disconnect()
+        self.assertEqual(self.pico._take_block(0), first)
+
+
+class TestThrottleFilter(unittest.TestCase):
+    @staticmethod
+    def _ticks_to_reach(filt, level: float, hz: float = 20.0) -> int:
+        filt.update(0.0, 0.0)
+        for i in range(1, 100):
+            if filt.update(1.0, i / hz) >= level:
+                return i
+        return 100
+
+    def test_one_euro_lags_less_than_ema_on_slam(self):
+        self.assertLess(self._ticks_to_reach(OneEuroFilter(), 0.9),
+                        self._ticks_to_reach(EmaFilter(0.25), 0.9))
+
+    def test_one_euro_smooths_noise_at_rest(self):
+        filt = OneEuroFilter()
+        out = [filt.update(0.5 + (0.004 if i % 2 else -0.004), i / 20.0) for i in range(100)]
+        self.assertLess(max(out[50:]) - min(out[50:]), 0.004)
+
+    def test_build_filter_from_config(self):
+        self.assertIsInstance(build_filter({"smoothing_alpha": 0.3}), EmaFilter)
+        filt = build_filter({"filter": {"type": "one_euro", "beta": 10}})
+        self.assertEqual(filt.beta, 10.0)
+        with self.assertRaises(ValueError):
+            build_filter({"filter": {"type": "kalman"}})
+
+
+class TestCalibration(unittest.TestCase):
+    def test_lut_ends_and_monotonic(self):
+        cal = ChannelCalibration(raw_min=180, raw_max=3900, deadzone_low=0.02,
+                                 deadzone_high=0.02, expo=0.3, points=[[0.5, 0.4]])
+        lut = build_lut(cal)
+        self.assertEqual(len(lut), 4096)
+        self.assertEqual(lut[0], 0.0)
+        self.assertEqual(lut[200], 0.0)
+        self.assertEqual(lut[3880], 1.0)
+        self.assertEqual(lut[4095], 1.0)
+        self.assertTrue(all(a <= b for a, b in zip(lut, lut[1:])))
+
+    def test_profile_round_trip(self):
+        profile = CalibrationProfile("panneau-A", {0: ChannelCalibration(120, 3950, points=[[0.5, 0.3]])})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "throttle.json"
+            profile.save(path)
+            loaded = CalibrationProfile.load(path)
+        self.assertEqual(loaded.panel, "panneau-A")
+        self.assertEqual(loaded.channels[0].to_dict(), profile.channels[0].to_dict())
+
+    def test_calibrator_ignores_spikes(self):
+        cal = Calibrator()
+        # Levier tenu en butée puis balayé : pics hors course ignorés.
+        for raw in [150] * 200 + [150 + (3800 * i) // 999 for i in range(1000)] + [3950] * 200:
+            cal.feed(raw)
+        cal.feed(0)
+        cal.feed(4095)
+        self.assertEqual(cal.range(), (150, 3950))
+        cal.add_point([2050, 2049, 2051], 0.3)
+        self.assertEqual(len(cal.calibration().points), 1)
+
+    def test_handler_uses_profile_lut(self):
+        pico = PicoHandler(calibration=ChannelCalibration(raw_min=200, raw_max=3800,
+                                                          deadzone_low=0.0, deadzone_high=0.0))
+        pico.read_throttle_raw = lambda: 2000 / 4095.0
+        self.assertAlmostEqual(pico.get_throttle(), 0.5)
+        pico.read_throttle_raw = lambda: 3850 / 4095.0
+        self.assertEqual(pico.get_throttle(), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
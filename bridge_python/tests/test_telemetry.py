@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Tests du pipeline télémétrie - pas de KSP ni de hardware requis."""
+
+import asyncio
+import json
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import telemetry_binary
+from flight_recorder import FlightLog, FlightRecorder, ReplaySource, replay
+from telemetry_delta import DeltaEncoder
+from telemetry_history import TelemetryHistory
+from telemetry_snapshot import TelemetrySnapshot
+from websocket_server import WebSocketServer
+
+
+class TestTelemetrySnapshot(unittest.TestCase):
+    def test_immutable(self):
+        snap = TelemetrySnapshot(1, {"connected": True, "altitude": 10.0})
+        with self.assertRaises(AttributeError):
+            snap.seq = 2
+        self.assertTrue(snap.connected)
+        self.assertEqual(snap["altitude"], 10.0)
+
+    def test_disconnected(self):
+        snap = TelemetrySnapshot.disconnected(5)
+        self.assertFalse(snap.connected)
+        self.assertEqual(snap.data, {"connected": False})
+
+    def test_changed_since(self):
+        snap = TelemetrySnapshot(7, {"connected": False})
+        self.assertFalse(snap.changed_since(7))
+        self.assertTrue(snap.changed_since(6))
+
+
+
+class TestDeltaEncoder(unittest.TestCase):
+    def setUp(self):
+        self.enc = DeltaEncoder(keyframe_interval_s=3600.0)
+        self.base = {
+            "connected": True,
+            "altitude": 100.0,
+            "speed": 10.0,
+            "stages": [{"stage": 3, "fuel_percent": 50.0, "attached": True}],
+        }
+
+    def test_first_update_is_keyframe(self):
+        frame = self.enc.update(self.base)
+        self.assertEqual(frame["type"], "key")
+        self.assertEqual(frame["seq"], 1)
+        self.assertEqual(frame["data"], self.base)
+
+    def test_below_threshold_is_dropped(self):
+        self.enc.update(self.base)
+        self.assertIsNone(self.enc.update({**self.base, "altitude": 100.4}))
+
+    def test_delta_contains_only_changed_fields(self):
+        self.enc.update(self.base)
+        stages = [{"stage": 3, "fuel_percent": 49.5, "attached": True}]
+        frame = self.enc.update({**self.base, "altitude": 102.0, "stages": stages})
+        self.assertEqual(frame["type"], "delta")
+        self.assertEqual(frame["seq"], 2)
+        self.assertEqual(set(frame["changes"]), {"altitude", "stages"})
+        self.assertEqual(self.enc.keyframe()["data"]["altitude"], 102.0)
+
+    def test_disconnect_sends_keyframe(self):
+        self.enc.update(self.base)
+        frame = self.enc.update({"connected": False})
+        self.assertEqual(frame["type"], "key")
+        self.assertEqual(frame["data"], {"connected": False})
+
+    def test_periodic_keyframe_while_changing(self):
+        enc = DeltaEncoder(keyframe_interval_s=0.05)
+        enc.update(self.base)
+        types = []
+        end = time.monotonic() + 0.2
+        altitude = 100.0
+        while time.monotonic() < end:
+            altitude += 10.0  # change à chaque tick, comme en vol
+            types.append(enc.update({**self.base, "altitude": altitude})["type"])
+            time.sleep(0.01)
+        self.assertIn("key", types)
+        self.assertEqual(types[0], "delta")
+        time.sleep(0.06)
+        key = enc.update({**self.base, "altitude": altitude + 20.0})
+        self.assertEqual(key["type"], "key")
+        self.assertEqual(key["data"]["altitude"], altitude + 20.0)
+        self.assertEqual(key["seq"], enc.seq)
+
+
+
+class TestBinaryFrame(unittest.TestCase):
+    def test_roundtrip(self):
+        data = {
+            "connected": True, "altitude": 1234.5, "speed": 80.25,
+            "apoapsis": 680000.0, "periapsis": 12.0, "current_stage": 3,
+            "engines_active": True, "ascending": False,
+            "stages": [
+                {"stage": 3, "fuel_percent": 62.5, "attached": True},
+                {"stage": 2, "fuel_percent": 100.0, "attached": False},
+            ],
+        }
+        frame = telemetry_binary.encode(data, seq=42)
+        self.assertEqual(len(frame), telemetry_binary.HEADER_SIZE + 2 * telemetry_binary.STAGE_SIZE)
+        out = telemetry_binary.decode(frame)
+        self.assertEqual(out["seq"], 42)
+        self.assertEqual(out["altitude"], 1234.5)
+        self.assertAlmostEqual(out["speed"], 80.25)
+        self.assertEqual(out["current_stage"], 3)
+        self.assertTrue(out["engines_active"])
+        self.assertFalse(out["ascending"])
+        self.assertEqual(out["stages"][1], {"stage": 2, "fuel_percent": 100.0, "attached": False})
+
+    def test_disconnected(self):
+        out = telemetry_binary.decode(telemetry_binary.encode({"connected": False}))
+        self.assertEqual(out, {"seq": 0, "connected": False})
+
+
+class TestTelemetryHistory(unittest.TestCase):
+    def _fill(self, history, n, t0):
+        for i in range(n):
+            history.append(TelemetrySnapshot(i + 1, {
+                "connected": True,
+                "altitude": float(i),
+                "stages": [{"stage": 3, "fuel_percent": 100.0 - i, "attached": True}],
+            }, timestamp=t0 + i))
+
+    def test_ring_keeps_last_samples(self):
+        history = TelemetryHistory(window_s=10, sample_hz=1)
+        self._fill(history, 25, time.time() - 24)
+        self.assertEqual(len(history), 10)
+        series = history.query(["altitude", "fuel_percent"], points=100)["series"]
+        self.assertEqual(series["altitude"]["v"], [float(i) for i in range(15, 25)])
+        self.assertEqual(series["fuel_percent"]["v"][-1], 76.0)
+
+    def test_downsample_keeps_extremes(self):
+        history = TelemetryHistory(window_s=1000, sample_hz=1)
+        self._fill(history, 1000, time.time() - 999)
+        for method in ("minmax", "lttb"):
+            values = history.query(["altitude"], points=50, method=method)["series"]["altitude"]["v"]
+            self.assertLessEqual(len(values), 50)
+            self.assertEqual(values[0], 0.0)
+            self.assertEqual(values[-1], 999.0)
+
+    def test_decimation_and_disconnected(self):
+        history = TelemetryHistory(window_s=10, sample_hz=1)
+        t = time.time()
+        history.append(TelemetrySnapshot(1, {"connected": True}, timestamp=t))
+        history.append(TelemetrySnapshot(2, {"connected": True}, timestamp=t + 0.2))
+        history.append(TelemetrySnapshot.disconnected(3))
+        self.assertEqual(len(history), 1)
+
+    def test_server_history_bad_request(self):
+        class Session:
+            addr = "test"
+
+            def __init__(self):
+                self.replies = []
+
+            def reply(self, frame):
+                self.replies.append(json.loads(frame))
+
+        history = TelemetryHistory(window_s=10, sample_hz=1)
+        self._fill(history, 5, time.time() - 4)
+        server = WebSocketServer(history=history)
+        session = Session()
+        asyncio.run(server._answer_history(
+            session, {"cmd": "history", "fields": ["altitude", {"x": 1}, ["y"]], "id": 1}))
+        asyncio.run(server._answer_history(session, {"cmd": "history", "points": "x", "id": 2}))
+        ok, bad = session.replies
+        self.assertEqual(ok["id"], 1)
+        self.assertEqual(list(ok["series"]), ["altitude"])
+        self.assertEqual((bad["type"], bad["id"]), ("history", 2))
+        self.assertIn("error", bad)
+
+
+class TestFlightRecorder(unittest.TestCase):
+    def test_record_and_replay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "vol.caplog"
+            rec = FlightRecorder(path, flush_s=0.05)
+            rec.start()
+            rec.record_snapshot(TelemetrySnapshot(1, {
+                "connected": True, "altitude": 1234.5, "current_stage": 2,
+                "stages": [{"stage": 2, "fuel_percent": 50.0, "attached": True}],
+                "sas": True, "rcs": False, "gear": True, "brakes": True,
+                "lights": False, "abort": False,
+                "action_groups": [False, True] + [False] * 7 + [True],
+            }))
+            rec.record_input("lever", 16, "SAS", 1.0)
+            rec.record_snapshot(TelemetrySnapshot.disconnected(2))
+            rec.stop()
+            # Enregistrement tronqué (arrêt brutal) : ignoré à la lecture.
+            with open(path, "ab") as f:
+                f.write(b"\x01\x00\x40")
+
+            source = ReplaySource()
+            inputs = []
+            with FlightLog(path) as log:
+                records = list(log)
+                self.assertEqual(replay(log, source, on_input=inputs.append, speed=0), 3)
+            self.assertEqual(records[0].item["altitude"], 1234.5)
+            self.assertEqual(records[0].item.seq, 1)
+            self.assertIs(records[0].item.get("sas"), True)
+            self.assertIs(records[0].item.get("rcs"), False)
+            self.assertIs(records[0].item.get("gear"), True)
+            self.assertEqual(
+                records[0].item["action_groups"], [False, True] + [False] * 7 + [True])
+            self.assertIsNone(records[2].item.get("sas"))
+            self.assertEqual(inputs[0].source, "lever")
+            self.assertEqual(inputs[0].name, "SAS")
+            self.assertFalse(source.snapshot().connected)
+
+    def test_attach_requires_all_fields(self):
+        class Source(ReplaySource):
+            def __init__(self):
+                super().__init__()
+                self.requirements = {}
+
+            def require_fields(self, owner, fields):
+                self.requirements[owner] = fields
+
+            def release_fields(self, owner):
+                self.requirements.pop(owner, None)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Source()
+            rec = FlightRecorder(Path(tmp) / "vol.caplog", flush_s=0.05)
+            rec.start()
+            rec.attach(source)
+            self.assertEqual(source.requirements, {"recorder": None})
+            source.publish(TelemetrySnapshot(1, {"connected": True, "altitude": 10.0}))
+            rec.stop()
+            self.assertEqual(source.requirements, {})
+            with FlightLog(rec.path) as log:
+                self.assertEqual([r.item["altitude"] for r in log], [10.0])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
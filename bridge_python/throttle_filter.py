@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Throttle Filter - Étage de filtrage de la consigne throttle (0..1).
+
+- EmaFilter : EMA à alpha fixe (comportement historique) : lisse bien au
+  repos mais retarde les mouvements rapides (~150 ms à 20 Hz, alpha 0.25).
+- OneEuroFilter : filtre « 1 € » (Casiez et al., CHI 2012) : passe-bas
+  dont la fréquence de coupure augmente avec la vitesse du signal ; fort
+  lissage au repos, peu de retard quand on pousse le levier d'un coup.
+
+Les filtres reçoivent (valeur, horodatage en s) : la fréquence d'appel
+peut varier (cadence adaptative de gpio_loop). build_filter() construit le
+filtre décrit par la section `throttle` de config.json ;
+bench/throttle_filters.py compare les filtres sur des traces ADC.
+"""
+
+import math
+from typing import Dict, Optional
+
+
+class EmaFilter:
+    """Moyenne exponentielle à alpha fixe (par échantillon)."""
+
+    def __init__(self, alpha: float = 0.25):
+        self.alpha = alpha
+        self.value: Optional[float] = None
+
+    def update(self, x: float, t: float) -> float:
+        if self.value is None:
+            self.value = x
+        else:
+            self.value = self.alpha * x + (1.0 - self.alpha) * self.value
+        return self.value
+
+    def reset(self) -> None:
+        self.value = None
+
+    def __repr__(self) -> str:
+        return f"ema(alpha={self.alpha:g})"
+
+
+def _smoothing(cutoff_hz: float, dt: float) -> float:
+    """Alpha d'un passe-bas du premier ordre de coupure `cutoff_hz` au pas dt."""
+    tau = 1.0 / (2.0 * math.pi * cutoff_hz)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """Filtre 1 € : coupure = min_cutoff + beta × |vitesse filtrée|.
+
+    - min_cutoff (Hz) : lissage au repos (plus bas = moins de gigue) ;
+    - beta : réactivité aux mouvements (plus haut = moins de retard) ;
+    - d_cutoff (Hz) : lissage de l'estimation de vitesse.
+    """
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 20.0, d_cutoff: float = 5.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value: Optional[float] = None
+        self._dx = 0.0
+        self._t: Optional[float] = None
+
+    def update(self, x: float, t: float) -> float:
+        if self.value is None or self._t is None:
+            self.value, self._t, self._dx = x, t, 0.0
+            return x
+        dt = t - self._t
+        if dt <= 0.0:
+            return self.value
+        self._t = t
+        dx = (x - self.value) / dt
+        self._dx += _smoothing(self.d_cutoff, dt) * (dx - self._dx)
+        cutoff = self.min_cutoff + self.beta * abs(self._dx)
+        self.value += _smoothing(cutoff, dt) * (x - self.value)
+        return self.value
+
+    def reset(self) -> None:
+        self.value = None
+        self._t = None
+        self._dx = 0.0
+
+    def __repr__(self) -> str:
+        return f"one_euro(min_cutoff={self.min_cutoff:g},beta={self.beta:g},d_cutoff={self.d_cutoff:g})"
+
+
+FILTERS = {"ema": EmaFilter, "one_euro": OneEuroFilter}
+
+
+def create_filter(kind: str, **params: float):
+    try:
+        cls = FILTERS[kind]
+    except KeyError:
+        raise ValueError(f"Filtre throttle inconnu: {kind}") from None
+    return cls(**params)
+
+
+def build_filter(throttle_cfg: Dict):
+    """Filtre décrit par la section `throttle` :
+    "filter": {"type": "one_euro", "min_cutoff": 1.0, "beta": 20.0}
+    Sans `filter`, EMA à `smoothing_alpha` (comportement historique)."""
+    fcfg = dict(throttle_cfg.get("filter") or {})
+    kind = fcfg.pop("type", "ema")
+    if kind == "ema" and "alpha" not in fcfg:
+        fcfg["alpha"] = float(throttle_cfg.get("smoothing_alpha", 0.25))
+    return create_filter(kind, **{k: float(v) for k, v in fcfg.items()})
+
+
+def parse_spec(spec: str):
+    """"one_euro:min_cutoff=1,beta=5" → filtre (outils en ligne de commande)."""
+    kind, _, args = spec.partition(":")
+    params = {}
+    for item in filter(None, args.split(",")):
+        key, _, value = item.partition("=")
+        params[key.strip()] = float(value)
+    return create_filter(kind.strip(), **params)
@@ -3,13 +3,54 @@
 WebSocket Server - Diffuse la télémétrie kRPC aux clients Godot.
 
 Architecture : une seule tâche broadcast lit la télémétrie à la cadence
-configurée et l'envoie à tous les clients simultanément (au lieu d'une
-boucle par client).
+configurée, encode chaque format une fois, et dépose la trame dans la
+boîte d'envoi de chaque client. La télémétrie est lue via l'instantané
+publié par KRPCHandler : jamais de verrou kRPC dans la boucle asyncio, et
+le JSON n'est resérialisé que si l'instantané a changé.
+
+Chaque client a sa propre tâche d'envoi et une boîte bornée à une trame :
+un client lent ne retarde pas les autres, ses trames périmées sont
+remplacées par la plus récente, chaque envoi a un timeout et un client
+qui les accumule est déconnecté.
+
+Protocoles (choisis par le client via {"cmd": "hello", "protocol": N}) :
+- v1 (défaut) : document JSON complet à chaque tick ;
+- v2 : keyframe puis deltas quantifiés (voir telemetry_delta), le client
+  peut demander une keyframe avec {"cmd": "resync"}.
+
+Un client qui négocie le sous-protocole WebSocket `capsule.bin.v1` reçoit
+à la place des trames binaires à disposition fixe (voir telemetry_binary).
+
+Abonnements : un client JSON peut envoyer
+{"cmd": "subscribe", "groups": [{"fields": [...], "hz": N}, ...]} pour ne
+recevoir que ces champs, chaque groupe à sa cadence, dans des trames
+{"type": "sub", "seq", "data"} ; {"cmd": "unsubscribe"} revient au flux
+complet. Les streams kRPC ne couvrent que l'union des champs demandés.
+
+Historique : {"cmd": "history", "fields": [...], "window_s": N, "points": P}
+renvoie une réponse {"type": "history", ...} sous-échantillonnée (voir
+telemetry_history), ou {"type": "history", "error": ...} si la requête est
+invalide. Les réponses passent avant la télémétrie et ne sont
+jamais remplacées par elle.
+
+Métriques : une requête HTTP GET sur `metrics_path` (défaut /metrics) du
+même port reçoit le registre metrics.py au format texte Prometheus au lieu
+de la poignée de main WebSocket.
 """
 
 import asyncio
 import json
 import sys
+import time
+from collections import deque
+from http import HTTPStatus
+from typing import Deque, Dict, List, Optional, Union
+
+import telemetry_binary
+from loop_scheduler import DeadlineScheduler
+from metrics import REGISTRY
+from telemetry_delta import DeltaEncoder
+from telemetry_snapshot import TelemetrySnapshot
 
 try:
     import websockets
@@ -17,65 +58,463 @@ except ImportError:
     print("✗ Module 'websockets' requis: pip install websockets")
     sys.exit(1)
 
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_BROADCAST_TIME = REGISTRY.histogram(
+    "capsule_ws_broadcast_seconds", "Durée d'un tick WebSocketServer.broadcast_once"
+)
+_DROPPED_FRAMES = REGISTRY.counter(
+    "capsule_ws_dropped_frames_total", "Trames remplacées avant envoi (client lent)"
+)
+
+
+class SubscriptionGroup:
+    """Groupe de champs envoyés ensemble à une cadence donnée."""
+
+    __slots__ = ("fields", "interval", "next_due", "last_seq")
+
+    def __init__(self, fields, hz: float):
+        self.fields = tuple(fields)
+        self.interval = 1.0 / hz
+        self.next_due = 0.0
+        self.last_seq: Optional[int] = None
+
+
+def _parse_groups(msg: Dict, max_hz: float) -> Optional[List[SubscriptionGroup]]:
+    """Lit {"groups": [...]} ou la forme courte {"fields": [...], "hz": N}."""
+    raw = msg.get("groups")
+    if raw is None:
+        raw = [{"fields": msg.get("fields", []), "hz": msg.get("hz", 1)}]
+    if not isinstance(raw, list):
+        return None
+    groups = []
+    for g in raw:
+        if not isinstance(g, dict) or not isinstance(g.get("fields"), list):
+            return None
+        try:
+            hz = max(0.1, min(max_hz, float(g.get("hz", 1))))
+        except (TypeError, ValueError):
+            return None
+        fields = [str(f) for f in g["fields"]]
+        if fields:
+            groups.append(SubscriptionGroup(fields, hz))
+    return groups
+
+
+class ClientSession:
+    """Un client WebSocket : boîte d'envoi d'une trame, tâche d'envoi, stats."""
+
+    def __init__(self, websocket, send_timeout_s: float, max_send_timeouts: int):
+        self.ws = websocket
+        self.addr = getattr(websocket, "remote_address", "?")
+        self.send_timeout_s = send_timeout_s
+        self.max_send_timeouts = max_send_timeouts
+        # Version de protocole JSON (1 = complet, 2 = deltas).
+        self.protocol = 1
+        self.binary = getattr(websocket, "subprotocol", None) == telemetry_binary.SUBPROTOCOL
+        # Abonnements (None = flux complet).
+        self.groups: Optional[List[SubscriptionGroup]] = None
+
+        self._frame: Optional[Union[str, bytes]] = None
+        # Réponses aux requêtes (historique) : jamais remplacées.
+        self._replies: Deque[str] = deque(maxlen=8)
+        self._wakeup = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self._consecutive_timeouts = 0
+
+    @property
+    def pending(self) -> bool:
+        return self._frame is not None
+
+    def offer(self, frame: Union[str, bytes]) -> None:
+        """Dépose une trame sans attendre ; remplace celle pas encore envoyée."""
+        if self._frame is not None:
+            self.dropped += 1
+            _DROPPED_FRAMES.inc()
+        self._frame = frame
+        self._wakeup.set()
+
+    def reply(self, frame: str) -> None:
+        """Dépose une réponse, envoyée avant la prochaine trame de télémétrie."""
+        self._replies.append(frame)
+        self._wakeup.set()
+
+    async def sender(self) -> None:
+        """Tâche d'envoi : une trame à la fois, avec timeout."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._replies:
+                frame = self._replies.popleft()
+                if self._replies or self._frame is not None:
+                    self._wakeup.set()
+            else:
+                frame, self._frame = self._frame, None
+            if frame is None:
+                continue
+            try:
+                await asyncio.wait_for(self.ws.send(frame), self.send_timeout_s)
+            except websockets.ConnectionClosed:
+                return
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self._consecutive_timeouts += 1
+                if self._consecutive_timeouts >= self.max_send_timeouts:
+                    print(f"[WS] Client trop lent, déconnexion: {self.addr}")
+                    await self.ws.close(1013, "client trop lent")
+                    return
+                continue
+            self._consecutive_timeouts = 0
+            self.sent += 1
+
+    def stats(self) -> Dict:
+        latency = getattr(self.ws, "latency", 0.0) or 0.0
+        if self.binary:
+            fmt = "binary"
+        elif self.groups is not None:
+            fmt = "json-sub"
+        else:
+            fmt = f"json-v{self.protocol}"
+        return {
+            "addr": str(self.addr),
+            "format": fmt,
+            "queue_depth": 1 if self.pending else 0,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "timeouts": self.timeouts,
+            "rtt_ms": latency * 1000.0,
+        }
+
 
 class WebSocketServer:
     """Serveur WebSocket broadcast-only pour la télémétrie."""
 
-    def __init__(self, krpc=None, host: str = "0.0.0.0", port: int = 8080, update_hz: int = 10):
+    def __init__(
+        self,
+        krpc=None,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        update_hz: int = 10,
+        delta_cfg: Optional[Dict] = None,
+        send_timeout_s: float = 0.5,
+        max_send_timeouts: int = 3,
+        ping_interval_s: float = 5.0,
+        max_client_hz: float = 60.0,
+        history=None,
+        metrics_path: Optional[str] = "/metrics",
+    ):
         self.krpc = krpc
+        # TelemetryHistory optionnel pour les requêtes "history".
+        self.history = history
         self.host = host
         self.port = port
         self.interval = 1.0 / max(1, update_hz)
-        self.clients = set()
+        # Cadence max accordée à un groupe d'abonnement.
+        self.max_client_hz = max_client_hz
+        self._tick_interval = self.interval
+        self._scheduler = DeadlineScheduler("ws", 1.0 / self._tick_interval)
+        self._next_full_due = 0.0
+        self.send_timeout_s = send_timeout_s
+        self.max_send_timeouts = max_send_timeouts
+        # Pings de keepalive websockets : servent aussi à mesurer le RTT.
+        self.ping_interval_s = ping_interval_s
+        # Chemin HTTP de l'export Prometheus (None = désactivé).
+        self.metrics_path = metrics_path
+        self.clients: Dict[object, ClientSession] = {}
+        REGISTRY.gauge("capsule_ws_clients", "Clients WebSocket connectés", fn=lambda: len(self.clients))
+        self._last_seq: Optional[int] = None
+        self._last_msg = ""
+        self._bin_seq: Optional[int] = None
+        self._bin_frame = b""
+
+        delta_cfg = delta_cfg or {}
+        self._delta = DeltaEncoder(
+            thresholds=delta_cfg.get("thresholds"),
+            keyframe_interval_s=float(delta_cfg.get("keyframe_interval_s", 5.0)),
+        )
+        self._delta_snap_seq: Optional[int] = None
 
     # ---- Gestion clients --------------------------------------------
 
     async def _handler(self, websocket):
-        self.clients.add(websocket)
-        addr = getattr(websocket, "remote_address", "?")
-        print(f"[WS] Client connecté: {addr}")
+        session = ClientSession(websocket, self.send_timeout_s, self.max_send_timeouts)
+        self.clients[websocket] = session
+        self._update_requirements()
+        sender = asyncio.create_task(session.sender())
+        print(f"[WS] Client connecté: {session.addr}")
         try:
-            async for _ in websocket:  # on ignore les messages entrants
-                pass
+            async for message in websocket:
+                self._on_message(session, message)
         except websockets.ConnectionClosed:
             pass
         finally:
-            self.clients.discard(websocket)
-            print(f"[WS] Client déconnecté: {addr}")
+            sender.cancel()
+            self.clients.pop(websocket, None)
+            self._update_requirements()
+            print(
+                f"[WS] Client déconnecté: {session.addr} "
+                f"(envoyées={session.sent}, perdues={session.dropped}, "
+                f"timeouts={session.timeouts})"
+            )
+
+    @staticmethod
+    def _select_subprotocol(_connection, subprotocols):
+        """Binaire si le client le propose, sinon JSON (pas de sous-protocole)."""
+        if telemetry_binary.SUBPROTOCOL in subprotocols:
+            return telemetry_binary.SUBPROTOCOL
+        return None
+
+    def _on_message(self, session: ClientSession, message) -> None:
+        """Messages de contrôle client : hello (choix du protocole), resync,
+        subscribe / unsubscribe, history.
+        """
+        try:
+            msg = json.loads(message)
+        except (TypeError, ValueError):
+            return
+        if not isinstance(msg, dict):
+            return
+        cmd = msg.get("cmd")
+        if cmd == "hello":
+            try:
+                session.protocol = max(1, min(2, int(msg.get("protocol", 1))))
+            except (TypeError, ValueError):
+                session.protocol = 1
+            if session.protocol >= 2:
+                session.offer(json.dumps(self._delta.keyframe()))
+        elif cmd == "resync" and session.protocol >= 2:
+            session.offer(json.dumps(self._delta.keyframe()))
+        elif cmd == "subscribe" and not session.binary:
+            groups = _parse_groups(msg, self.max_client_hz)
+            if groups is None:
+                print(f"[WS] Abonnement invalide de {session.addr}: {msg}")
+                return
+            session.groups = groups
+            self._update_requirements()
+            print(
+                f"[WS] Abonnement {session.addr}: "
+                + ", ".join(f"{list(g.fields)}@{1.0 / g.interval:g}Hz" for g in groups)
+            )
+        elif cmd == "unsubscribe":
+            session.groups = None
+            self._update_requirements()
+        elif cmd == "history" and self.history is not None:
+            asyncio.ensure_future(self._answer_history(session, msg))
+
+    async def _answer_history(self, session: ClientSession, msg: Dict) -> None:
+        """Requête d'historique, calculée hors de la boucle asyncio.
+
+        Tâche lancée sans attente : toute erreur est renvoyée au client
+        sous la forme {"type": "history", "error": ...} au lieu d'être perdue.
+        """
+        fields = msg.get("fields")
+        if fields is not None:
+            if not isinstance(fields, list):
+                fields = [fields]
+            # Seuls les noms de champs (chaînes) sont retenus.
+            fields = [f for f in fields if isinstance(f, str)]
+        try:
+            window_s = float(msg["window_s"]) if "window_s" in msg else None
+            points = int(msg.get("points", 300))
+            method = "lttb" if msg.get("method") == "lttb" else "minmax"
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                None, self.history.query, fields, window_s, points, method
+            )
+        except Exception as e:
+            print(f"[WS] Requête d'historique invalide de {session.addr}: {e}")
+            result = {"error": str(e)}
+        result["type"] = "history"
+        if "id" in msg:
+            result["id"] = msg["id"]
+        session.reply(json.dumps(result))
+
+    def _update_requirements(self) -> None:
+        """Recalcule la cadence du tick et les champs à streamer côté kRPC."""
+        intervals = [self.interval]
+        fields = set()
+        full = False
+        for session in self.clients.values():
+            if session.groups is None:
+                full = True
+            else:
+                for g in session.groups:
+                    fields.update(g.fields)
+                    intervals.append(g.interval)
+        tick_interval = min(intervals)
+        if tick_interval != self._tick_interval:
+            self._tick_interval = tick_interval
+            self._scheduler.set_hz(1.0 / tick_interval)
+        if self.krpc is not None and hasattr(self.krpc, "require_fields"):
+            self.krpc.require_fields("websocket", None if full else fields)
+
+    def client_stats(self) -> List[Dict]:
+        """Stats par client (profondeur de file, trames perdues, RTT...)."""
+        return [session.stats() for session in list(self.clients.values())]
 
     # ---- Broadcast ---------------------------------------------------
 
     def _build_payload(self) -> dict:
-        if not self.krpc or not self.krpc.connected:
+        if not self.krpc:
             return {"connected": False}
-        data = self.krpc.get_telemetry()
-        data["connected"] = True
-        data["ascending"] = data.get("vertical_speed", 0) > 0
-        return data
+        return self.krpc.snapshot().data
+
+    def _encode_payload(self) -> str:
+        """JSON du dernier instantané, mis en cache par numéro de séquence."""
+        if not self.krpc:
+            return json.dumps(self._build_payload())
+        snap = self.krpc.snapshot()
+        if snap.seq != self._last_seq:
+            self._last_msg = json.dumps(snap.data)
+            self._last_seq = snap.seq
+        return self._last_msg
+
+    def _encode_binary(self) -> bytes:
+        """Trame binaire du dernier instantané, mise en cache par seq."""
+        if not self.krpc:
+            return telemetry_binary.encode({"connected": False})
+        snap = self.krpc.snapshot()
+        if snap.seq != self._bin_seq:
+            self._bin_frame = telemetry_binary.encode(snap.data, snap.seq)
+            self._bin_seq = snap.seq
+        return self._bin_frame
+
+    def _encode_delta(self) -> Optional[str]:
+        """Trame v2 du tick (delta ou keyframe, périodique même si les
+        données changent à chaque tick), None si rien à envoyer."""
+        frame = None
+        if self.krpc:
+            snap = self.krpc.snapshot()
+            if snap.seq != self._delta_snap_seq:
+                self._delta_snap_seq = snap.seq
+                frame = self._delta.update(snap.data)
+        if frame is None:
+            frame = self._delta.periodic_keyframe()
+        return json.dumps(frame) if frame is not None else None
+
+    def _snapshot(self):
+        return self.krpc.snapshot() if self.krpc else TelemetrySnapshot.disconnected()
+
+    @staticmethod
+    def _subscription_frame(
+        session: ClientSession, snap, now: float, horizon: float
+    ) -> Optional[str]:
+        """Trame des groupes arrivés à échéance dont l'instantané a changé."""
+        data = {}
+        for g in session.groups:
+            if horizon < g.next_due:
+                continue
+            g.next_due += g.interval
+            if g.next_due < now:
+                g.next_due = now + g.interval
+            if g.last_seq == snap.seq:
+                continue
+            g.last_seq = snap.seq
+            for field in g.fields:
+                if field in snap.data:
+                    data[field] = snap.data[field]
+        if not data:
+            return None
+        data["connected"] = snap.connected
+        return json.dumps({"type": "sub", "seq": snap.seq, "data": data})
+
+    def broadcast_once(self, now: Optional[float] = None) -> None:
+        """Encode le tick courant (une fois par format) et le dépose chez
+        chaque client. Ne bloque jamais : les envois sont faits par les
+        tâches ClientSession.sender.
+
+        Le tick tourne à la cadence du groupe d'abonnement le plus rapide ;
+        les clients en flux complet ne sont servis qu'à update_hz.
+        """
+        sessions = list(self.clients.values())
+        if not sessions:
+            return
+        t0 = time.perf_counter()
+        if now is None:
+            now = time.monotonic()
+        # Tolérance d'un demi-tick : un réveil légèrement en avance ne doit
+        # pas faire sauter une échéance.
+        horizon = now + self._tick_interval / 2
+        full_due = horizon >= self._next_full_due
+        if full_due:
+            self._next_full_due += self.interval
+            if self._next_full_due < now:
+                self._next_full_due = now + self.interval
+        json_msg = bin_msg = None
+        delta_msg = None
+        delta_done = False
+        keyframe_msg = None
+        snap = None
+        for session in sessions:
+            if session.groups is not None and not session.binary:
+                if snap is None:
+                    snap = self._snapshot()
+                frame = self._subscription_frame(session, snap, now, horizon)
+                if frame is not None:
+                    session.offer(frame)
+                continue
+            if not full_due:
+                continue
+            if session.binary:
+                if bin_msg is None:
+                    bin_msg = self._encode_binary()
+                session.offer(bin_msg)
+            elif session.protocol >= 2:
+                if not delta_done:
+                    delta_msg = self._encode_delta()
+                    delta_done = True
+                if delta_msg is None:
+                    continue
+                if session.pending:
+                    # Un delta ne peut pas remplacer un autre delta non
+                    # envoyé : on remplace par une keyframe de l'état courant.
+                    if keyframe_msg is None:
+                        keyframe_msg = json.dumps(self._delta.keyframe())
+                    session.offer(keyframe_msg)
+                else:
+                    session.offer(delta_msg)
+            else:
+                if json_msg is None:
+                    json_msg = self._encode_payload()
+                session.offer(json_msg)
+        _BROADCAST_TIME.observe(time.perf_counter() - t0)
 
     async def _broadcast_loop(self):
-        while True:
-            if self.clients:
-                msg = json.dumps(self._build_payload())
-                dead = set()
-                for ws in self.clients:
-                    try:
-                        await ws.send(msg)
-                    except Exception:
-                        dead.add(ws)
-                self.clients -= dead
-            await asyncio.sleep(self.interval)
+        # Échéances absolues : la cadence ne dérive pas avec la durée du tick.
+        await self._scheduler.run_async(self.broadcast_once)
+
+    # ---- Métriques ---------------------------------------------------
+
+    def _process_request(self, connection, request):
+        """Sert GET metrics_path en HTTP ; sinon poursuit la poignée de main."""
+        if not self.metrics_path or request.path.split("?", 1)[0] != self.metrics_path:
+            return None
+        response = connection.respond(HTTPStatus.OK, REGISTRY.render())
+        del response.headers["Content-Type"]
+        response.headers["Content-Type"] = PROMETHEUS_CONTENT_TYPE
+        return response
 
     # ---- Lancement ---------------------------------------------------
 
-    async def _run(self):
-        async with websockets.serve(self._handler, self.host, self.port):
+    async def serve(self):
+        """Serveur + boucle de diffusion dans la boucle asyncio courante."""
+        async with websockets.serve(
+            self._handler,
+            self.host,
+            self.port,
+            subprotocols=[telemetry_binary.SUBPROTOCOL],
+            select_subprotocol=self._select_subprotocol,
+            process_request=self._process_request,
+            ping_interval=self.ping_interval_s,
+        ):
             print(f"[WS] Écoute sur ws://{self.host}:{self.port}")
             await self._broadcast_loop()
 
     def start(self):
         try:
-            asyncio.run(self._run())
+            asyncio.run(self.serve())
         except KeyboardInterrupt:
             print("[WS] Arrêt")
         except Exception as e:
@@ -0,0 +1,73 @@
+extends Control
+# Courbe d'un champ de l'historique du bridge (altitude, vitesse...).
+# Le sous-échantillonnage est fait côté bridge : on trace tels quels les
+# quelques centaines de points reçus.
+#
+# Usage : placer le nœud dans la scène, renseigner `main_path` ; il
+# redemande l'historique toutes les `refresh_s` secondes.
+
+@export var main_path: NodePath
+@export var field: String = "altitude"
+@export var window_s: float = 600.0
+@export var points: int = 300
+@export var refresh_s: float = 2.0
+@export var line_color: Color = Color(0.3, 0.9, 0.4, 1.0)
+@export var line_width: float = 2.0
+
+var _main: Node = null
+var _t: Array = []
+var _v: Array = []
+var _elapsed := 0.0
+
+
+func _ready() -> void:
+	if main_path != NodePath():
+		_main = get_node_or_null(main_path)
+	if _main != null:
+		_main.history_received.connect(_on_history_received)
+
+
+func _process(delta: float) -> void:
+	if _main == null:
+		return
+	_elapsed += delta
+	if _elapsed >= refresh_s:
+		_elapsed = 0.0
+		_main.request_history([field], window_s, points, get_instance_id())
+
+
+func _on_history_received(response: Dictionary) -> void:
+	# Plusieurs graphes partagent le signal : on ne garde que notre réponse.
+	if int(response.get("id", -1)) != get_instance_id():
+		return
+	var serie: Dictionary = response.get("series", {}).get(field, {})
+	set_series(serie.get("t", []), serie.get("v", []))
+
+
+func set_series(t: Array, v: Array) -> void:
+	_t = t
+	_v = v
+	queue_redraw()
+
+
+func _draw() -> void:
+	var n := mini(_t.size(), _v.size())
+	if n < 2:
+		return
+	var t0: float = _t[0]
+	var t1: float = _t[n - 1]
+	var vmin: float = _v[0]
+	var vmax: float = _v[0]
+	for x in _v:
+		vmin = minf(vmin, x)
+		vmax = maxf(vmax, x)
+	var span_t := maxf(t1 - t0, 0.001)
+	var span_v := maxf(vmax - vmin, 0.001)
+	var pts := PackedVector2Array()
+	pts.resize(n)
+	for i in n:
+		pts[i] = Vector2(
+			(float(_t[i]) - t0) / span_t * size.x,
+			size.y - (float(_v[i]) - vmin) / span_v * size.y
+		)
+	draw_polyline(pts, line_color, line_width, true)
@@ -10,8 +10,19 @@ extends Node
 @export var reconnect_delay: float = 2.0
 @export var fallback_delay: float = 5.0
 @export var kerbin_radius_m: float = 600000.0
+# 1 = document JSON complet à chaque trame ; 2 = keyframe + deltas.
+@export var protocol_version: int = 2
+# Trames binaires à disposition fixe (sous-protocole capsule.bin.v1) à la
+# place du JSON ; voir bridge_python/telemetry_binary.py.
+@export var binary_protocol: bool = false
+# Abonnements par champ (optionnel), ex. :
+#   [{"fields": ["altitude", "speed"], "hz": 30}, {"fields": ["stages"], "hz": 2}]
+# Vide = flux complet.
+@export var subscribe_groups: Array = []
 
 signal telemetry_updated(data)
+# Réponse à request_history() : {"series": {champ: {"t": [...], "v": [...]}}, ...}
+signal history_received(response)
 
 var ws: WebSocketPeer
 var connected := false
@@ -19,6 +30,11 @@ var _reconnect_time := 0.0
 var _first_attempt_time := 0.0
 var _fallback_shown := false
 
+# Protocole v2 : état reconstruit à partir de la keyframe et des deltas.
+var _state: Dictionary = {}
+var _last_seq := -1
+var _resync_pending := false
+
 var speed_label: Label
 var apoapsis_label: Label
 var altitude_label: Label
@@ -29,6 +45,12 @@ var rocket: Node = null
 const DETACHED_COLOR := Color(0.3, 0.3, 0.3, 1.0)
 const ATTACHED_COLOR := Color(1, 1, 1, 1)
 
+const BIN_SUBPROTOCOL := "capsule.bin.v1"
+const BIN_SCHEMA_VERSION := 1
+const BIN_HEADER_SIZE := 60
+const BIN_STAGE_SIZE := 8
+const BIN_FLAG_CONNECTED := 1
+
 
 func _ready():
 	ws = WebSocketPeer.new()
@@ -77,6 +99,8 @@ func _process(delta):
 
 func _connect():
 	var url = "ws://%s:%d%s" % [ws_host, ws_port, ws_path]
+	if binary_protocol:
+		ws.supported_protocols = PackedStringArray([BIN_SUBPROTOCOL])
 	var err = ws.connect_to_url(url)
 	if err == OK:
 		print("[WS] Tentative de connexion: ", url)
@@ -88,7 +112,15 @@ func _connect():
 func _on_ws_connected():
 	connected = true
 	_fallback_shown = false
+	_state = {}
+	_last_seq = -1
 	print("[WS] Connecté")
+	if protocol_version >= 2 and ws.get_selected_protocol() != BIN_SUBPROTOCOL:
+		# La réponse au hello est une keyframe.
+		_resync_pending = true
+		_send_command({"cmd": "hello", "protocol": protocol_version})
+	if not subscribe_groups.is_empty():
+		_send_command({"cmd": "subscribe", "groups": subscribe_groups})
 	var cw = get_node_or_null("ConnectionWindow")
 	if cw:
 		cw.hide()
@@ -117,6 +149,58 @@ func _check_incoming():
 		var packet = ws.get_packet()
 		if ws.was_string_packet():
 			_process_message(packet.get_string_from_utf8())
+		else:
+			_process_binary(packet)
+
+
+# Trame binaire v1 : lecture directe des champs par offset, sans JSON ni
+# Dictionary (disposition documentée dans telemetry_binary.py).
+func _process_binary(frame: PackedByteArray) -> void:
+	if frame.size() < BIN_HEADER_SIZE or frame.decode_u8(0) != BIN_SCHEMA_VERSION:
+		return
+	if (frame.decode_u8(1) & BIN_FLAG_CONNECTED) == 0:
+		return
+	var n := frame.decode_u8(2)
+	if frame.size() < BIN_HEADER_SIZE + n * BIN_STAGE_SIZE:
+		return
+
+	if altitude_label:
+		altitude_label.text = _format_big_number(frame.decode_double(8))
+	if apoapsis_label:
+		apoapsis_label.text = _format_big_number(frame.decode_double(16) - kerbin_radius_m)
+	if periapsis_label:
+		periapsis_label.text = _format_big_number(frame.decode_double(24) - kerbin_radius_m)
+	if speed_label:
+		speed_label.text = _format_speed(frame.decode_float(32))
+
+	var has_rocket := rocket != null and rocket.has_method("set_stage")
+	for i in maxi(n, fuel_bars.size()):
+		var pct := 0.0
+		var attached := false
+		if i < n:
+			var off: int = BIN_HEADER_SIZE + i * BIN_STAGE_SIZE
+			attached = frame.decode_u8(off + 2) != 0
+			pct = frame.decode_float(off + 4)
+		if i < fuel_bars.size() and fuel_bars[i] != null:
+			var bar = fuel_bars[i]
+			bar.value = clamp(pct, 0.0, bar.max_value)
+			bar.modulate = ATTACHED_COLOR if attached else DETACHED_COLOR
+		if has_rocket and i < 4:
+			rocket.set_stage(i, pct, attached)
+
+
+func _send_command(cmd: Dictionary) -> void:
+	if ws.get_ready_state() == WebSocketPeer.STATE_OPEN:
+		ws.send_text(JSON.stringify(cmd))
+
+
+# Demande l'historique des `window_s` dernières secondes, réduit à ~`points`
+# points par champ côté bridge. Réponse via le signal history_received.
+func request_history(fields: Array, window_s: float, points: int = 300, id = null) -> void:
+	var cmd := {"cmd": "history", "fields": fields, "window_s": window_s, "points": points}
+	if id != null:
+		cmd["id"] = id
+	_send_command(cmd)
 
 
 func _process_message(text: String) -> void:
@@ -125,6 +209,43 @@ func _process_message(text: String) -> void:
 		return
 	var data: Dictionary = result
 
+	match data.get("type", ""):
+		"key":
+			_state = data.get("data", {})
+			_last_seq = int(data.get("seq", 0))
+			_resync_pending = false
+			_apply_telemetry(_state)
+		"delta":
+			if _resync_pending:
+				return
+			var seq := int(data.get("seq", 0))
+			if seq != _last_seq + 1:
+				# Trame perdue ou hors séquence : on redemande une keyframe.
+				print("[WS] Trou de séquence (%d → %d), resync" % [_last_seq, seq])
+				_resync_pending = true
+				_send_command({"cmd": "resync"})
+				return
+			_last_seq = seq
+			var changes: Dictionary = data.get("changes", {})
+			_state.merge(changes, true)
+			_apply_telemetry(changes)
+		"sub":
+			var fields: Dictionary = data.get("data", {})
+			_state.merge(fields, true)
+			_apply_telemetry(fields)
+		"history":
+			emit_signal("history_received", data)
+			return
+		_:
+			_state = data
+			_apply_telemetry(data)
+
+	emit_signal("telemetry_updated", _state)
+
+
+# Applique un document complet ou un delta : seuls les champs présents
+# sont mis à jour.
+func _apply_telemetry(data: Dictionary) -> void:
 	var speed = data.get("speed")
 	var altitude = data.get("altitude")
 	var apo = data.get("apoapsis")
@@ -139,14 +260,12 @@ func _process_message(text: String) -> void:
 	if peri != null and periapsis_label:
 		periapsis_label.text = _format_big_number(float(peri) - kerbin_radius_m)
 
-	var stages = data.get("stages", [])
+	var stages = data.get("stages")
 	if stages is Array:
 		_update_stages(stages)
 		if rocket and rocket.has_method("update_from_stages"):
 			rocket.update_from_stages(stages)
 
-	emit_signal("telemetry_updated", data)
-
 
 func _update_stages(stages: Array):
 	for i in fuel_bars.size():
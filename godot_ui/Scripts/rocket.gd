@@ -27,17 +27,25 @@ func update_from_stages(stages: Array) -> void:
 	#   stages[1] → etage2
 	#   stages[2] → etage3
 	#   stages[3] → coiffe
-	var s0 = _stage_at(stages, 0)
-	var s1 = _stage_at(stages, 1)
-	var s2 = _stage_at(stages, 2)
-	var s3 = _stage_at(stages, 3)
-
-	_apply(etage1_gauge, s0)
-	_apply(booster1_gauge, s0)
-	_apply(booster2_gauge, s0)
-	_apply(etage2_gauge, s1)
-	_apply(etage3_gauge, s2)
-	_apply(coiffe_gauge, s3)
+	for idx in 4:
+		var s := _stage_at(stages, idx)
+		set_stage(idx, float(s.get("fuel_percent", 0.0)), bool(s.get("attached", false)))
+
+
+# Met à jour les jauges d'un étage (index dans "stages") sans passer par un
+# Dictionary : utilisé tel quel par le décodage des trames binaires.
+func set_stage(idx: int, fuel_percent: float, attached: bool) -> void:
+	match idx:
+		0:
+			_set_gauge(etage1_gauge, fuel_percent, attached)
+			_set_gauge(booster1_gauge, fuel_percent, attached)
+			_set_gauge(booster2_gauge, fuel_percent, attached)
+		1:
+			_set_gauge(etage2_gauge, fuel_percent, attached)
+		2:
+			_set_gauge(etage3_gauge, fuel_percent, attached)
+		3:
+			_set_gauge(coiffe_gauge, fuel_percent, attached)
 
 
 func _stage_at(stages: Array, idx: int) -> Dictionary:
@@ -46,12 +54,6 @@ func _stage_at(stages: Array, idx: int) -> Dictionary:
 	return {"fuel_percent": 0.0, "attached": false}
 
 
-func _apply(gauge: ColorRect, stage: Dictionary) -> void:
-	var pct := float(stage.get("fuel_percent", 0.0))
-	var attached := bool(stage.get("attached", false))
-	_set_gauge(gauge, pct, attached)
-
-
 func _set_gauge(gauge: ColorRect, fuel_percent: float, attached: bool) -> void:
 	if gauge == null:
 		return